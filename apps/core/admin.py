@@ -0,0 +1,16 @@
+from django.contrib import admin
+from .models import Trabajo
+
+
+@admin.register(Trabajo)
+class TrabajoAdmin(admin.ModelAdmin):
+    """Seguimiento de los trabajos en segundo plano (solo lectura: los crea el código)."""
+    list_display = ('id', 'tarea', 'estado', 'procesados', 'total', 'intentos', 'empresa', 'usuario', 'fecha_creacion')
+    list_filter = ('estado', 'tarea')
+    search_fields = ('tarea', 'clave_idempotencia')
+    list_select_related = ('empresa', 'usuario')
+    readonly_fields = [f.name for f in Trabajo._meta.fields]
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
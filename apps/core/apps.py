@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.core'
+
+    def ready(self):
+        # Registra las tareas en segundo plano declaradas en `<app>/tareas.py`.
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('tareas')
@@ -0,0 +1,83 @@
+"""
+Filtro de Bloom compacto y serializable.
+
+Responde "seguro que no está" o "puede que esté" con un vector de bits de
+tamaño fijo: unos 10 bits por elemento para un 1 % de falsos positivos, sin
+falsos negativos. Sirve para contestar sin consultar la base de datos la
+pregunta frecuente "¿existe ya este documento?", que casi siempre es "no".
+
+Las posiciones se obtienen por doble hash (Kirsch-Mitzenmacher) a partir de
+dos FNV-1a de 32 bits sobre el UTF-8 del valor: es trivial de reproducir en
+JavaScript (`Math.imul`), así que el navegador puede consultar el mismo filtro
+que el servidor (ver `static/js/terceros/verificacion_nroid.js`).
+"""
+import base64
+import math
+
+FNV_PRIMO = 0x01000193
+FNV_BASE_1 = 0x811C9DC5
+FNV_BASE_2 = 0x050C5D1F
+MASCARA_32 = 0xFFFFFFFF
+
+
+def _fnv1a(datos: bytes, base: int) -> int:
+    h = base
+    for byte in datos:
+        h = ((h ^ byte) * FNV_PRIMO) & MASCARA_32
+    return h
+
+
+class FiltroBloom:
+    """Vector de `m` bits con `k` funciones hash."""
+
+    __slots__ = ('m', 'k', 'n', 'capacidad', 'bits')
+
+    def __init__(self, m: int, k: int, bits: bytes = None, n: int = 0, capacidad: int = 0):
+        self.m = m
+        self.k = k
+        self.n = n
+        self.capacidad = capacidad
+        self.bits = bytearray(bits) if bits is not None else bytearray((m + 7) // 8)
+
+    @classmethod
+    def para(cls, capacidad: int, tasa_error: float = 0.01) -> 'FiltroBloom':
+        """Filtro dimensionado para `capacidad` elementos con la tasa de falsos positivos dada."""
+        capacidad = max(1, capacidad)
+        m = math.ceil(-capacidad * math.log(tasa_error) / math.log(2) ** 2)
+        m = (m + 7) // 8 * 8
+        k = max(1, round(m / capacidad * math.log(2)))
+        return cls(m, k, capacidad=capacidad)
+
+    def _posiciones(self, valor: str):
+        datos = valor.encode('utf-8')
+        h1 = _fnv1a(datos, FNV_BASE_1)
+        h2 = _fnv1a(datos, FNV_BASE_2) | 1
+        for i in range(self.k):
+            yield (h1 + i * h2) % self.m
+
+    def add(self, valor: str) -> None:
+        for posicion in self._posiciones(valor):
+            self.bits[posicion >> 3] |= 1 << (posicion & 7)
+        self.n += 1
+
+    def __contains__(self, valor: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._posiciones(valor))
+
+    @property
+    def saturado(self) -> bool:
+        """Se superó la capacidad prevista: la tasa real de falsos positivos ya es mayor."""
+        return self.n > self.capacidad
+
+    # --- Serialización ------------------------------------------------------
+
+    def a_dict(self) -> dict:
+        """Forma compacta para guardar en el cache (bits como `bytes`)."""
+        return {'m': self.m, 'k': self.k, 'n': self.n, 'capacidad': self.capacidad, 'bits': bytes(self.bits)}
+
+    @classmethod
+    def desde_dict(cls, datos: dict) -> 'FiltroBloom':
+        return cls(datos['m'], datos['k'], datos['bits'], datos['n'], datos['capacidad'])
+
+    def a_json(self) -> dict:
+        """Forma para el navegador: los bits en base64."""
+        return {'m': self.m, 'k': self.k, 'bits': base64.b64encode(self.bits).decode('ascii')}
@@ -0,0 +1,78 @@
+"""
+Invalidación por etiquetas (namespaces) mediante prefijos versionados.
+
+Cada namespace ('geonames', 'empresa:42') tiene un número de versión guardado
+en el propio cache. Las claves de datos incluyen la versión de sus namespaces:
+
+    dashboard_stats_42:v1718000000123
+
+Invalidar un namespace es incrementar su versión (una sola operación, O(1)):
+las claves antiguas dejan de leerse y caducan solas por su timeout. No hace
+falta `KEYS`/`SCAN` ni `delete_pattern`, así que funciona igual con LocMemCache,
+FileBasedCache, la base de datos o django_redis.
+"""
+import time
+from django.core.cache import cache
+from .metricas import registrar_lectura_cache
+
+NAMESPACE_GEONAMES = 'geonames'
+
+
+def namespace_empresa(empresa_id) -> str:
+    """Namespace de los datos cacheados de una empresa (dashboard, choices, alertas...)."""
+    return f"empresa:{getattr(empresa_id, 'pk', empresa_id)}"
+
+
+def namespace_usuario(user_id) -> str:
+    """Namespace de lo cacheado por usuario que depende de sus membresías y permisos (menú)."""
+    return f"usuario:{getattr(user_id, 'pk', user_id)}"
+
+
+def _clave_version(namespace: str) -> str:
+    return f"ns_version:{namespace}"
+
+
+def _version_inicial() -> int:
+    # Si el cache expulsa la clave de versión, la nueva parte de la hora actual en
+    # milisegundos y no de 1, para no resucitar claves antiguas que sigan en cache.
+    return int(time.time() * 1000)
+
+
+def versiones(*namespaces: str) -> list:
+    """Versiones actuales de los namespaces, con una sola lectura al cache."""
+    claves = [_clave_version(ns) for ns in namespaces]
+    encontradas = cache.get_many(claves)
+    resultado = []
+    for clave in claves:
+        version = encontradas.get(clave)
+        if version is None:
+            # `add` no pisa la versión si otro proceso la creó entre medias.
+            cache.add(clave, _version_inicial(), timeout=None)
+            version = cache.get(clave, _version_inicial())
+        resultado.append(version)
+    return resultado
+
+
+def clave_versionada(clave: str, *namespaces: str) -> str:
+    """Devuelve `clave` etiquetada con la versión actual de cada namespace."""
+    if not namespaces:
+        return clave
+    return f"{clave}:v{'.'.join(str(v) for v in versiones(*namespaces))}"
+
+
+def invalidar_namespace(*namespaces: str) -> None:
+    """Invalida de golpe todas las claves de los namespaces indicados."""
+    for namespace in namespaces:
+        clave = _clave_version(namespace)
+        try:
+            cache.incr(clave)
+        except ValueError:
+            # No existía: cualquier versión nueva deja huérfanas las claves anteriores.
+            cache.set(clave, _version_inicial(), timeout=None)
+
+
+def leer_cache(clave: str):
+    """`cache.get` que además cuenta aciertos y fallos por familia de clave (métricas)."""
+    valor = cache.get(clave)
+    registrar_lectura_cache(clave, valor is not None)
+    return valor
@@ -0,0 +1,246 @@
+"""
+Backend de cache local sobre SQLite en modo WAL.
+
+Pensado para despliegues de un solo servidor sin Redis, como sustituto de
+`FileBasedCache`:
+
+- Un único fichero con índice por clave: `get`/`set` son una consulta, sin abrir
+  un fichero por clave ni listar directorios para purgar.
+- WAL permite lecturas concurrentes mientras otro proceso escribe, y todos los
+  workers de gunicorn comparten el mismo cache.
+- `incr` es atómico entre procesos (los enteros se guardan como INTEGER y se
+  suman dentro de una transacción IMMEDIATE), que es lo que necesita
+  `apps.core.ratelimit`.
+- Tope de tamaño con `MAX_ENTRIES` y expulsión LRU aproximada: el instante de
+  último acceso solo se reescribe si tiene más de `LRU_RESOLUCION` segundos,
+  para que las lecturas calientes no se conviertan en escrituras.
+
+Configuración:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'apps.core.cache_backends.SQLiteCache',
+            'LOCATION': '/var/cache/guia/cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 50000, 'CULL_FREQUENCY': 4},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    clave TEXT PRIMARY KEY,
+    valor BLOB NOT NULL,
+    expira REAL,
+    acceso REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_acceso ON cache (acceso);
+CREATE INDEX IF NOT EXISTS cache_expira ON cache (expira);
+"""
+
+
+class SQLiteCache(BaseCache):
+    # Segundos por debajo de los cuales no se actualiza el último acceso de una clave leída.
+    LRU_RESOLUCION = 30
+    # Cada cuántas escrituras (por proceso) se comprueba el tope de entradas.
+    ESCRITURAS_ENTRE_PURGAS = 200
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._ruta = str(location)
+        self._local = threading.local()
+        self._escrituras = 0
+        self._lock = threading.Lock()
+
+    # --- Conexión -----------------------------------------------------------
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """Una conexión por hilo y por proceso (tras un fork se abre otra)."""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None or self._local.pid != os.getpid():
+            directorio = os.path.dirname(self._ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            conexion = sqlite3.connect(self._ruta, timeout=10, isolation_level=None, check_same_thread=False)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            conexion.executescript(ESQUEMA)
+            self._local.conexion = conexion
+            self._local.pid = os.getpid()
+        return conexion
+
+    # --- Serialización ------------------------------------------------------
+
+    @staticmethod
+    def _serializar(valor):
+        # Los enteros se guardan tal cual para poder sumarlos en SQL con `incr`.
+        if type(valor) is int:
+            return valor
+        return pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _deserializar(valor):
+        if isinstance(valor, int):
+            return valor
+        return pickle.loads(valor)
+
+    # --- API de BaseCache ---------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        ahora = time.time()
+        fila = self._db.execute(
+            'SELECT valor, expira, acceso FROM cache WHERE clave = ?', (key,)
+        ).fetchone()
+        if fila is None:
+            return default
+        valor, expira, acceso = fila
+        if expira is not None and expira <= ahora:
+            self._db.execute('DELETE FROM cache WHERE clave = ? AND expira <= ?', (key, ahora))
+            return default
+        if ahora - acceso > self.LRU_RESOLUCION:
+            self._db.execute('UPDATE cache SET acceso = ? WHERE clave = ?', (ahora, key))
+        return self._deserializar(valor)
+
+    def get_many(self, keys, version=None):
+        claves = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not claves:
+            return {}
+        ahora = time.time()
+        marcadores = ','.join('?' * len(claves))
+        filas = self._db.execute(
+            f'SELECT clave, valor FROM cache WHERE clave IN ({marcadores}) AND (expira IS NULL OR expira > ?)',
+            (*claves, ahora),
+        ).fetchall()
+        return {claves[clave]: self._deserializar(valor) for clave, valor in filas}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._db.execute(
+            'INSERT OR REPLACE INTO cache (clave, valor, expira, acceso) VALUES (?, ?, ?, ?)',
+            (key, self._serializar(value), self.get_backend_timeout(timeout), time.time()),
+        )
+        self._tras_escritura()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expira = self.get_backend_timeout(timeout)
+        ahora = time.time()
+        filas = [
+            (self.make_and_validate_key(key, version=version), self._serializar(value), expira, ahora)
+            for key, value in data.items()
+        ]
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany('INSERT OR REPLACE INTO cache (clave, valor, expira, acceso) VALUES (?, ?, ?, ?)', filas)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self._tras_escritura()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        ahora = time.time()
+        # Inserta si no existe; si existe pero ha caducado, lo sustituye.
+        cursor = self._db.execute(
+            """
+            INSERT INTO cache (clave, valor, expira, acceso) VALUES (?, ?, ?, ?)
+            ON CONFLICT (clave) DO UPDATE SET
+                valor = excluded.valor, expira = excluded.expira, acceso = excluded.acceso
+            WHERE cache.expira IS NOT NULL AND cache.expira <= ?
+            """,
+            (key, self._serializar(value), self.get_backend_timeout(timeout), ahora, ahora),
+        )
+        if cursor.rowcount:
+            self._tras_escritura()
+        return bool(cursor.rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db = self._db
+        # IMMEDIATE toma el bloqueo de escritura al empezar: lectura y suma son atómicas entre procesos.
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            fila = db.execute(
+                'SELECT valor FROM cache WHERE clave = ? AND (expira IS NULL OR expira > ?)', (key, time.time())
+            ).fetchone()
+            if fila is None:
+                raise ValueError("Key '%s' not found" % key)
+            nuevo = self._deserializar(fila[0]) + delta
+            db.execute('UPDATE cache SET valor = ? WHERE clave = ?', (self._serializar(nuevo), key))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return nuevo
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        ahora = time.time()
+        cursor = self._db.execute(
+            'UPDATE cache SET expira = ?, acceso = ? WHERE clave = ? AND (expira IS NULL OR expira > ?)',
+            (self.get_backend_timeout(timeout), ahora, key, ahora),
+        )
+        return bool(cursor.rowcount)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        fila = self._db.execute(
+            'SELECT 1 FROM cache WHERE clave = ? AND (expira IS NULL OR expira > ?)', (key, time.time())
+        ).fetchone()
+        return fila is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return bool(self._db.execute('DELETE FROM cache WHERE clave = ?', (key,)).rowcount)
+
+    def delete_many(self, keys, version=None):
+        claves = [self.make_and_validate_key(key, version=version) for key in keys]
+        if claves:
+            marcadores = ','.join('?' * len(claves))
+            self._db.execute(f'DELETE FROM cache WHERE clave IN ({marcadores})', claves)
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Las conexiones se reutilizan entre peticiones; no hay nada que cerrar.
+        pass
+
+    # --- Tope de tamaño -----------------------------------------------------
+
+    def _tras_escritura(self):
+        with self._lock:
+            self._escrituras += 1
+            if self._escrituras < self.ESCRITURAS_ENTRE_PURGAS:
+                return
+            self._escrituras = 0
+        self.purgar()
+
+    def purgar(self):
+        """
+        Elimina las entradas caducadas y, si aún se supera `MAX_ENTRIES`, la
+        fracción `1 / CULL_FREQUENCY` menos usada recientemente.
+        """
+        db = self._db
+        db.execute('DELETE FROM cache WHERE expira IS NOT NULL AND expira <= ?', (time.time(),))
+        total = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if total <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            self.clear()
+            return
+        exceso = total - self._max_entries
+        a_borrar = max(exceso, total // self._cull_frequency)
+        db.execute(
+            'DELETE FROM cache WHERE clave IN (SELECT clave FROM cache ORDER BY acceso LIMIT ?)', (a_borrar,)
+        )
@@ -0,0 +1,81 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+
+# Estado por petición (o por hilo/tarea). Los ContextVar se aíslan entre
+# peticiones concurrentes tanto en WSGI como en ASGI.
+_lectura_en_replica: ContextVar[bool] = ContextVar('lectura_en_replica', default=False)
+_forzar_primario: ContextVar[bool] = ContextVar('forzar_primario', default=False)
+_hubo_escritura: ContextVar[bool] = ContextVar('hubo_escritura', default=False)
+
+# Las escrituras de estas apps no implican que el usuario vaya a leer sus propios datos.
+APPS_SIN_PERSISTENCIA_DE_LECTURA = {'sessions', 'admin'}
+
+
+def nombres_replicas():
+    """Alias de `DATABASES` configurados como réplicas de lectura."""
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+class ReplicaRouter:
+    """
+    Envía las lecturas a una réplica solo dentro de un contexto de lectura
+    explícito (`lectura_en_replica`, `usar_replica` o `ReplicaMixin`), y siempre
+    al primario si el usuario escribió recientemente (ver `ReplicaPinMiddleware`).
+    Todas las escrituras y migraciones van a 'default'.
+    """
+    def __init__(self):
+        self.replicas = nombres_replicas()
+
+    def db_for_read(self, model, **hints):
+        if self.replicas and _lectura_en_replica.get() and not _forzar_primario.get():
+            return random.choice(self.replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in APPS_SIN_PERSISTENCIA_DE_LECTURA:
+            _hubo_escritura.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las réplicas contienen los mismos datos que el primario.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+@contextmanager
+def lectura_en_replica():
+    """Context manager que permite enrutar las lecturas del bloque a una réplica."""
+    token = _lectura_en_replica.set(True)
+    try:
+        yield
+    finally:
+        _lectura_en_replica.reset(token)
+
+
+def usar_replica(view_func):
+    """Decorador para vistas de función de solo lectura."""
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        with lectura_en_replica():
+            response = view_func(request, *args, **kwargs)
+            # Las TemplateResponse se renderizan fuera de la vista; lo hacemos
+            # aquí para que las consultas perezosas de la plantilla también usen la réplica.
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                response.render()
+            return response
+    return _wrapped
+
+
+class ReplicaMixin:
+    """Mixin para vistas basadas en clases de solo lectura (listados, reportes, exportaciones)."""
+    def dispatch(self, request, *args, **kwargs):
+        with lectura_en_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                response.render()
+            return response
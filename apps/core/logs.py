@@ -0,0 +1,84 @@
+"""
+Formateador JSON y filtro de muestreo para la configuración `LOGGING`.
+
+Este módulo se carga al configurar el logging, antes que las aplicaciones:
+no debe importar modelos ni nada que dependa de `django.setup()`.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+# Atributos estándar de `LogRecord`; el resto viene de `extra=` y se incluye en el JSON.
+_ATRIBUTOS_ESTANDAR = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class FormateadorJSON(logging.Formatter):
+    """
+    Una línea JSON por registro, lista para un agregador de logs:
+
+        {"ts": "...", "nivel": "WARNING", "logger": "apps.terceros.views",
+         "mensaje": "...", "modulo": "views", "linea": 301, "pid": 1234}
+
+    Los campos pasados con `extra=` se añaden tal cual (con `repr` si no son
+    serializables) y las excepciones van en "excepcion".
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+            'modulo': record.module,
+            'linea': record.lineno,
+            'pid': record.process,
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_ESTANDAR and not clave.startswith('_'):
+                datos[clave] = valor
+        if record.exc_info:
+            datos['excepcion'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            datos['pila'] = self.formatStack(record.stack_info)
+        return json.dumps(datos, ensure_ascii=False, default=repr)
+
+
+class FiltroMuestreo(logging.Filter):
+    """
+    Limita los avisos repetidos: de cada plantilla de mensaje (logger + `msg`
+    sin formatear) deja pasar `maximo` registros por `ventana` segundos y
+    descarta el resto. El primero que pasa en la ventana siguiente indica
+    cuántos se omitieron (`omitidos`).
+
+    Solo afecta a los niveles por debajo de `nivel_exento` (ERROR por defecto
+    siempre pasa). Como la clave es la plantilla y no el mensaje formateado,
+    hay que usar argumentos `%` y no f-strings para que agrupe bien.
+    """
+
+    def __init__(self, maximo: int = 10, ventana: float = 60, nivel_exento: str = 'ERROR'):
+        super().__init__()
+        self.maximo = int(maximo)
+        self.ventana = float(ventana)
+        self.nivel_exento = logging.getLevelName(nivel_exento) if isinstance(nivel_exento, str) else nivel_exento
+        self._contadores = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.nivel_exento:
+            return True
+
+        clave = (record.name, record.msg if isinstance(record.msg, str) else type(record.msg).__name__)
+        ahora = time.monotonic()
+        with self._lock:
+            inicio, emitidos, omitidos = self._contadores.get(clave, (ahora, 0, 0))
+            if ahora - inicio >= self.ventana:
+                inicio, emitidos = ahora, 0
+            if emitidos >= self.maximo:
+                self._contadores[clave] = (inicio, emitidos, omitidos + 1)
+                return False
+            self._contadores[clave] = (inicio, emitidos + 1, 0)
+        if omitidos:
+            record.omitidos = omitidos
+        return True
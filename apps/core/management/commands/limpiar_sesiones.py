@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    """
+    Elimina las sesiones expiradas de `django_session` en lotes.
+
+    A diferencia de `clearsessions`, que lanza un único DELETE sobre toda la
+    tabla, aquí se borra por lotes de claves primarias para no bloquear la
+    tabla durante mucho tiempo en instalaciones con millones de filas.
+    Aplica a los backends 'db' y 'cached_db'; con 'signed_cookies' no hay nada que limpiar.
+    """
+    help = "Elimina en lotes las sesiones expiradas de la base de datos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help="Número de sesiones eliminadas por sentencia.")
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE.endswith('signed_cookies'):
+            self.stdout.write("El backend de sesiones no usa la base de datos. Nada que limpiar.")
+            return
+
+        lote = options['lote']
+        ahora = timezone.now()
+        total = 0
+        while True:
+            claves = list(
+                Session.objects.filter(expire_date__lt=ahora).values_list('session_key', flat=True)[:lote]
+            )
+            if not claves:
+                break
+            total += Session.objects.filter(session_key__in=claves).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f"{total} sesiones expiradas eliminadas."))
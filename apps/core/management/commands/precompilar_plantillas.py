@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.plantillas import precompilar_plantillas
+
+
+class Command(BaseCommand):
+    """
+    Compila todas las plantillas y muestra cuánto tardó y cuáles fueron las
+    más lentas. Sirve para medir el coste de arranque de un worker y, en CI,
+    para detectar plantillas con errores de sintaxis antes de desplegar.
+    """
+    help = "Precompila todas las plantillas e informa de los tiempos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lentas', type=int, default=10, help="Cuántas de las plantillas más lentas mostrar.")
+
+    def handle(self, *args, **options):
+        informe = precompilar_plantillas(max_lentas=options['lentas'])
+
+        for segundos, nombre in informe.lentas:
+            self.stdout.write(f"{segundos * 1000:8.1f} ms  {nombre}")
+        for nombre, error in informe.errores:
+            self.stderr.write(f"ERROR {nombre}: {error}")
+
+        self.stdout.write(f"{informe.plantillas} plantillas precompiladas en {informe.segundos * 1000:.0f} ms.")
+        if informe.errores:
+            raise CommandError(f"{len(informe.errores)} plantillas con errores.")
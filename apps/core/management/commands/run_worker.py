@@ -0,0 +1,115 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.core.trabajos import bucle_worker, identificador_worker, recuperar_huerfanos, tareas_registradas
+
+
+def _ejecutar_hilos(hilos: int, intervalo: float, una_vez: bool, sufijo: str = '') -> int:
+    """Lanza `hilos` bucles de worker y espera a que terminen (o a SIGTERM/SIGINT)."""
+    parar = threading.Event()
+
+    def detener(*_):
+        parar.set()
+
+    anteriores = {}
+    if threading.current_thread() is threading.main_thread():
+        for senal in (signal.SIGTERM, signal.SIGINT):
+            anteriores[senal] = signal.signal(senal, detener)
+    try:
+        if hilos == 1:
+            # Un solo hilo: se trabaja en el actual, con su conexión.
+            return bucle_worker(identificador_worker(sufijo), parar, intervalo, una_vez)
+        return _lanzar_hilos(hilos, parar, intervalo, una_vez, sufijo)
+    finally:
+        for senal, manejador in anteriores.items():
+            signal.signal(senal, manejador)
+
+
+def _lanzar_hilos(hilos: int, parar: threading.Event, intervalo: float, una_vez: bool, sufijo: str) -> int:
+    totales = []
+
+    def hilo(numero):
+        try:
+            totales.append(bucle_worker(identificador_worker(f"{sufijo}-{numero}"), parar, intervalo, una_vez))
+        finally:
+            # Cada hilo abre sus propias conexiones: se cierran al salir.
+            connections.close_all()
+
+    lanzados = [threading.Thread(target=hilo, args=(n,), daemon=True) for n in range(hilos)]
+    for h in lanzados:
+        h.start()
+    while any(h.is_alive() for h in lanzados):
+        for h in lanzados:
+            h.join(timeout=0.5)
+    return sum(totales)
+
+
+def _proceso(hilos: int, intervalo: float, una_vez: bool, sufijo: str) -> None:
+    # Con el método 'spawn' (Windows, macOS) el proceso hijo arranca sin Django configurado.
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    _ejecutar_hilos(hilos, intervalo, una_vez, sufijo)
+
+
+class Command(BaseCommand):
+    """
+    Ejecuta los trabajos en segundo plano (`apps.core.trabajos`) de la tabla
+    `Trabajo`. No necesita broker: basta con la base de datos del proyecto.
+
+    Ejemplos:
+        python manage.py run_worker                      # un hilo
+        python manage.py run_worker --hilos 4            # tareas de E/S
+        python manage.py run_worker --procesos 2 --hilos 2   # tareas de CPU
+        python manage.py run_worker --una-vez            # vacía la cola y termina (cron)
+    """
+    help = "Ejecuta los trabajos en segundo plano encolados en la base de datos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=1, help="Hilos de worker por proceso.")
+        parser.add_argument('--procesos', type=int, default=1, help="Procesos de worker.")
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help="Segundos de espera entre consultas cuando la cola está vacía.")
+        parser.add_argument('--una-vez', action='store_true',
+                            help="Ejecuta los trabajos disponibles y termina.")
+
+    def handle(self, *args, **options):
+        hilos = max(1, options['hilos'])
+        procesos = max(1, options['procesos'])
+        intervalo, una_vez = options['intervalo'], options['una_vez']
+
+        recuperados = recuperar_huerfanos()
+        if recuperados:
+            self.stdout.write(self.style.WARNING(f"{recuperados} trabajo(s) huérfano(s) devuelto(s) a la cola."))
+        self.stdout.write(
+            f"Worker iniciado: {procesos} proceso(s) x {hilos} hilo(s). "
+            f"Tareas: {', '.join(sorted(tareas_registradas())) or 'ninguna'}."
+        )
+
+        if procesos == 1:
+            total = _ejecutar_hilos(hilos, intervalo, una_vez)
+            self.stdout.write(self.style.SUCCESS(f"Worker detenido. {total} trabajo(s) ejecutado(s)."))
+            return
+
+        # Las conexiones abiertas no deben heredarse a los procesos hijos.
+        connections.close_all()
+        hijos = [
+            multiprocessing.Process(target=_proceso, args=(hilos, intervalo, una_vez, f"p{n}"))
+            for n in range(procesos)
+        ]
+        for hijo in hijos:
+            hijo.start()
+        try:
+            for hijo in hijos:
+                hijo.join()
+        except KeyboardInterrupt:
+            for hijo in hijos:
+                hijo.terminate()
+            for hijo in hijos:
+                hijo.join()
+        self.stdout.write(self.style.SUCCESS("Workers detenidos."))
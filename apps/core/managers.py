@@ -0,0 +1,86 @@
+from django.db import models, transaction
+
+
+class TenantQuerySet(models.QuerySet):
+    """
+    QuerySet base para los modelos que pertenecen a una empresa.
+
+    Solo asume la ruta hasta la empresa; lo que depende de `activo` y `nombre`
+    vive en `SoftDeleteTenantQuerySet`.
+
+    Centraliza el filtro por empresa activa y las proyecciones de cada caso de
+    uso, para que todas las vistas consulten igual (y usen los mismos índices).
+    Las subclases declaran qué relaciones y campos necesita cada caso:
+
+        class TerceroQuerySet(SoftDeleteTenantQuerySet):
+            relaciones_lista = ('tipo_identificacion',)
+            campos_lista = ('nombre', 'nroid', 'tipo_identificacion__nombre')
+
+        objects = TerceroQuerySet.as_manager()
+    """
+    # Ruta hasta la FK de empresa (ej. 'bodega__empresa' para modelos indirectos).
+    empresa_field = 'empresa'
+
+    relaciones_lista = ()
+    campos_lista = None  # None = todos los campos
+    relaciones_detalle = ()
+    orden = ('pk',)
+
+    def de_empresa(self, empresa):
+        """
+        Filtra por empresa. Acepta una instancia o su id (ej. el de la sesión).
+        Se filtra siempre por la columna `empresa_id` para aprovechar los índices
+        compuestos que empiezan por empresa.
+        """
+        empresa_id = getattr(empresa, 'pk', empresa)
+        return self.filter(**{f'{self.empresa_field}_id': empresa_id})
+
+    def para_lista(self):
+        """Proyección para listados paginados: solo lo que muestra la tabla."""
+        queryset = self.select_related(*self.relaciones_lista) if self.relaciones_lista else self
+        if self.campos_lista:
+            queryset = queryset.only(*self.campos_lista)
+        return queryset.order_by(*self.orden)
+
+    def para_detalle(self):
+        """Proyección para formularios de edición y vistas de detalle."""
+        if self.relaciones_detalle:
+            return self.select_related(*self.relaciones_detalle)
+        return self
+
+
+class SoftDeleteTenantQuerySet(TenantQuerySet):
+    """
+    QuerySet para los modelos de empresa con `SoftDeleteModel` (campo `activo`)
+    y un `nombre` con el que listarlos y mostrarlos al usuario.
+    """
+    campos_choices = ('id', 'nombre')
+    orden = ('nombre',)
+    # Campo que se devuelve al activar/desactivar (para los mensajes al usuario).
+    campo_etiqueta = 'nombre'
+
+    def activos(self):
+        return self.filter(activo=True)
+
+    def para_choices(self):
+        """Tuplas `(id, nombre)` de los registros activos, sin instanciar modelos."""
+        return self.activos().order_by(*self.orden).values_list(*self.campos_choices)
+
+    def cambiar_activo(self, activo: bool, campos=None) -> list:
+        """
+        Activa o desactiva los registros del queryset que no estén ya en ese
+        estado y devuelve sus etiquetas (o tuplas con `campos`, si se indican).
+
+        Bloquea las filas (`select_for_update`) y las actualiza por pk dentro de
+        la misma transacción, para que lo devuelto coincida exactamente con lo
+        actualizado. No instancia modelos y, como `update()`, NO envía señales
+        `post_save`: quien la use debe invalidar los caches afectados.
+        """
+        queryset = self.filter(activo=not activo)
+        with transaction.atomic(using=queryset.db):
+            filas = list(queryset.select_for_update().values_list('pk', *(campos or (self.campo_etiqueta,))))
+            if filas:
+                self.model._base_manager.using(queryset.db).filter(
+                    pk__in=[fila[0] for fila in filas]
+                ).update(activo=activo)
+        return [fila[1:] for fila in filas] if campos else [fila[1] for fila in filas]
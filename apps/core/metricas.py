@@ -0,0 +1,134 @@
+"""
+Métricas de la aplicación en formato Prometheus (`/metrics`).
+
+Qué se mide:
+- Latencia de cada petición por nombre de URL, método y clase de estado.
+- Consultas SQL y tiempo de base de datos por vista.
+- Aciertos y fallos de cache por familia de clave (`dashboard_stats`,
+  `geonames`, `choices`...), para dimensionar timeouts y memoria.
+- Latencia y errores de la API externa de GeoNames.
+- Peticiones rechazadas por el límite de peticiones, por ámbito.
+
+`prometheus_client` es opcional: sin él todas las funciones de este módulo
+son no-ops y `/metrics` responde 404.
+
+Con varios procesos (gunicorn) cada worker escribe sus métricas en ficheros
+mmap dentro de `PROMETHEUS_MULTIPROC_DIR`, y `/metrics` las agrega. El
+directorio debe existir y vaciarse antes de arrancar, y `gunicorn.conf.py`
+avisa de los workers que terminan (`marcar_proceso_terminado`).
+"""
+import os
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Histogram
+except ImportError:  # prometheus_client es opcional
+    prometheus_client = None
+
+DISPONIBLE = prometheus_client is not None
+
+# Familias de claves de cache por prefijo. El orden importa: gana la primera.
+FAMILIAS_CACHE = (
+    ('dashboard_stats_', 'dashboard_stats'),
+    ('geonames_', 'geonames'),
+    ('terceros_choices_', 'choices'),
+    ('tipos_tercero_choices', 'choices'),
+    ('tipos_identificacion_choices', 'choices'),
+    ('empresas_usuario_', 'empresas_usuario'),
+    ('permisos_usuario_', 'permisos_usuario'),
+    ('alertas_stock_', 'alertas_stock'),
+    ('terceros_nroids_', 'filtro_nroids'),
+    ('conteo_admin_', 'conteos_admin'),
+    ('admin_filtro_', 'filtros_admin'),
+)
+
+# Cubos pensados para una aplicación web: de 5 ms a 10 s.
+CUBOS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CUBOS_CONSULTAS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class _MetricaNula:
+    """Sustituto sin efecto cuando prometheus_client no está instalado."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, *args, **kwargs):
+        pass
+
+    def inc(self, *args, **kwargs):
+        pass
+
+
+if DISPONIBLE:
+    PETICIONES_DURACION = Histogram(
+        'guia_http_request_duration_seconds', 'Duración de las peticiones HTTP.',
+        ['vista', 'metodo', 'estado'], buckets=CUBOS_LATENCIA,
+    )
+    DB_CONSULTAS = Histogram(
+        'guia_db_queries_per_request', 'Consultas SQL por petición.',
+        ['vista'], buckets=CUBOS_CONSULTAS,
+    )
+    DB_DURACION = Histogram(
+        'guia_db_duration_seconds', 'Tiempo total de base de datos por petición.',
+        ['vista'], buckets=CUBOS_LATENCIA,
+    )
+    CACHE_LECTURAS = Counter(
+        'guia_cache_reads_total', 'Lecturas de cache por familia de clave y resultado.',
+        ['familia', 'resultado'],
+    )
+    GEONAMES_DURACION = Histogram(
+        'guia_geonames_request_duration_seconds', 'Latencia de la API de GeoNames.',
+        ['recurso'], buckets=CUBOS_LATENCIA,
+    )
+    GEONAMES_ERRORES = Counter(
+        'guia_geonames_errors_total', 'Errores al consultar la API de GeoNames.',
+        ['recurso', 'tipo'],
+    )
+    RATELIMIT_RECHAZOS = Counter(
+        'guia_ratelimit_rejections_total', 'Peticiones rechazadas por el límite de peticiones.',
+        ['ambito'],
+    )
+else:
+    PETICIONES_DURACION = DB_CONSULTAS = DB_DURACION = CACHE_LECTURAS = _MetricaNula()
+    GEONAMES_DURACION = GEONAMES_ERRORES = RATELIMIT_RECHAZOS = _MetricaNula()
+
+
+def familia_cache(clave: str) -> str:
+    for prefijo, familia in FAMILIAS_CACHE:
+        if clave.startswith(prefijo):
+            return familia
+    return 'otras'
+
+
+def registrar_lectura_cache(clave: str, acierto: bool) -> None:
+    CACHE_LECTURAS.labels(familia_cache(clave), 'hit' if acierto else 'miss').inc()
+
+
+def registrar_geonames(recurso: str, segundos: float = None, error: str = None) -> None:
+    if segundos is not None:
+        GEONAMES_DURACION.labels(recurso).observe(segundos)
+    if error is not None:
+        GEONAMES_ERRORES.labels(recurso, error).inc()
+
+
+def registrar_rechazo_ratelimit(ambito: str) -> None:
+    RATELIMIT_RECHAZOS.labels(ambito).inc()
+
+
+def exponer() -> tuple:
+    """Devuelve `(cuerpo, content_type)` con todas las métricas, agregando procesos si procede."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import CollectorRegistry, multiprocess
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registro), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def marcar_proceso_terminado(pid: int) -> None:
+    """Para el hook `child_exit` de gunicorn en modo multiproceso."""
+    if DISPONIBLE and os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,255 @@
+import json
+import logging
+import mimetypes
+import os
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.http import http_date
+from . import metricas
+from .db_router import _forzar_primario, _hubo_escritura
+from .ratelimit import AMBITO_POR_DEFECTO, consumir, identidad_peticion
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaPinMiddleware:
+    """
+    Garantiza "leer lo propio": tras una escritura, las lecturas de ese usuario
+    se fijan al primario durante `DATABASE_REPLICA_PIN_SECONDS`, cubriendo el
+    retraso de replicación.
+
+    La marca se guarda en una cookie para no añadir una lectura de sesión.
+    """
+    cookie_name = 'db_primario_hasta'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = settings.DATABASE_REPLICA_PIN_SECONDS
+
+    def __call__(self, request):
+        try:
+            primario_hasta = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            primario_hasta = 0
+
+        token_primario = _forzar_primario.set(primario_hasta > time.time())
+        token_escritura = _hubo_escritura.set(False)
+        try:
+            response = self.get_response(request)
+            if _hubo_escritura.get():
+                response.set_cookie(
+                    self.cookie_name,
+                    str(time.time() + self.pin_seconds),
+                    max_age=self.pin_seconds,
+                    httponly=True,
+                    samesite='Lax',
+                    secure=request.is_secure(),
+                )
+            return response
+        finally:
+            _forzar_primario.reset(token_primario)
+            _hubo_escritura.reset(token_escritura)
+
+
+class RatelimitMiddleware:
+    """
+    Aplica el límite de peticiones por usuario + empresa (ver `apps/core/ratelimit.py`).
+
+    Se evalúa en `process_view`, cuando ya se conoce la vista: el ámbito sale
+    del decorador `limitar`, de `RATELIMIT_RUTAS` (por nombre de URL) o es el
+    presupuesto por defecto. Al superarlo responde 429 con `Retry-After`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rutas = settings.RATELIMIT_RUTAS
+        self.prefijos_exentos = tuple(p for p in (settings.STATIC_URL, getattr(settings, 'MEDIA_URL', '')) if p and p != '/')
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.path.startswith(self.prefijos_exentos):
+            return None
+
+        ambito = getattr(view_func, 'ratelimit_ambito', None)
+        if ambito is None:
+            ambito = self.rutas.get(request.resolver_match.view_name, AMBITO_POR_DEFECTO)
+
+        resultado = consumir(ambito, identidad_peticion(request))
+        if resultado.permitido:
+            return None
+        metricas.registrar_rechazo_ratelimit(ambito)
+
+        mensaje = 'Demasiadas peticiones. Inténtelo de nuevo en unos segundos.'
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest' or 'json' in request.headers.get('accept', ''):
+            response = JsonResponse({'error': mensaje}, status=429)
+        else:
+            response = HttpResponse(mensaje, status=429, content_type='text/plain; charset=utf-8')
+        response['Retry-After'] = str(resultado.reintentar_en)
+        response['RateLimit-Limit'] = str(resultado.limite.cantidad)
+        return response
+
+
+class _ContadorConsultas:
+    """`execute_wrapper` que acumula el número de consultas y su duración."""
+    __slots__ = ('consultas', 'segundos')
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.segundos += time.perf_counter() - inicio
+
+
+class MetricasMiddleware:
+    """
+    Registra por petición la latencia (por nombre de URL, método y clase de
+    estado) y las consultas SQL y su tiempo por vista (ver `apps/core/metricas.py`).
+    Se desactiva si `prometheus_client` no está instalado.
+    """
+
+    def __init__(self, get_response):
+        if not metricas.DISPONIBLE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefijo_estaticos = settings.STATIC_URL and '/' + settings.STATIC_URL.lstrip('/')
+
+    def __call__(self, request):
+        contador = _ContadorConsultas()
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(contador))
+            response = self.get_response(request)
+        duracion = time.perf_counter() - inicio
+
+        vista = self._vista(request)
+        metricas.PETICIONES_DURACION.labels(vista, request.method, f"{response.status_code // 100}xx").observe(duracion)
+        metricas.DB_CONSULTAS.labels(vista).observe(contador.consultas)
+        metricas.DB_DURACION.labels(vista).observe(contador.segundos)
+        return response
+
+    def _vista(self, request) -> str:
+        # Nombres de URL y no rutas: la cardinalidad de las etiquetas queda acotada.
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            return match.view_name or match._func_path
+        if self.prefijo_estaticos and request.path.startswith(self.prefijo_estaticos):
+            return 'estaticos'
+        return 'sin_ruta'
+
+
+@dataclass(frozen=True)
+class ArchivoEstatico:
+    ruta: str
+    tamano: int
+    modificado: float
+    content_type: str
+    inmutable: bool
+    # {'br': (ruta, tamaño), 'gzip': (ruta, tamaño)} con las variantes que existan.
+    variantes: dict
+
+
+class StaticFilesMiddleware:
+    """
+    Sirve `STATIC_ROOT` desde la propia aplicación (WSGI/ASGI), sin pasar por
+    sesiones, autenticación ni base de datos.
+
+    - Índice de ficheros construido una vez al arrancar: cada petición es una
+      búsqueda en un diccionario (tras `collectstatic` hay que reiniciar, como
+      en cualquier despliegue).
+    - Sirve la variante `.br` o `.gz` precomprimida en `collectstatic`
+      (`CompressedManifestStaticFilesStorage`) según `Accept-Encoding`, con
+      `Vary: Accept-Encoding`.
+    - Los ficheros con hash del manifiesto se marcan `immutable` durante un año:
+      el navegador no vuelve a pedirlos. El resto lleva un cache corto y ETag.
+    """
+    CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+    CACHE_CORTO = 'public, max-age=60'
+    CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefijo = '/' + settings.STATIC_URL.lstrip('/')
+        self.ficheros = self._indexar(settings.STATIC_ROOT) if settings.STATIC_ROOT else {}
+        if not self.ficheros:
+            logger.warning("STATIC_ROOT vacío o inexistente: ejecute collectstatic. No se servirán estáticos.")
+            raise MiddlewareNotUsed
+
+    def _indexar(self, raiz) -> dict:
+        raiz = os.fspath(raiz)
+        if not os.path.isdir(raiz):
+            return {}
+        try:
+            with open(os.path.join(raiz, 'staticfiles.json'), encoding='utf-8') as manifiesto:
+                con_hash = set(json.load(manifiesto).get('paths', {}).values())
+        except (OSError, ValueError):
+            con_hash = set()
+
+        ficheros = {}
+        for directorio, _, nombres in os.walk(raiz):
+            for nombre in nombres:
+                if nombre.endswith(('.gz', '.br')):
+                    continue
+                ruta = os.path.join(directorio, nombre)
+                relativa = os.path.relpath(ruta, raiz).replace(os.sep, '/')
+                info = os.stat(ruta)
+                variantes = {}
+                for codificacion, extension in self.CODIFICACIONES:
+                    if os.path.exists(ruta + extension):
+                        variantes[codificacion] = (ruta + extension, os.path.getsize(ruta + extension))
+                ficheros[relativa] = ArchivoEstatico(
+                    ruta=ruta,
+                    tamano=info.st_size,
+                    modificado=info.st_mtime,
+                    content_type=mimetypes.guess_type(nombre)[0] or 'application/octet-stream',
+                    inmutable=relativa in con_hash,
+                    variantes=variantes,
+                )
+        return ficheros
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(self.prefijo):
+            archivo = self.ficheros.get(request.path[len(self.prefijo):])
+            if archivo is not None:
+                return self._servir(request, archivo)
+        return self.get_response(request)
+
+    def _servir(self, request, archivo: ArchivoEstatico):
+        aceptadas = {c.split(';')[0].strip() for c in request.headers.get('accept-encoding', '').split(',')}
+        ruta, tamano, codificacion = archivo.ruta, archivo.tamano, None
+        for candidata, _ in self.CODIFICACIONES:
+            if candidata in archivo.variantes and candidata in aceptadas:
+                (ruta, tamano), codificacion = archivo.variantes[candidata], candidata
+                break
+
+        etag = f'"{int(archivo.modificado):x}-{tamano:x}{"-" + codificacion if codificacion else ""}"'
+        if request.headers.get('if-none-match') == etag:
+            response = HttpResponseNotModified()
+        elif request.method == 'HEAD':
+            response = HttpResponse(content_type=archivo.content_type)
+            response['Content-Length'] = str(tamano)
+        else:
+            response = FileResponse(open(ruta, 'rb'), content_type=archivo.content_type)
+            response['Content-Length'] = str(tamano)
+
+        if codificacion:
+            response['Content-Encoding'] = codificacion
+        if archivo.variantes:
+            response['Vary'] = 'Accept-Encoding'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(archivo.modificado)
+        response['Cache-Control'] = self.CACHE_INMUTABLE if archivo.inmutable else self.CACHE_CORTO
+        return response
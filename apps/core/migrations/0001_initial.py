@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('empresa', '0003_empresa_usuarios'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trabajo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='Fecha de Modificación')),
+                ('tarea', models.CharField(max_length=100, verbose_name='Tarea')),
+                ('parametros', models.JSONField(blank=True, default=dict, verbose_name='Parámetros')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='pendiente', max_length=12, verbose_name='Estado')),
+                ('clave_idempotencia', models.CharField(blank=True, help_text='Encolar dos veces con la misma clave devuelve el mismo trabajo.', max_length=200, null=True, unique=True, verbose_name='Clave de idempotencia')),
+                ('procesados', models.PositiveIntegerField(default=0, verbose_name='Procesados')),
+                ('total', models.PositiveIntegerField(blank=True, null=True, verbose_name='Total')),
+                ('mensaje', models.CharField(blank=True, max_length=255, verbose_name='Mensaje')),
+                ('resultado', models.JSONField(blank=True, null=True, verbose_name='Resultado')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('max_intentos', models.PositiveSmallIntegerField(default=3, verbose_name='Máximo de intentos')),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Disponible desde')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('latido', models.DateTimeField(blank=True, null=True, verbose_name='Último latido')),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True, verbose_name='Inicio')),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trabajos', to='empresa.empresa', verbose_name='Empresa')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Trabajo',
+                'verbose_name_plural': 'Trabajos',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'disponible_desde'], name='trabajo_cola_idx')],
+            },
+        ),
+    ]
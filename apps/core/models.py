@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 class TimeStampedModel(models.Model):
@@ -26,3 +28,72 @@ class SoftDeleteModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class Trabajo(TimeStampedModel):
+    """
+    Operación larga (importación, exportación, recálculo, calentamiento de
+    cache) ejecutada fuera del ciclo de la petición por `run_worker`.
+
+    La propia tabla es la cola: no hace falta un broker externo. Ver
+    `apps.core.trabajos` para encolar, registrar tareas y ejecutarlas.
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = 'pendiente', _('Pendiente')
+        EN_CURSO = 'en_curso', _('En curso')
+        COMPLETADO = 'completado', _('Completado')
+        FALLIDO = 'fallido', _('Fallido')
+
+    tarea = models.CharField(_('Tarea'), max_length=100)
+    parametros = models.JSONField(_('Parámetros'), default=dict, blank=True)
+    estado = models.CharField(_('Estado'), max_length=12, choices=Estado.choices, default=Estado.PENDIENTE)
+    clave_idempotencia = models.CharField(
+        _('Clave de idempotencia'), max_length=200, unique=True, null=True, blank=True,
+        help_text=_('Encolar dos veces con la misma clave devuelve el mismo trabajo.')
+    )
+    empresa = models.ForeignKey(
+        'empresa.Empresa', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='trabajos', verbose_name=_('Empresa')
+    )
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='trabajos', verbose_name=_('Solicitado por')
+    )
+
+    # Progreso
+    procesados = models.PositiveIntegerField(_('Procesados'), default=0)
+    total = models.PositiveIntegerField(_('Total'), null=True, blank=True)
+    mensaje = models.CharField(_('Mensaje'), max_length=255, blank=True)
+    resultado = models.JSONField(_('Resultado'), null=True, blank=True)
+    error = models.TextField(_('Error'), blank=True)
+
+    # Reintentos y reparto entre workers
+    intentos = models.PositiveSmallIntegerField(_('Intentos'), default=0)
+    max_intentos = models.PositiveSmallIntegerField(_('Máximo de intentos'), default=3)
+    disponible_desde = models.DateTimeField(_('Disponible desde'), default=timezone.now)
+    worker = models.CharField(_('Worker'), max_length=100, blank=True)
+    latido = models.DateTimeField(_('Último latido'), null=True, blank=True)
+    fecha_inicio = models.DateTimeField(_('Inicio'), null=True, blank=True)
+    fecha_fin = models.DateTimeField(_('Fin'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Trabajo')
+        verbose_name_plural = _('Trabajos')
+        ordering = ['-fecha_creacion']
+        indexes = [
+            # Lo que consulta cada worker al buscar el siguiente trabajo.
+            models.Index(fields=['estado', 'disponible_desde'], name='trabajo_cola_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tarea} #{self.pk} ({self.get_estado_display()})"
+
+    @property
+    def porcentaje(self):
+        if not self.total:
+            return 100 if self.estado == self.Estado.COMPLETADO else None
+        return min(100, round(self.procesados * 100 / self.total))
+
+    @property
+    def terminado(self) -> bool:
+        return self.estado in (self.Estado.COMPLETADO, self.Estado.FALLIDO)
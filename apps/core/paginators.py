@@ -0,0 +1,54 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from .cache import leer_cache
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginador para changelists grandes del admin que evita el `COUNT(*)` exacto.
+
+    - Sin filtros y en PostgreSQL usa la estimación del planificador
+      (`pg_class.reltuples`), que es instantánea a cualquier tamaño.
+    - En el resto de casos cachea el `COUNT(*)` por consulta (SQL + parámetros)
+      durante `CACHE_TIMEOUTS['CONTEOS_ADMIN']`; el total puede ir unos minutos
+      por detrás de la tabla, algo aceptable para paginar el admin.
+
+    Por debajo de `umbral_estimacion` filas la estimación es poco fiable
+    (o -1 si la tabla nunca se analizó) y se cuenta de verdad.
+    """
+    umbral_estimacion = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            estimado = self._filas_estimadas(connection, queryset.model._meta.db_table)
+            if estimado >= self.umbral_estimacion:
+                return estimado
+
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+        huella = hashlib.md5(f'{sql}|{params}'.encode(), usedforsecurity=False).hexdigest()
+        cache_key = f'conteo_admin_{huella}'
+        total = leer_cache(cache_key)
+        if total is None:
+            total = super().count
+            cache.set(cache_key, total, settings.CACHE_TIMEOUTS['CONTEOS_ADMIN'])
+        return total
+
+    @staticmethod
+    def _filas_estimadas(connection, tabla: str) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [tabla]
+            )
+            fila = cursor.fetchone()
+        return fila[0] if fila and fila[0] is not None else -1
@@ -0,0 +1,101 @@
+"""
+Precompilación de plantillas al arrancar un worker.
+
+Con el cargador cacheado (`TEMPLATES` en settings), cada worker compila una
+plantilla la primera vez que la usa y la guarda en memoria. Sin precompilar,
+el primer usuario que abre cada página tras un despliegue o un reciclado de
+workers paga esa compilación (lectura de disco, análisis, `{% extends %}` e
+`{% include %}` en cadena).
+
+`precompilar_plantillas()` recorre `templates/` y los directorios `templates`
+de las apps, y carga cada fichero a través del motor, de modo que queda en el
+cache del cargador con la misma clave que usarán las vistas. Se llama desde
+`post_worker_init` de gunicorn.conf.py, y no desde `AppConfig.ready`, para no
+penalizar `migrate`, los tests ni el resto de comandos.
+"""
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders.cached import Loader as CargadorCacheado
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONES = ('.html', '.txt')
+
+
+@dataclass
+class InformePrecompilacion:
+    plantillas: int = 0
+    segundos: float = 0.0
+    errores: List[Tuple[str, str]] = field(default_factory=list)
+    # (segundos, nombre) de las que más tardaron en compilar.
+    lentas: List[Tuple[float, str]] = field(default_factory=list)
+
+
+def nombres_plantillas(directorios) -> List[str]:
+    """Nombres (relativos a su directorio) de las plantillas, sin repetir."""
+    nombres = {}
+    for directorio in directorios:
+        directorio = str(directorio)
+        for raiz, _, ficheros in os.walk(directorio):
+            for fichero in ficheros:
+                if fichero.endswith(EXTENSIONES):
+                    ruta = os.path.relpath(os.path.join(raiz, fichero), directorio)
+                    nombres.setdefault(ruta.replace(os.sep, '/'), None)
+    return list(nombres)
+
+
+def _directorios_cacheados(motor) -> list:
+    """Directorios que recorren los cargadores envueltos por el cargador cacheado."""
+    directorios = []
+    for cargador in motor.template_loaders:
+        if isinstance(cargador, CargadorCacheado):
+            for interno in cargador.loaders:
+                directorios.extend(interno.get_dirs())
+    return directorios
+
+
+def precompilar_plantillas(max_lentas: int = 5) -> InformePrecompilacion:
+    """
+    Compila todas las plantillas en los motores Django con cargador cacheado y
+    devuelve cuántas, cuánto tardó y cuáles fallaron o fueron más lentas. Una
+    plantilla con errores no detiene el resto: se informa y se sigue.
+    """
+    informe = InformePrecompilacion()
+    tiempos = []
+    inicio = time.perf_counter()
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        motor = backend.engine
+        # Sin cargador cacheado no hay directorios: compilar ahora no ahorraría nada.
+        for nombre in nombres_plantillas(_directorios_cacheados(motor)):
+            t0 = time.perf_counter()
+            try:
+                motor.get_template(nombre)
+            except (TemplateSyntaxError, TemplateDoesNotExist, UnicodeDecodeError) as exc:
+                informe.errores.append((nombre, str(exc)))
+                continue
+            tiempos.append((time.perf_counter() - t0, nombre))
+            informe.plantillas += 1
+    informe.segundos = time.perf_counter() - inicio
+    informe.lentas = sorted(tiempos, reverse=True)[:max_lentas]
+    return informe
+
+
+def precompilar_y_registrar() -> InformePrecompilacion:
+    """Precompila y deja el informe de tiempos en el log (para el arranque de los workers)."""
+    informe = precompilar_plantillas()
+    logger.info(
+        "Plantillas precompiladas: %s en %.0f ms (pid %s); más lentas: %s",
+        informe.plantillas, informe.segundos * 1000, os.getpid(),
+        ', '.join(f"{nombre} {segundos * 1000:.1f} ms" for segundos, nombre in informe.lentas) or '-',
+    )
+    for nombre, error in informe.errores:
+        logger.warning("No se pudo precompilar la plantilla %s: %s", nombre, error)
+    return informe
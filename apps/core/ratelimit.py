@@ -0,0 +1,138 @@
+"""
+Límite de peticiones por usuario y empresa con ventana deslizante.
+
+Sustituye al límite fijo por IP: las oficinas detrás de un mismo NAT no
+comparten cupo y no hay bloqueos en bloque al cambiar el minuto.
+
+Algoritmo (contador de ventana deslizante): se cuentan las peticiones de la
+ventana fija actual y de la anterior, y se estima el total de los últimos
+`ventana` segundos ponderando la anterior por la fracción que aún solapa:
+
+    estimado = previa * (1 - transcurrido / ventana) + actual
+
+Con Redis (django_redis) el incremento, la caducidad y la lectura de la ventana
+anterior van en un único script Lua atómico: un viaje de ida y vuelta por
+petición. Con cualquier otro backend se usan `add` + `incr` + `get`, que son
+atómicos en LocMemCache y en `apps.core.cache_backends.SQLiteCache`.
+
+Cada vista usa el presupuesto de su ámbito (`RATELIMIT_PRESUPUESTOS`),
+asignado por nombre de URL en `RATELIMIT_RUTAS` o con el decorador `limitar`.
+"""
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+
+AMBITO_POR_DEFECTO = 'default'
+
+UNIDADES = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+SCRIPT_LUA = """
+local actual = redis.call('INCR', KEYS[1])
+if actual == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+local previa = tonumber(redis.call('GET', KEYS[2]) or '0')
+return {actual, previa}
+"""
+
+
+@dataclass(frozen=True)
+class Limite:
+    cantidad: int
+    ventana: int  # segundos
+
+
+@dataclass(frozen=True)
+class Resultado:
+    permitido: bool
+    limite: Limite
+    restantes: int
+    reintentar_en: int  # segundos hasta que vuelva a haber cupo (0 si se permite)
+
+
+@lru_cache(maxsize=None)
+def parsear_limite(texto: str) -> Limite:
+    """Convierte '100/m', '10/h' o '5/30s' en un `Limite`."""
+    cantidad, periodo = texto.split('/')
+    multiplo = periodo[:-1] or '1'
+    return Limite(int(cantidad), int(multiplo) * UNIDADES[periodo[-1]])
+
+
+def limite_de(ambito: str) -> Limite:
+    presupuestos = settings.RATELIMIT_PRESUPUESTOS
+    return parsear_limite(presupuestos.get(ambito, presupuestos[AMBITO_POR_DEFECTO]))
+
+
+def limitar(ambito: str):
+    """Asigna a una vista un presupuesto propio (lo lee `RatelimitMiddleware`)."""
+    def decorador(vista):
+        vista.ratelimit_ambito = ambito
+        return vista
+    return decorador
+
+
+def identidad_peticion(request) -> str:
+    """Usuario + empresa activa; los anónimos (login, landing) se agrupan por IP."""
+    usuario = getattr(request, 'user', None)
+    if usuario is not None and usuario.is_authenticated:
+        empresa_id = request.session.get('empresa_id', '-')
+        return f"u{usuario.pk}:e{empresa_id}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+@lru_cache(maxsize=None)
+def _script_redis(alias: str):
+    """Script Lua registrado si el cache es django_redis; None en otro caso."""
+    backend = caches[alias]
+    if not type(backend).__module__.startswith('django_redis'):
+        return None
+    from django_redis import get_redis_connection
+    return get_redis_connection(alias).register_script(SCRIPT_LUA)
+
+
+def _contar(alias: str, clave_actual: str, clave_previa: str, caducidad: int):
+    script = _script_redis(alias)
+    if script is not None:
+        actual, previa = script(keys=[clave_actual, clave_previa], args=[caducidad])
+        return int(actual), int(previa)
+
+    cache = caches[alias]
+    cache.add(clave_actual, 0, caducidad)
+    try:
+        actual = cache.incr(clave_actual)
+    except ValueError:
+        # Caducó entre `add` e `incr`: empieza de nuevo.
+        cache.set(clave_actual, 1, caducidad)
+        actual = 1
+    return actual, int(cache.get(clave_previa) or 0)
+
+
+def consumir(ambito: str, identidad: str, ahora: float = None) -> Resultado:
+    """Registra una petición de `identidad` en `ambito` y decide si se permite."""
+    limite = limite_de(ambito)
+    ahora = time.time() if ahora is None else ahora
+    indice, transcurrido = divmod(ahora, limite.ventana)
+    prefijo = f"rl:{ambito}:{identidad}"
+
+    actual, previa = _contar(
+        settings.RATELIMIT_USE_CACHE,
+        f"{prefijo}:{int(indice)}",
+        f"{prefijo}:{int(indice) - 1}",
+        # La ventana actual se lee aún durante la siguiente.
+        2 * limite.ventana,
+    )
+    peso_previa = 1 - transcurrido / limite.ventana
+    estimado = previa * peso_previa + actual
+
+    if estimado <= limite.cantidad:
+        return Resultado(True, limite, int(limite.cantidad - estimado), 0)
+
+    # Tiempo hasta que el peso de la ventana anterior baje lo suficiente (o a la siguiente ventana).
+    if previa and actual <= limite.cantidad:
+        espera = (estimado - limite.cantidad) / previa * limite.ventana
+    else:
+        espera = limite.ventana - transcurrido
+    return Resultado(False, limite, 0, max(1, int(espera + 0.999)))
@@ -0,0 +1,59 @@
+import gzip
+import logging
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # Brotli es opcional: sin él solo se generan las variantes .gz
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Extensiones de texto que merece la pena comprimir (las imágenes ya lo están).
+EXTENSIONES_COMPRIMIBLES = ('.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico')
+TAMANO_MINIMO = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    `ManifestStaticFilesStorage` que además escribe variantes `.gz` y `.br`
+    de cada fichero de texto durante `collectstatic`.
+
+    Comprimir una sola vez, con el nivel máximo, permite servir los estáticos
+    desde la aplicación (ver `StaticFilesMiddleware`) sin coste de CPU por
+    petición. Una variante solo se guarda si es más pequeña que el original.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        # Tras las pasadas del manifiesto, `hashed_files` tiene el nombre final de
+        # cada fichero. Se comprimen el original y su versión con hash; el
+        # manifiesto sigue apuntando a los nombres sin extensión de compresión.
+        rutas = set(paths)
+        rutas.update(self.hashed_files.values())
+        for ruta in sorted(rutas):
+            if ruta.lower().endswith(EXTENSIONES_COMPRIMIBLES) and self.exists(ruta):
+                self._comprimir(ruta)
+
+    def _comprimir(self, nombre: str) -> None:
+        ruta = self.path(nombre)
+        with open(ruta, 'rb') as fichero:
+            contenido = fichero.read()
+        if len(contenido) < TAMANO_MINIMO:
+            return
+
+        variantes = {'.gz': gzip.compress(contenido, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variantes['.br'] = brotli.compress(contenido, quality=11)
+
+        for extension, comprimido in variantes.items():
+            if len(comprimido) < len(contenido):
+                with open(ruta + extension, 'wb') as fichero:
+                    fichero.write(comprimido)
+                os.utime(ruta + extension, (os.path.getatime(ruta), os.path.getmtime(ruta)))
+        logger.debug("Variantes comprimidas generadas para %s", nombre)
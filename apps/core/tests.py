@@ -0,0 +1,744 @@
+import json
+from datetime import datetime
+import logging
+import tempfile
+from io import StringIO
+import threading
+import time
+from unittest import skipUnless
+from unittest.mock import patch
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from django.core.cache import cache
+from django.contrib.auth.models import User, Permission
+
+from apps.empresa.tests import crear_empresas_de_prueba
+from apps.inventario.models import AlertaStock, Bodega, Existencia, Producto
+from apps.terceros.models import Tercero, TipoTercero
+from .db_router import ReplicaRouter, lectura_en_replica, nombres_replicas, _forzar_primario
+from .middleware import ReplicaPinMiddleware, RatelimitMiddleware, StaticFilesMiddleware
+from .ratelimit import consumir, limitar, limite_de, parsear_limite, Limite
+from .utils import ubicacion_inicial
+from .cache import clave_versionada, invalidar_namespace, namespace_empresa
+from .cache_backends import SQLiteCache
+from .bloom import FiltroBloom
+from . import metricas
+from .logs import FiltroMuestreo, FormateadorJSON
+from .models import Trabajo
+from .plantillas import precompilar_plantillas
+from .trabajos import (
+    bucle_worker, ejecutar, encolar, encolar_unico, reclamar_siguiente, recuperar_huerfanos, tarea, TIEMPO_HUERFANO,
+)
+
+
+class ReplicaRouterTestCase(TestCase):
+    """Tests del enrutado de lecturas a réplicas."""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.router.replicas = ['replica_1']
+
+    def test_lecturas_fuera_de_contexto_van_al_primario(self):
+        self.assertEqual(self.router.db_for_read(Tercero), 'default')
+
+    def test_lecturas_en_contexto_van_a_la_replica(self):
+        with lectura_en_replica():
+            self.assertEqual(self.router.db_for_read(Tercero), 'replica_1')
+
+    def test_primario_forzado_tras_escritura(self):
+        token = _forzar_primario.set(True)
+        try:
+            with lectura_en_replica():
+                self.assertEqual(self.router.db_for_read(Tercero), 'default')
+        finally:
+            _forzar_primario.reset(token)
+
+    def test_escrituras_y_migraciones_solo_en_primario(self):
+        with lectura_en_replica():
+            self.assertEqual(self.router.db_for_write(Tercero), 'default')
+        self.assertFalse(self.router.allow_migrate('replica_1', 'terceros'))
+        self.assertTrue(self.router.allow_migrate('default', 'terceros'))
+
+
+@skipUnless(nombres_replicas(), "Requiere DATABASE_REPLICA_URLS (p. ej. un segundo fichero SQLite).")
+class ReplicaIntegracionTestCase(TransactionTestCase):
+    """
+    Prueba de integración con una réplica real. En los tests la réplica es un
+    espejo ('MIRROR') de la base de datos de pruebas principal.
+    """
+    databases = '__all__'
+
+    def test_consulta_se_ejecuta_en_la_replica(self):
+        alias = nombres_replicas()[0]
+        with CaptureQueriesContext(connections[alias]) as ctx:
+            with lectura_en_replica():
+                list(Tercero.objects.all()[:1])
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+@override_settings(DATABASE_REPLICA_PIN_SECONDS=5)
+class ReplicaPinMiddlewareTestCase(TestCase):
+    """Tests de la persistencia de lecturas en el primario tras una escritura."""
+
+    def test_escritura_fija_el_primario_con_una_cookie(self):
+        def vista_que_escribe(request):
+            ReplicaRouter().db_for_write(Tercero)
+            return HttpResponse()
+
+        response = ReplicaPinMiddleware(vista_que_escribe)(RequestFactory().post('/'))
+
+        self.assertIn(ReplicaPinMiddleware.cookie_name, response.cookies)
+        self.assertGreater(float(response.cookies[ReplicaPinMiddleware.cookie_name].value), time.time())
+
+    def test_cookie_vigente_fuerza_el_primario(self):
+        observado = {}
+
+        def vista_de_lectura(request):
+            observado['forzar_primario'] = _forzar_primario.get()
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.COOKIES[ReplicaPinMiddleware.cookie_name] = str(time.time() + 5)
+        response = ReplicaPinMiddleware(vista_de_lectura)(request)
+
+        self.assertTrue(observado['forzar_primario'])
+        self.assertNotIn(ReplicaPinMiddleware.cookie_name, response.cookies)
+        self.assertFalse(_forzar_primario.get())
+
+
+class TenantQuerySetTestCase(TestCase):
+    """Tests de las proyecciones del QuerySet multi-empresa."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_empresas_de_prueba(cls)
+        tipo_tercero = TipoTercero.objects.create(nombre="Cliente")
+        for empresa, nroid in [(cls.empresa, '1'), (cls.empresa, '2'), (cls.otra_empresa, '1')]:
+            responsable = Tercero.objects.create(
+                empresa=empresa, tipo_tercero=tipo_tercero, tipo_identificacion=cls.tipo_id,
+                nroid=nroid, nombre=f"Tercero {nroid}", ciudad=cls.ciudad
+            )
+        Bodega.objects.create(empresa=cls.empresa, nombre="Principal", ciudad=cls.ciudad, responsable=responsable)
+
+    def test_de_empresa_acepta_instancia_o_id(self):
+        self.assertEqual(Tercero.objects.de_empresa(self.empresa).count(), 2)
+        self.assertEqual(Tercero.objects.de_empresa(str(self.empresa.pk)).count(), 2)
+
+    def test_lista_de_terceros_sin_consultas_perezosas(self):
+        terceros = list(Tercero.objects.de_empresa(self.empresa).para_lista())
+        with self.assertNumQueries(0):
+            for tercero in terceros:
+                (tercero.pk, tercero.nombre, tercero.nroid, tercero.telefono,
+                 tercero.email, tercero.activo, tercero.tipo_identificacion.nombre)
+
+    def test_lista_de_bodegas_sin_consultas_perezosas(self):
+        bodegas = list(Bodega.objects.de_empresa(self.empresa).activos().para_lista())
+        with self.assertNumQueries(0):
+            for bodega in bodegas:
+                (bodega.pk, bodega.nombre, bodega.ciudad.nombre,
+                 bodega.ciudad.division.nombre, bodega.responsable.nombre)
+
+    def test_detalle_precarga_la_cadena_geografica(self):
+        tercero = Tercero.objects.de_empresa(self.empresa).para_detalle().first()
+        with self.assertNumQueries(0):
+            tercero.tipo_tercero.nombre
+            tercero.ciudad.division.pais.nombre
+
+    def test_choices_sin_instanciar_modelos(self):
+        self.assertEqual(
+            list(Tercero.objects.de_empresa(self.empresa).para_choices()),
+            list(Tercero.objects.filter(empresa=self.empresa).order_by('nombre').values_list('id', 'nombre'))
+        )
+
+    def test_modelos_sin_activo_usan_solo_el_filtro_por_empresa(self):
+        # Existencia y AlertaStock no tienen `activo` (ni AlertaStock `nombre`).
+        for modelo in (Existencia, AlertaStock):
+            queryset = modelo.objects.de_empresa(self.empresa)
+            self.assertFalse(hasattr(queryset, 'activos'))
+            self.assertFalse(hasattr(queryset, 'cambiar_activo'))
+            self.assertEqual(list(queryset.para_lista()), [])
+        self.assertEqual(list(Producto.objects.de_empresa(self.empresa).para_choices()), [])
+
+
+def consultas_geografia(queries):
+    """Consultas capturadas que leen por separado alguna tabla geográfica."""
+    tablas = ('"terceros_pais"', '"terceros_division"', '"terceros_ciudad"')
+    return [q for q in queries if q['sql'].lstrip().startswith('SELECT')
+            and any(f'FROM {t}' in q['sql'] for t in tablas)]
+
+
+class EdicionConUbicacionTestCase(TestCase):
+    """
+    Presupuesto de consultas de las vistas de edición con selector de ubicación:
+    el objeto y su cadena ciudad → división → país se cargan en UNA consulta.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_empresas_de_prueba(cls)
+        tipo_tercero = TipoTercero.objects.create(nombre="Cliente")
+        cls.tercero = Tercero.objects.create(
+            empresa=cls.empresa, tipo_tercero=tipo_tercero, tipo_identificacion=cls.tipo_id,
+            nroid='1', nombre="Tercero 1", ciudad=cls.ciudad
+        )
+        cls.bodega = Bodega.objects.create(empresa=cls.empresa, nombre="Principal", ciudad=cls.ciudad, responsable=cls.tercero)
+        cls.user = User.objects.create_user('usuario', 'usuario@test.com', 'pass')
+        cls.user.user_permissions.add(Permission.objects.get(codename='change_empresa'))
+        cls.empresa.usuarios.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='usuario', password='pass')
+        session = self.client.session
+        session['empresa_id'] = self.empresa.pk
+        session['empresa_nombre'] = self.empresa.nombre
+        session.save()
+
+    def assertUbicacionEnUnaConsulta(self, url, tabla):
+        # Primera petición: calienta los caches de choices, permisos y membresías.
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['ubicacion_inicial'], ubicacion_inicial(self.ciudad))
+        cargas = [q for q in ctx.captured_queries if f'FROM "{tabla}"' in q['sql']]
+        self.assertEqual(len(cargas), 1)
+        self.assertIn('"terceros_pais"', cargas[0]['sql'])
+        self.assertEqual(consultas_geografia(ctx.captured_queries), [])
+        return ctx
+
+    def test_edicion_de_tercero(self):
+        self.assertUbicacionEnUnaConsulta(
+            reverse('terceros:editar_tercero', kwargs={'pk': self.tercero.pk}), 'terceros_tercero'
+        )
+
+    def test_edicion_de_bodega(self):
+        self.assertUbicacionEnUnaConsulta(
+            reverse('inventario:editar_bodega', kwargs={'pk': self.bodega.pk}), 'inventario_bodega'
+        )
+
+    def test_edicion_de_empresa(self):
+        self.assertUbicacionEnUnaConsulta(
+            reverse('empresa:editar_empresa', kwargs={'pk': self.empresa.pk}), 'empresa_empresa'
+        )
+
+    def test_bodega_de_otra_empresa_no_se_puede_editar(self):
+        bodega = Bodega.objects.create(empresa=self.otra_empresa, nombre="Ajena", ciudad=self.ciudad)
+        response = self.client.get(reverse('inventario:editar_bodega', kwargs={'pk': bodega.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_ubicacion_inicial_sin_ciudad(self):
+        self.assertIsNone(ubicacion_inicial(None))
+
+
+CACHES_DE_PRUEBA = {
+    'locmem': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas-namespaces'},
+    'filebased': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/guia-pruebas-cache'},
+    'sqlite': {'BACKEND': 'apps.core.cache_backends.SQLiteCache', 'LOCATION': '/tmp/guia-pruebas-cache.sqlite3'},
+}
+
+
+class NamespaceCacheTestCase(SimpleTestCase):
+    """La invalidación por namespace se comporta igual en cada backend."""
+
+    def test_invalidar_namespace_en_cada_backend(self):
+        for nombre, configuracion in CACHES_DE_PRUEBA.items():
+            with self.subTest(backend=nombre), override_settings(CACHES={'default': configuracion}):
+                cache.clear()
+                uno, dos = namespace_empresa(1), namespace_empresa(2)
+                cache.set(clave_versionada('dashboard_stats_1', uno), 'a')
+                cache.set(clave_versionada('terceros_choices_1', uno), 'b')
+                cache.set(clave_versionada('dashboard_stats_2', dos), 'c')
+
+                invalidar_namespace(uno)
+
+                self.assertIsNone(cache.get(clave_versionada('dashboard_stats_1', uno)))
+                self.assertIsNone(cache.get(clave_versionada('terceros_choices_1', uno)))
+                self.assertEqual(cache.get(clave_versionada('dashboard_stats_2', dos)), 'c')
+                cache.clear()
+
+    def test_clave_con_varios_namespaces(self):
+        cache.clear()
+        clave = clave_versionada('informe', 'geonames', namespace_empresa(1))
+        self.assertEqual(clave, clave_versionada('informe', 'geonames', namespace_empresa(1)))
+
+        invalidar_namespace('geonames')
+        self.assertNotEqual(clave, clave_versionada('informe', 'geonames', namespace_empresa(1)))
+
+    def test_version_expulsada_no_resucita_claves_antiguas(self):
+        cache.clear()
+        antigua = clave_versionada('dato', 'pruebas')
+        cache.set(antigua, 'viejo')
+        cache.delete('ns_version:pruebas')
+        time.sleep(0.002)
+
+        self.assertNotEqual(clave_versionada('dato', 'pruebas'), antigua)
+
+
+class SQLiteCacheTestCase(SimpleTestCase):
+    """Tests del backend de cache local sobre SQLite."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta = f"{directorio.name}/cache.sqlite3"
+        self.cache = SQLiteCache(self.ruta, {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}})
+
+    def test_operaciones_basicas_y_caducidad(self):
+        self.cache.set('geonames', [{'nombre': 'Colombia'}], 60)
+        self.cache.set('efimera', 'x', 0.01)
+        time.sleep(0.02)
+
+        self.assertEqual(self.cache.get('geonames'), [{'nombre': 'Colombia'}])
+        self.assertIsNone(self.cache.get('efimera'))
+        self.assertEqual(self.cache.get_many(['geonames', 'efimera']), {'geonames': [{'nombre': 'Colombia'}]})
+        self.assertTrue(self.cache.delete('geonames'))
+        self.assertFalse(self.cache.has_key('geonames'))
+
+    def test_add_e_incr_como_ratelimit(self):
+        self.assertTrue(self.cache.add('rl:usuario', 0, 60))
+        self.assertFalse(self.cache.add('rl:usuario', 0, 60))
+        self.assertEqual(self.cache.incr('rl:usuario'), 1)
+        with self.assertRaises(ValueError):
+            self.cache.incr('no-existe')
+
+    def test_incr_atomico_entre_conexiones(self):
+        self.cache.set('contador', 0)
+        # Cada instancia abre su propia conexión, como lo harían varios workers.
+        instancias = [SQLiteCache(self.ruta, {}) for _ in range(4)]
+
+        def sumar(instancia):
+            for _ in range(50):
+                instancia.incr('contador')
+
+        hilos = [threading.Thread(target=sumar, args=(instancia,)) for instancia in instancias]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(self.cache.get('contador'), 200)
+
+    def test_tope_de_entradas_expulsa_las_menos_usadas(self):
+        self.cache.LRU_RESOLUCION = 0
+        for i in range(10):
+            self.cache.set(f'clave{i}', i)
+            time.sleep(0.001)
+        self.cache.get('clave0')  # la más antigua pasa a ser la más reciente
+
+        self.cache.set('nueva', 'x')
+        self.cache.purgar()
+
+        self.assertEqual(self.cache.get('clave0'), 0)
+        self.assertEqual(self.cache.get('nueva'), 'x')
+        self.assertIsNone(self.cache.get('clave1'))
+        self.assertLessEqual(len(self.cache.get_many([f'clave{i}' for i in range(10)] + ['nueva'])), 10)
+
+
+@override_settings(RATELIMIT_PRESUPUESTOS={'default': '3/m', 'geonames': '2/m'})
+class RatelimitTestCase(SimpleTestCase):
+    """Tests del límite de peticiones con ventana deslizante."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_parsear_limite(self):
+        self.assertEqual(parsear_limite('100/m'), Limite(100, 60))
+        self.assertEqual(parsear_limite('20/5m'), Limite(20, 300))
+
+    def test_ventana_deslizante_pondera_la_ventana_anterior(self):
+        inicio = 6000.0  # múltiplo de 60: comienzo de una ventana
+        for i in range(3):
+            self.assertTrue(consumir('default', 'u1:e1', ahora=inicio + i).permitido)
+        self.assertFalse(consumir('default', 'u1:e1', ahora=inicio + 3).permitido)
+
+        # Al empezar la siguiente ventana, la anterior (4 peticiones) aún pesa casi entera.
+        rechazo = consumir('default', 'u1:e1', ahora=inicio + 61)
+        self.assertFalse(rechazo.permitido)
+        self.assertGreater(rechazo.reintentar_en, 0)
+        # Al final de la ventana su peso es casi nulo.
+        self.assertTrue(consumir('default', 'u1:e1', ahora=inicio + 119).permitido)
+
+    def test_cupo_por_identidad_y_ambito(self):
+        ahora = 6000.0
+        for _ in range(3):
+            consumir('default', 'u1:e1', ahora=ahora)
+        self.assertTrue(consumir('default', 'u1:e2', ahora=ahora).permitido)
+        self.assertTrue(consumir('geonames', 'u1:e1', ahora=ahora).permitido)
+
+    def test_middleware_responde_429_con_presupuesto_propio(self):
+        @limitar('geonames')
+        def vista(request):
+            return HttpResponse()
+
+        middleware = RatelimitMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().get('/terceros/api/geonames/paises/', HTTP_ACCEPT='application/json')
+        request.user = type('Anonimo', (), {'is_authenticated': False})()
+
+        respuestas = [middleware.process_view(request, vista, (), {}) for _ in range(3)]
+
+        self.assertIsNone(respuestas[0])
+        self.assertIsNone(respuestas[1])
+        self.assertEqual(respuestas[2].status_code, 429)
+        self.assertIn('Retry-After', respuestas[2])
+
+    def test_encolar_trabajos_usa_su_presupuesto(self):
+        from django.urls import resolve
+        vista = resolve(reverse('terceros:api_recalcular_contadores')).func
+        self.assertEqual(vista.ratelimit_ambito, 'trabajos')
+        with self.settings(RATELIMIT_PRESUPUESTOS={'default': '3/m', 'trabajos': '10/h'}):
+            self.assertEqual(limite_de('trabajos'), Limite(10, 3600))
+
+
+class EstaticosPrecomprimidosTestCase(SimpleTestCase):
+    """`collectstatic` genera variantes comprimidas y el middleware las sirve con cache inmutable."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directorio = tempfile.TemporaryDirectory()
+        cls.ajustes = override_settings(
+            STATIC_ROOT=cls.directorio.name,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'apps.core.storage.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        cls.ajustes.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.middleware = StaticFilesMiddleware(lambda request: HttpResponse(status=404))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.ajustes.disable()
+        cls.directorio.cleanup()
+        super().tearDownClass()
+
+    def obtener(self, ruta, **cabeceras):
+        return self.middleware(RequestFactory().get(ruta, **cabeceras))
+
+    def test_css_con_hash_se_sirve_comprimido_e_inmutable(self):
+        from django.templatetags.static import static
+        url = static('css/main.css')
+        self.assertRegex(url, r'main\.[0-9a-f]{12}\.css$')
+
+        response = self.obtener(url, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(response['Content-Encoding'], ('br', 'gzip'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'text/css')
+
+        sin_compresion = self.obtener(url)
+        self.assertFalse(sin_compresion.has_header('Content-Encoding'))
+
+        no_modificado = self.obtener(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=self.obtener(url, HTTP_ACCEPT_ENCODING='gzip')['ETag'])
+        self.assertEqual(no_modificado.status_code, 304)
+
+    def test_nombre_sin_hash_lleva_cache_corto(self):
+        response = self.obtener('/static/css/main.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_ruta_desconocida_pasa_a_la_aplicacion(self):
+        self.assertEqual(self.obtener('/static/no-existe.css').status_code, 404)
+        self.assertEqual(self.obtener('/static/../settings.py').status_code, 404)
+
+
+class FiltroBloomTestCase(SimpleTestCase):
+
+    def test_sin_falsos_negativos_y_tasa_acotada(self):
+        filtro = FiltroBloom.para(2000, 0.01)
+        for i in range(2000):
+            filtro.add(f"900{i}")
+
+        self.assertTrue(all(f"900{i}" in filtro for i in range(2000)))
+        falsos_positivos = sum(f"otro{i}" in filtro for i in range(10000))
+        self.assertLess(falsos_positivos, 300)  # ~1 % esperado
+        self.assertFalse(filtro.saturado)
+
+    def test_ida_y_vuelta_por_el_cache(self):
+        filtro = FiltroBloom.para(10)
+        filtro.add('ñandú-1')
+
+        copia = FiltroBloom.desde_dict(filtro.a_dict())
+
+        self.assertIn('ñandú-1', copia)
+        self.assertEqual((copia.n, copia.capacidad), (1, 10))
+
+
+@tarea('pruebas.sumar')
+def _tarea_sumar(trabajo, progreso):
+    numeros = trabajo.parametros['numeros']
+    for i, _ in enumerate(numeros, start=1):
+        progreso.avanzar(i, len(numeros))
+    return {'suma': sum(numeros)}
+
+
+@tarea('pruebas.dormir')
+def _tarea_dormir(trabajo, progreso):
+    # No llama a `avanzar`: el latido lo mantiene `ejecutar`.
+    time.sleep(0.3)
+    return {'latido': Trabajo.objects.values_list('latido', flat=True).get(pk=trabajo.pk).isoformat()}
+
+
+@tarea('pruebas.fallar', max_intentos=2)
+def _tarea_fallar(trabajo, progreso):
+    raise RuntimeError("origen no disponible")
+
+
+class TrabajosTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('usuario', 'usuario@test.com', 'pass')
+        cls.otro = User.objects.create_user('otro', 'otro@test.com', 'pass')
+
+    def test_clave_de_idempotencia_devuelve_el_mismo_trabajo(self):
+        primero = encolar('pruebas.sumar', {'numeros': [1]}, usuario=self.user, clave_idempotencia='import-1')
+        segundo = encolar('pruebas.sumar', {'numeros': [2]}, usuario=self.user, clave_idempotencia='import-1')
+
+        self.assertEqual(primero.pk, segundo.pk)
+        self.assertEqual(Trabajo.objects.count(), 1)
+        with self.assertRaises(ValueError):
+            encolar('pruebas.no_existe')
+
+    def test_un_trabajo_solo_se_reclama_una_vez(self):
+        encolar('pruebas.sumar', {'numeros': [1, 2, 3]})
+
+        trabajo = reclamar_siguiente('w1')
+        self.assertEqual(trabajo.estado, Trabajo.Estado.EN_CURSO)
+        self.assertIsNone(reclamar_siguiente('w2'))
+
+        ejecutar(trabajo)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, Trabajo.Estado.COMPLETADO)
+        self.assertEqual(trabajo.resultado, {'suma': 6})
+        self.assertEqual((trabajo.procesados, trabajo.total, trabajo.porcentaje), (3, 3, 100))
+
+    def test_reintentos_con_espera_y_fallo_final(self):
+        encolar('pruebas.fallar')
+
+        with self.assertLogs('apps.core.trabajos', 'ERROR'):
+            trabajo = ejecutar(reclamar_siguiente('w1'))
+        self.assertEqual(trabajo.estado, Trabajo.Estado.PENDIENTE)
+        self.assertGreater(trabajo.disponible_desde, timezone.now())
+        self.assertIsNone(reclamar_siguiente('w1'))  # aún en espera
+
+        Trabajo.objects.update(disponible_desde=timezone.now())
+        with self.assertLogs('apps.core.trabajos', 'ERROR'):
+            trabajo = ejecutar(reclamar_siguiente('w1'))
+        self.assertEqual(trabajo.estado, Trabajo.Estado.FALLIDO)
+        self.assertEqual(trabajo.intentos, 2)
+        self.assertIn('origen no disponible', trabajo.error)
+
+    def test_huerfanos_vuelven_a_la_cola(self):
+        encolar('pruebas.sumar', {'numeros': [1]})
+        reclamar_siguiente('w1')
+        Trabajo.objects.update(latido=timezone.now() - TIEMPO_HUERFANO * 2)
+
+        self.assertEqual(recuperar_huerfanos(), 1)
+        self.assertIsNotNone(reclamar_siguiente('w2'))
+
+    def test_encolar_unico_mientras_esta_activo(self):
+        primero = encolar_unico('pruebas.sumar', {'numeros': [1]})
+        self.assertEqual(encolar_unico('pruebas.sumar', {'numeros': [1]}).pk, primero.pk)
+
+        ejecutar(reclamar_siguiente('w1'))
+        self.assertIsNone(Trabajo.objects.get(pk=primero.pk).clave_idempotencia)
+        self.assertNotEqual(encolar_unico('pruebas.sumar', {'numeros': [1]}).pk, primero.pk)
+
+    def test_resultado_de_un_trabajo_reasignado_se_descarta(self):
+        encolar('pruebas.sumar', {'numeros': [1]})
+        trabajo = reclamar_siguiente('w1')
+        # Se dio por huérfano y lo reclamó otro worker mientras w1 seguía.
+        Trabajo.objects.update(worker='w2')
+
+        with self.assertLogs('apps.core.trabajos', 'WARNING'):
+            ejecutar(trabajo)
+
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.worker, trabajo.resultado), (Trabajo.Estado.EN_CURSO, 'w2', None))
+
+    def test_estado_solo_para_quien_lo_encolo(self):
+        trabajo = encolar('pruebas.sumar', {'numeros': [4, 5]}, usuario=self.user)
+        ejecutar(reclamar_siguiente('w1'))
+        url = reverse('estado_trabajo', args=[trabajo.pk])
+
+        self.client.login(username='otro', password='pass')
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.client.login(username='usuario', password='pass')
+        data = self.client.get(url).json()
+        self.assertTrue(data['terminado'])
+        self.assertEqual(data['resultado'], {'suma': 9})
+
+
+class RunWorkerTestCase(TransactionTestCase):
+
+    def test_una_vez_vacia_la_cola(self):
+        for numeros in ([1, 2], [3]):
+            encolar('pruebas.sumar', {'numeros': numeros})
+
+        salida = StringIO()
+        call_command('run_worker', una_vez=True, stdout=salida)
+
+        self.assertIn('2 trabajo(s) ejecutado(s)', salida.getvalue())
+        self.assertEqual(
+            sorted(Trabajo.objects.values_list('resultado__suma', flat=True)), [3, 3]
+        )
+
+    def test_latido_mientras_corre_una_tarea_silenciosa(self):
+        encolar('pruebas.dormir')
+        trabajo = reclamar_siguiente('w1')
+        reclamado = trabajo.latido
+
+        with patch('apps.core.trabajos.INTERVALO_LATIDO', 0.05):
+            ejecutar(trabajo)
+
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, Trabajo.Estado.COMPLETADO)
+        self.assertGreater(datetime.fromisoformat(trabajo.resultado['latido']), reclamado)
+
+    def test_worker_en_marcha_recupera_huerfanos(self):
+        encolar('pruebas.sumar', {'numeros': [2, 2]})
+        reclamar_siguiente('muerto')
+        Trabajo.objects.update(latido=timezone.now() - TIEMPO_HUERFANO * 2)
+
+        with patch('apps.core.trabajos.INTERVALO_HUERFANOS', 0), self.assertLogs('apps.core.trabajos', 'WARNING'):
+            ejecutados = bucle_worker('vivo', threading.Event(), una_vez=True)
+
+        self.assertEqual(ejecutados, 1)
+        self.assertEqual(Trabajo.objects.get().resultado, {'suma': 4})
+
+
+class MetricasTestCase(TestCase):
+
+    def test_familias_de_claves_de_cache(self):
+        self.assertEqual(metricas.familia_cache('dashboard_stats_3:v17'), 'dashboard_stats')
+        self.assertEqual(metricas.familia_cache('geonames_ciudades_1_demo:v2'), 'geonames')
+        self.assertEqual(metricas.familia_cache('terceros_choices_3:v17'), 'choices')
+        self.assertEqual(metricas.familia_cache('tipos_identificacion_choices'), 'choices')
+        self.assertEqual(metricas.familia_cache('rl:default:ip:1'), 'otras')
+
+    @skipUnless(not metricas.DISPONIBLE, "prometheus_client instalado")
+    def test_sin_prometheus_el_endpoint_no_existe(self):
+        self.assertEqual(self.client.get(reverse('metricas')).status_code, 404)
+
+    @skipUnless(metricas.DISPONIBLE, "prometheus_client no instalado")
+    def test_exposicion_de_latencia_consultas_y_cache(self):
+        from prometheus_client import REGISTRY
+
+        def muestra(nombre, **etiquetas):
+            return REGISTRY.get_sample_value(nombre, etiquetas) or 0
+
+        antes = muestra('guia_http_request_duration_seconds_count', vista='landing_page', metodo='GET', estado='2xx')
+        fallos = muestra('guia_cache_reads_total', familia='choices', resultado='miss')
+        cache.clear()
+
+        self.client.get(reverse('landing_page'))
+        from apps.terceros.forms import TerceroForm
+        TerceroForm()
+
+        self.assertEqual(
+            muestra('guia_http_request_duration_seconds_count', vista='landing_page', metodo='GET', estado='2xx'),
+            antes + 1,
+        )
+        self.assertEqual(muestra('guia_cache_reads_total', familia='choices', resultado='miss'), fallos + 2)
+
+        with override_settings(METRICAS_TOKEN='secreto'):
+            self.assertEqual(self.client.get(reverse('metricas')).status_code, 401)
+            response = self.client.get(reverse('metricas'), HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'guia_db_queries_per_request_bucket', response.content)
+
+    @skipUnless(metricas.DISPONIBLE, "prometheus_client no instalado")
+    @override_settings(METRICAS_TOKEN='', DEBUG=False)
+    def test_sin_token_solo_staff(self):
+        self.assertEqual(self.client.get(reverse('metricas')).status_code, 404)
+
+        User.objects.create_user('normal', password='pass')
+        self.client.login(username='normal', password='pass')
+        self.assertEqual(self.client.get(reverse('metricas')).status_code, 404)
+
+        User.objects.create_user('staff', password='pass', is_staff=True)
+        self.client.login(username='staff', password='pass')
+        self.assertEqual(self.client.get(reverse('metricas')).status_code, 200)
+
+
+class LogsTestCase(SimpleTestCase):
+
+    def registro(self, msg, *args, nivel=logging.WARNING, **extra):
+        record = logging.LogRecord('apps.terceros.views', nivel, __file__, 10, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_formateador_json_incluye_extra(self):
+        linea = FormateadorJSON().format(self.registro("Devolviendo %d ciudades.", 3, empresa_id=7))
+
+        datos = json.loads(linea)
+        self.assertEqual(datos['mensaje'], "Devolviendo 3 ciudades.")
+        self.assertEqual(datos['nivel'], 'WARNING')
+        self.assertEqual(datos['empresa_id'], 7)
+
+    def test_muestreo_por_plantilla(self):
+        filtro = FiltroMuestreo(maximo=2, ventana=60)
+        pasan = [filtro.filter(self.registro("Dato %s incompleto", i)) for i in range(5)]
+        self.assertEqual(pasan, [True, True, False, False, False])
+
+        # Otra plantilla y los errores no se ven afectados.
+        self.assertTrue(filtro.filter(self.registro("Otro aviso %s", 1)))
+        self.assertTrue(filtro.filter(self.registro("Dato %s incompleto", 9, nivel=logging.ERROR)))
+
+        # En la ventana siguiente pasa de nuevo e informa de lo omitido.
+        filtro.ventana = 0
+        record = self.registro("Dato %s incompleto", 6)
+        self.assertTrue(filtro.filter(record))
+        self.assertEqual(record.omitidos, 3)
+
+
+class PlantillasTestCase(SimpleTestCase):
+    """Tests de la precompilación de plantillas en el cargador cacheado."""
+
+    def test_precompila_plantillas_del_proyecto_y_de_las_apps(self):
+        from django.template import engines
+        cargador = engines['django'].engine.template_loaders[0]
+        cargador.reset()
+
+        informe = precompilar_plantillas()
+
+        self.assertEqual(informe.errores, [])
+        self.assertGreater(informe.plantillas, 0)
+        for nombre in ('base.html', 'terceros/dashboard.html', 'admin/base.html'):
+            self.assertIn(nombre, cargador.get_template_cache)
+
+    def test_plantilla_con_errores_se_informa_y_no_detiene(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            with open(f"{directorio}/buena.html", 'w') as f:
+                f.write("{{ valor }}")
+            with open(f"{directorio}/rota.html", 'w') as f:
+                f.write("{% if %}")
+            plantillas = [{
+                'BACKEND': 'django.template.backends.django.DjangoTemplates',
+                'DIRS': [directorio],
+                'OPTIONS': {'loaders': [('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                ])]},
+            }]
+            with override_settings(TEMPLATES=plantillas):
+                informe = precompilar_plantillas()
+
+        self.assertEqual(informe.plantillas, 1)
+        self.assertEqual([nombre for nombre, _ in informe.errores], ['rota.html'])
+
+    def test_comando_informa_tiempos(self):
+        out = StringIO()
+        call_command('precompilar_plantillas', '--lentas', '3', stdout=out)
+        self.assertIn('plantillas precompiladas', out.getvalue())
+        self.assertEqual(len([l for l in out.getvalue().splitlines() if l.strip().endswith('.html')]), 3)
@@ -0,0 +1,292 @@
+"""
+Trabajos en segundo plano sin broker externo.
+
+La tabla `Trabajo` hace de cola. Cada app declara sus tareas en `tareas.py`
+(se descubren en `CoreConfig.ready`):
+
+    from apps.core.trabajos import tarea
+
+    @tarea('terceros.recalcular_contadores_geografia')
+    def recalcular(trabajo, progreso):
+        ...
+        progreso.avanzar(procesados, total)
+        return {'filas': total}     # se guarda en `Trabajo.resultado`
+
+y las vistas las encolan y devuelven el id para que el navegador consulte
+`estado_trabajo`:
+
+    trabajo = encolar('terceros.recalcular_contadores_geografia', usuario=request.user)
+
+`run_worker` reparte los trabajos entre hilos o procesos. Un trabajo se
+reclama con un UPDATE condicional (`estado = pendiente`), así que dos workers
+nunca ejecutan el mismo aunque la base de datos no soporte `SKIP LOCKED`. Los
+fallos se reintentan con espera exponencial hasta `max_intentos`, y los
+trabajos de un worker que murió (sin latido) vuelven a la cola.
+"""
+import logging
+import socket
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import Trabajo
+
+logger = logging.getLogger(__name__)
+
+# Segundos base de la espera entre reintentos (se duplica en cada intento).
+ESPERA_REINTENTO = 30
+# Sin latido durante este tiempo, un trabajo en curso se da por huérfano.
+TIEMPO_HUERFANO = timedelta(minutes=10)
+# Como mucho una escritura de progreso por trabajo cada tantos segundos.
+INTERVALO_PROGRESO = 1.0
+# Latido automático mientras corre una tarea, aunque ella no informe de progreso.
+INTERVALO_LATIDO = 30.0
+# Prefijo de las claves de `encolar_unico`; se liberan cuando el trabajo termina.
+PREFIJO_UNICO = 'activo:'
+# Cada cuántos segundos un worker en marcha busca trabajos huérfanos.
+INTERVALO_HUERFANOS = 60.0
+
+
+@dataclass(frozen=True)
+class Tarea:
+    nombre: str
+    funcion: Callable
+    max_intentos: int
+
+
+_REGISTRO: dict = {}
+
+
+def tarea(nombre: str, max_intentos: int = 3):
+    """Registra una función como tarea ejecutable por `run_worker`."""
+    def decorador(funcion):
+        _REGISTRO[nombre] = Tarea(nombre, funcion, max_intentos)
+        return funcion
+    return decorador
+
+
+def tareas_registradas() -> dict:
+    return dict(_REGISTRO)
+
+
+def encolar(nombre: str, parametros: dict = None, *, empresa=None, usuario=None,
+            clave_idempotencia: str = None, max_intentos: int = None) -> Trabajo:
+    """
+    Crea un trabajo pendiente. Con `clave_idempotencia`, un segundo intento de
+    encolar (doble clic, reintento del navegador) devuelve el trabajo existente.
+    """
+    if nombre not in _REGISTRO:
+        raise ValueError(f"Tarea no registrada: {nombre}")
+    if clave_idempotencia:
+        existente = Trabajo.objects.filter(clave_idempotencia=clave_idempotencia).first()
+        if existente:
+            return existente
+
+    try:
+        with transaction.atomic():
+            return Trabajo.objects.create(
+                tarea=nombre,
+                parametros=parametros or {},
+                empresa_id=getattr(empresa, 'pk', empresa),
+                usuario=usuario if usuario is not None and usuario.is_authenticated else None,
+                clave_idempotencia=clave_idempotencia or None,
+                max_intentos=max_intentos or _REGISTRO[nombre].max_intentos,
+            )
+    except IntegrityError:
+        if not clave_idempotencia:
+            raise
+        # Otro proceso lo encoló a la vez con la misma clave.
+        return Trabajo.objects.get(clave_idempotencia=clave_idempotencia)
+
+
+def encolar_unico(nombre: str, parametros: dict = None, **kwargs) -> Trabajo:
+    """
+    Encola la tarea salvo que ya haya una pendiente o en curso, y entonces
+    devuelve esa. La restricción única de `clave_idempotencia` lo garantiza
+    también entre peticiones concurrentes; la clave se libera al terminar.
+    """
+    return encolar(nombre, parametros, clave_idempotencia=f"{PREFIJO_UNICO}{nombre}", **kwargs)
+
+
+class Progreso:
+    """
+    Se pasa a cada tarea para informar de su avance sin saturar la base de datos.
+    Cada llamada a `avanzar` sirve también de latido: una tarea que pase más de
+    `TIEMPO_HUERFANO` sin llamarlo puede acabar devuelta a la cola.
+    """
+
+    def __init__(self, trabajo: Trabajo):
+        self.trabajo = trabajo
+        self.worker = trabajo.worker
+        self._ultima_escritura = 0.0
+
+    def avanzar(self, procesados: int, total: int = None, mensaje: str = None, forzar: bool = False) -> None:
+        campos = {'procesados': procesados, 'latido': timezone.now()}
+        if total is not None:
+            campos['total'] = total
+        if mensaje is not None:
+            campos['mensaje'] = mensaje[:255]
+        for campo, valor in campos.items():
+            setattr(self.trabajo, campo, valor)
+
+        ahora = time.monotonic()
+        if forzar or ahora - self._ultima_escritura >= INTERVALO_PROGRESO:
+            self._ultima_escritura = ahora
+            # Si el trabajo se reasignó a otro worker, este ya no escribe en él.
+            Trabajo.objects.filter(pk=self.trabajo.pk, worker=self.worker).update(**campos)
+
+
+def identificador_worker(sufijo: str = '') -> str:
+    return f"{socket.gethostname()}:{threading.get_native_id()}{sufijo}"
+
+
+def recuperar_huerfanos() -> int:
+    """Devuelve a la cola los trabajos en curso cuyo worker dejó de dar señales."""
+    limite = timezone.now() - TIEMPO_HUERFANO
+    return Trabajo.objects.filter(estado=Trabajo.Estado.EN_CURSO, latido__lt=limite).update(
+        estado=Trabajo.Estado.PENDIENTE, worker='', disponible_desde=timezone.now()
+    )
+
+
+def reclamar_siguiente(worker: str) -> Optional[Trabajo]:
+    """
+    Marca como en curso el siguiente trabajo disponible y lo devuelve. Si otro
+    worker gana la carrera por un candidato, se prueba con el siguiente.
+    """
+    for _ in range(5):
+        candidatos = list(
+            Trabajo.objects.filter(
+                estado=Trabajo.Estado.PENDIENTE, disponible_desde__lte=timezone.now()
+            ).order_by('disponible_desde', 'pk').values_list('pk', flat=True)[:5]
+        )
+        if not candidatos:
+            return None
+        for pk in candidatos:
+            ahora = timezone.now()
+            reclamado = Trabajo.objects.filter(pk=pk, estado=Trabajo.Estado.PENDIENTE).update(
+                estado=Trabajo.Estado.EN_CURSO, worker=worker, latido=ahora, fecha_inicio=ahora,
+            )
+            if reclamado:
+                return Trabajo.objects.get(pk=pk)
+    return None
+
+
+class _Latido(threading.Thread):
+    """
+    Actualiza `latido` cada `INTERVALO_LATIDO` mientras la tarea corre, para
+    que una tarea larga sin llamadas a `avanzar` (p. ej. un UPDATE masivo) no
+    se tome por huérfana y la ejecute otro worker a la vez.
+    """
+
+    def __init__(self, trabajo: Trabajo):
+        super().__init__(name=f"latido-{trabajo.pk}", daemon=True)
+        self.pk = trabajo.pk
+        self.worker = trabajo.worker
+        self.parar = threading.Event()
+
+    def run(self):
+        escribio = False
+        try:
+            while not self.parar.wait(INTERVALO_LATIDO):
+                escribio = True
+                Trabajo.objects.filter(pk=self.pk, worker=self.worker, estado=Trabajo.Estado.EN_CURSO).update(
+                    latido=timezone.now()
+                )
+        except Exception:
+            logger.exception("Falló el latido del trabajo %s", self.pk)
+        finally:
+            if escribio:
+                # Cada hilo tiene su propia conexión: no dejarla abierta.
+                connection.close()
+
+
+def ejecutar(trabajo: Trabajo) -> Trabajo:
+    """
+    Ejecuta un trabajo ya reclamado y registra el resultado, el reintento o el
+    fallo. El estado final solo se escribe si el trabajo sigue asignado a este
+    worker: si se dio por huérfano y lo reclamó otro, su resultado prevalece.
+    """
+    definicion = _REGISTRO.get(trabajo.tarea)
+    worker = trabajo.worker
+    trabajo.intentos += 1
+    latido = _Latido(trabajo)
+    latido.start()
+    try:
+        if definicion is None:
+            raise LookupError(f"Tarea no registrada en este worker: {trabajo.tarea}")
+        resultado = definicion.funcion(trabajo, Progreso(trabajo))
+    except Exception as exc:
+        logger.exception("Falló el trabajo %s (intento %s de %s)", trabajo.pk, trabajo.intentos, trabajo.max_intentos)
+        trabajo.error = traceback.format_exc()[-5000:]
+        trabajo.worker = ''
+        if definicion is not None and trabajo.intentos < trabajo.max_intentos:
+            trabajo.estado = Trabajo.Estado.PENDIENTE
+            trabajo.disponible_desde = timezone.now() + timedelta(
+                seconds=ESPERA_REINTENTO * 2 ** (trabajo.intentos - 1)
+            )
+            trabajo.mensaje = f"Reintento programado: {exc}"[:255]
+        else:
+            trabajo.estado = Trabajo.Estado.FALLIDO
+            trabajo.fecha_fin = timezone.now()
+            trabajo.mensaje = str(exc)[:255]
+    else:
+        trabajo.estado = Trabajo.Estado.COMPLETADO
+        trabajo.resultado = resultado
+        trabajo.error = ''
+        trabajo.fecha_fin = timezone.now()
+        if trabajo.total is not None:
+            trabajo.procesados = trabajo.total
+    finally:
+        latido.parar.set()
+        latido.join()
+
+    if trabajo.terminado and (trabajo.clave_idempotencia or '').startswith(PREFIJO_UNICO):
+        trabajo.clave_idempotencia = None
+    trabajo.latido = timezone.now()
+    campos = (
+        'estado', 'resultado', 'error', 'mensaje', 'worker', 'intentos', 'disponible_desde',
+        'fecha_fin', 'procesados', 'total', 'latido', 'clave_idempotencia',
+    )
+    actualizado = Trabajo.objects.filter(pk=trabajo.pk, worker=worker).update(
+        fecha_modificacion=timezone.now(), **{campo: getattr(trabajo, campo) for campo in campos}
+    )
+    if not actualizado:
+        logger.warning("El trabajo %s se reasignó mientras %s lo ejecutaba; se descarta su resultado", trabajo.pk, worker)
+    return trabajo
+
+
+def bucle_worker(worker: str, parar: threading.Event, intervalo: float = 2.0, una_vez: bool = False) -> int:
+    """
+    Reclama y ejecuta trabajos hasta que se pida parar. Con `una_vez`, vacía la
+    cola disponible y termina. Devuelve cuántos trabajos ejecutó.
+
+    Cada `INTERVALO_HUERFANOS` devuelve a la cola los trabajos de workers que
+    dejaron de dar latido, así no dependen de que se reinicie `run_worker`.
+    """
+    ejecutados = 0
+    # `run_worker` ya recupera los huérfanos al arrancar.
+    ultima_recuperacion = time.monotonic()
+    while not parar.is_set():
+        # Descarta conexiones caídas o caducadas (CONN_MAX_AGE) entre trabajos.
+        close_old_connections()
+        ahora = time.monotonic()
+        if ahora - ultima_recuperacion >= INTERVALO_HUERFANOS:
+            ultima_recuperacion = ahora
+            recuperados = recuperar_huerfanos()
+            if recuperados:
+                logger.warning("%s trabajo(s) huérfano(s) devuelto(s) a la cola por %s", recuperados, worker)
+        trabajo = reclamar_siguiente(worker)
+        if trabajo is None:
+            if una_vez:
+                break
+            parar.wait(intervalo)
+            continue
+        ejecutar(trabajo)
+        ejecutados += 1
+    return ejecutados
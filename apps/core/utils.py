@@ -1,10 +1,27 @@
 import logging
 import requests
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+
+def ubicacion_inicial(ciudad) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Construye los datos iniciales del selector de ubicación (location-selector.js)
+    a partir de una ciudad. La ciudad debe venir cargada con
+    `select_related('ciudad__division__pais')` para no generar consultas.
+    """
+    if ciudad is None:
+        return None
+    division = ciudad.division
+    pais = division.pais
+    return {
+        'pais': {'id': pais.geoname_id, 'nombre': pais.nombre, 'codigo': pais.codigo_iso},
+        'division': {'id': division.geoname_id, 'nombre': division.nombre, 'codigo': division.codigo_iso},
+        'ciudad': {'id': ciudad.geoname_id, 'nombre': ciudad.nombre},
+    }
+
 def consultar_api_externa(url: str, timeout: int = 10) -> List[Dict[str, Any]]:
     """
     Función auxiliar reutilizable para consultar APIs externas.
@@ -1,15 +1,22 @@
-from django.shortcuts import render
-from django.http import HttpRequest, HttpResponse
+from django.shortcuts import render, get_object_or_404
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.core.cache import cache
 from django.db.models import Count, Q
 from django.utils import timezone
 from django.conf import settings
+from django.utils.crypto import constant_time_compare
 
+from apps.core import metricas
+from apps.core.cache import leer_cache
+from apps.core.db_router import usar_replica
+from apps.core.models import Trabajo
 from apps.terceros.models import Tercero, TipoTercero
+from apps.terceros.services import dashboard_cache_key
 
 
 @login_required
+@usar_replica
 def dashboard_view(request: HttpRequest) -> HttpResponse:
     """
     Vista para la página de inicio/dashboard del ERP.
@@ -27,11 +34,11 @@ def dashboard_view(request: HttpRequest) -> HttpResponse:
         # Si no es válido, lo tratamos como si no hubiera empresa seleccionada
         return render(request, 'terceros/dashboard.html', {'stats': None})
 
-    cache_key = f'dashboard_stats_{empresa_pk}'
-    stats = cache.get(cache_key)
+    cache_key = dashboard_cache_key(empresa_pk)
+    stats = leer_cache(cache_key)
 
     if stats is None:
-        terceros_empresa = Tercero.objects.filter(empresa_id=empresa_pk)
+        terceros_empresa = Tercero.objects.de_empresa(empresa_pk)
 
         terceros_stats = terceros_empresa.aggregate(
             total_activos=Count('id', filter=Q(activo=True)),
@@ -66,4 +73,57 @@ def dashboard_view(request: HttpRequest) -> HttpResponse:
 
 def landing_page_view(request: HttpRequest) -> HttpResponse:
     """Vista para la página de aterrizaje pública."""
-    return render(request, 'terceros/landing_page.html')
\ No newline at end of file
+    return render(request, 'terceros/landing_page.html')
+
+
+@login_required
+def estado_trabajo(request: HttpRequest, pk: int) -> JsonResponse:
+    """
+    Estado de un trabajo en segundo plano, para que la interfaz consulte su
+    progreso periódicamente. Cada usuario solo ve los trabajos que encoló.
+    """
+    trabajos = Trabajo.objects.only(
+        'tarea', 'estado', 'procesados', 'total', 'mensaje', 'resultado', 'intentos', 'max_intentos', 'usuario_id'
+    )
+    if not request.user.is_superuser:
+        trabajos = trabajos.filter(usuario=request.user)
+    trabajo = get_object_or_404(trabajos, pk=pk)
+
+    response = JsonResponse({
+        'id': trabajo.pk,
+        'tarea': trabajo.tarea,
+        'estado': trabajo.estado,
+        'terminado': trabajo.terminado,
+        'procesados': trabajo.procesados,
+        'total': trabajo.total,
+        'porcentaje': trabajo.porcentaje,
+        'mensaje': trabajo.mensaje,
+        'resultado': trabajo.resultado if trabajo.estado == Trabajo.Estado.COMPLETADO else None,
+        'intentos': trabajo.intentos,
+        'max_intentos': trabajo.max_intentos,
+    })
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def metricas_view(request: HttpRequest) -> HttpResponse:
+    """
+    Métricas en formato de texto de Prometheus (ver `apps/core/metricas.py`).
+
+    Cerrado por defecto: con `METRICAS_TOKEN` exige el token Bearer (o una
+    sesión de staff); sin él, fuera de DEBUG solo responde a usuarios staff y
+    al resto le devuelve 404, como si el endpoint no existiera.
+    """
+    if not (metricas.DISPONIBLE and settings.METRICAS_ENABLE):
+        raise Http404
+    es_staff = request.user.is_authenticated and request.user.is_staff
+    token = settings.METRICAS_TOKEN
+    if token:
+        if not es_staff and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            response = HttpResponse(status=401)
+            response['WWW-Authenticate'] = 'Bearer'
+            return response
+    elif not (settings.DEBUG or es_staff):
+        raise Http404
+    cuerpo, content_type = metricas.exponer()
+    return HttpResponse(cuerpo, content_type=content_type)
@@ -0,0 +1,36 @@
+from django import forms
+
+
+class AutocompleteSelect(forms.Select):
+    """
+    Select para relaciones con muchos registros posibles.
+
+    Solo renderiza la opción seleccionada (una consulta por pk); el resto de
+    opciones las carga `static/js/autocomplete-select.js` desde `url`.
+    Usarlo con un `ModelChoiceField`: la validación ya es una búsqueda por pk
+    sobre el queryset del campo, sin cargarlo completo.
+    """
+    def __init__(self, url, attrs=None, campos_label=('id',)):
+        attrs = {'class': 'form-select', **(attrs or {})}
+        super().__init__(attrs=attrs)
+        self.url = url
+        self.campos_label = campos_label
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-autocomplete-url'] = str(self.url)
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        seleccionados = [v for v in value if v not in ('', None)]
+        opciones = [self.create_option(name, '', '---------', not seleccionados, 0)]
+
+        queryset = getattr(self.choices, 'queryset', None)
+        if seleccionados and queryset is not None:
+            field = self.choices.field
+            instancias = queryset.filter(pk__in=seleccionados).only(*self.campos_label)
+            for index, obj in enumerate(instancias, start=1):
+                opciones.append(self.create_option(
+                    name, str(obj.pk), field.label_from_instance(obj), True, index
+                ))
+        return [(None, opciones, 0)]
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EmpresaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.empresa'
+
+    def ready(self):
+        import apps.empresa.signals
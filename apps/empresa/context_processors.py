@@ -1,12 +1,31 @@
-from .models import Empresa
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from apps.core.cache import namespace_usuario, versiones
+from .services import obtener_empresas_usuario
+
+
+def _empresas_disponibles(request):
+    """Memoiza la lista de empresas en el request para todos los renders de la petición."""
+    if not hasattr(request, '_empresas_disponibles'):
+        request._empresas_disponibles = obtener_empresas_usuario(request.user)
+    return request._empresas_disponibles
+
 
 def empresas_context(request):
     """
     Hace que la lista de empresas activas esté disponible en todas las plantillas
     para el selector de empresa.
+
+    El valor es perezoso: solo se resuelve (desde el cache de membresías) si la
+    plantilla lo usa, de modo que las páginas sin selector no hacen consultas.
+
+    `version_layout` es la versión del namespace del usuario, que cambia con sus
+    membresías, permisos o perfil: `base.html` la usa como parte de la clave de
+    los fragmentos cacheados del menú y del selector (`{% cache %}`).
     """
+    contexto = {'timeout_layout': settings.CACHE_TIMEOUTS['FRAGMENTOS_LAYOUT']}
     if request.user.is_authenticated:
         # Seguridad: Devolvemos solo las empresas activas a las que el usuario tiene acceso.
-        empresas = request.user.empresas.filter(activo=True).order_by('nombre')
-        return {'empresas_disponibles': empresas}
-    return {}
\ No newline at end of file
+        contexto['empresas_disponibles'] = SimpleLazyObject(lambda: _empresas_disponibles(request))
+        contexto['version_layout'] = SimpleLazyObject(lambda: versiones(namespace_usuario(request.user.pk))[0])
+    return contexto
@@ -3,6 +3,7 @@ from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
 from .models import Empresa
 from apps.terceros.models import TipoIdentificacion, Pais, Division, Ciudad # <-- IMPORT CORREGIDO
+from apps.core.cache import leer_cache
 from apps.core.forms import UbicacionFormMixin
 
 class EmpresaForm(UbicacionFormMixin, forms.ModelForm):
@@ -26,7 +27,7 @@ class EmpresaForm(UbicacionFormMixin, forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        tipos_identificacion = cache.get('tipos_identificacion_choices')
+        tipos_identificacion = leer_cache('tipos_identificacion_choices')
         if tipos_identificacion is None:
             tipos_identificacion = list(TipoIdentificacion.objects.all().order_by('nombre').values_list('id', 'nombre'))
             cache.set('tipos_identificacion_choices', tipos_identificacion, 3600)
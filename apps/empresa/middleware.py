@@ -1,7 +1,10 @@
 import logging
+from os.path import commonprefix
+from django.conf import settings
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.contrib import messages
+from django.utils.functional import SimpleLazyObject
 
 logger = logging.getLogger(__name__)
 
@@ -15,49 +18,79 @@ class EmpresaSeleccionadaMiddleware:
     """
     def __init__(self, get_response):
         self.get_response = get_response
+        # Las rutas exentas se resuelven una sola vez al arrancar el worker,
+        # no en cada petición.
+        self.rutas_exentas, self.prefijos_exentos = self._construir_exenciones()
 
-    def __call__(self, request):
-        # Ignorar superusuarios (que operan a nivel global) y usuarios no autenticados.
-        if not request.user.is_authenticated or request.user.is_superuser:
-            return self.get_response(request)
-
-        # Definir rutas que NUNCA requieren una empresa seleccionada.
-        # Es crucial que la página de selección y la acción de seleccionar estén aquí.
-        allowed_paths = [
+    @staticmethod
+    def _construir_exenciones():
+        """
+        Devuelve las rutas exactas y los prefijos que NUNCA requieren una empresa
+        seleccionada. Es crucial que la página de selección y la acción de
+        seleccionar estén aquí.
+        """
+        rutas = frozenset([
             reverse('empresa:seleccionar_empresa_inicial'),
             reverse('empresa:seleccionar_empresa'), # La acción POST que guarda la selección
             reverse('logout'),
             reverse('empresa:crear_empresa'), # Permitir crear la primera empresa
-        ]
+            reverse('metricas'), # Un staff sin empresa seleccionada también puede consultarlas
+        ])
+
+        # Las APIs de GeoNames comparten prefijo y las usa también el formulario de empresa.
+        prefijo_geonames = commonprefix([
+            reverse('terceros:api_buscar_paises'),
+            reverse('terceros:api_buscar_divisiones'),
+            reverse('terceros:api_buscar_ciudades'),
+        ])
+        prefijos = [reverse('admin:index'), settings.STATIC_URL, prefijo_geonames]
+        media_url = getattr(settings, 'MEDIA_URL', '')
+        if media_url and media_url != '/':
+            prefijos.append(media_url)
+
+        # `str.startswith` acepta una tupla y recorre los prefijos en C.
+        return rutas, tuple(p for p in prefijos if p)
+
+    def es_ruta_exenta(self, path: str) -> bool:
+        return path in self.rutas_exentas or path.startswith(self.prefijos_exentos)
+
+    def __call__(self, request):
+        # Ignorar superusuarios (que operan a nivel global) y usuarios no autenticados.
+        if not request.user.is_authenticated or request.user.is_superuser:
+            return self.get_response(request)
 
         # Si ya hay una empresa en la sesión, la adjuntamos al request y continuamos.
         # Esta es la ruta más común y eficiente.
         if 'empresa_id' in request.session:
-            # Adjuntamos el objeto empresa para fácil acceso en las vistas
-            request.empresa_activa = request.user.empresas.filter(
-                pk=request.session.get('empresa_id')
-            ).first()
+            # Adjuntamos el objeto empresa para fácil acceso en las vistas.
+            # Es perezoso: solo consulta la base de datos si una vista lo usa.
+            empresa_id = request.session.get('empresa_id')
+            request.empresa_activa = SimpleLazyObject(
+                lambda: request.user.empresas.filter(pk=empresa_id).first()
+            )
             return self.get_response(request)
 
         # Si no hay empresa en sesión y el usuario intenta acceder a una página protegida...
-        if not request.path.startswith('/admin/') and request.path not in allowed_paths:
-            empresas_usuario = request.user.empresas.filter(activo=True)
-            num_empresas = empresas_usuario.count()
+        if not self.es_ruta_exenta(request.path):
+            # Una sola consulta de hasta dos filas basta para distinguir 0, 1 o varias empresas.
+            empresas_usuario = list(
+                request.user.empresas.filter(activo=True).only('id', 'nombre')[:2]
+            )
 
-            if num_empresas == 1:
+            if len(empresas_usuario) == 1:
                 # Caso 1: Auto-seleccionar si solo tiene una empresa.
-                empresa = empresas_usuario.first()
+                empresa = empresas_usuario[0]
                 request.session['empresa_id'] = empresa.id
                 request.session['empresa_nombre'] = empresa.nombre
                 request.empresa_activa = empresa # Adjuntamos para la petición actual
                 messages.info(request, f"Empresa '{empresa.nombre}' seleccionada automáticamente.")
                 # No redirigimos, dejamos que la petición original continúe ya con la sesión configurada.
 
-            elif num_empresas > 1:
+            elif len(empresas_usuario) > 1:
                 # Caso 2: Redirigir a la página de selección si tiene varias.
                 return redirect('empresa:seleccionar_empresa_inicial')
 
-            # Caso 3 (num_empresas == 0): No hacemos nada. La vista (ej. dashboard)
+            # Caso 3 (sin empresas): No hacemos nada. La vista (ej. dashboard)
             # se encargará de mostrar el mensaje de "No tienes empresas asignadas".
 
-        return self.get_response(request)
\ No newline at end of file
+        return self.get_response(request)
@@ -0,0 +1,36 @@
+from typing import Dict, Iterable, List
+from django.conf import settings
+from django.core.cache import cache
+from apps.core.cache import invalidar_namespace, leer_cache, namespace_usuario
+from .models import Empresa
+
+
+def membresia_cache_key(user_id) -> str:
+    """Clave de cache de las empresas activas a las que tiene acceso un usuario."""
+    return f"empresas_usuario_{user_id}"
+
+
+def obtener_empresas_usuario(user) -> List[Dict]:
+    """
+    Devuelve las empresas activas del usuario como una lista de diccionarios
+    `{'id', 'nombre'}` ordenada por nombre, servida desde cache.
+    Se invalida desde `signals.py` cuando cambian las membresías o las empresas.
+    """
+    cache_key = membresia_cache_key(user.pk)
+    empresas = leer_cache(cache_key)
+    if empresas is None:
+        empresas = list(
+            Empresa.objects.filter(usuarios=user, activo=True).order_by('nombre').values('id', 'nombre')
+        )
+        cache.set(cache_key, empresas, settings.CACHE_TIMEOUTS['EMPRESAS_USUARIO'])
+    return empresas
+
+
+def invalidar_empresas_usuarios(user_ids: Iterable) -> None:
+    """
+    Elimina del cache las membresías de los usuarios indicados y los
+    fragmentos del menú y del selector de empresa que las muestran.
+    """
+    user_ids = list(user_ids)
+    cache.delete_many([membresia_cache_key(user_id) for user_id in user_ids])
+    invalidar_namespace(*(namespace_usuario(user_id) for user_id in user_ids))
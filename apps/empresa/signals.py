@@ -0,0 +1,44 @@
+from django.db.models.signals import post_save, pre_delete, m2m_changed
+from django.core.cache import cache
+from django.dispatch import receiver
+from .models import Empresa
+from .services import invalidar_empresas_usuarios
+from apps.core.cache import invalidar_namespace, namespace_empresa
+
+
+@receiver(m2m_changed, sender=Empresa.usuarios.through)
+def invalidar_cache_membresias(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalida el cache de empresas de los usuarios afectados cuando se añaden
+    o quitan membresías, desde cualquiera de los dos lados de la relación.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if reverse:
+        # `instance` es el usuario: solo cambia su propia lista.
+        invalidar_empresas_usuarios([instance.pk])
+    elif action == 'pre_clear':
+        # En `post_clear` ya no sabríamos qué usuarios tenía la empresa.
+        invalidar_empresas_usuarios(instance.usuarios.values_list('pk', flat=True))
+    else:
+        invalidar_empresas_usuarios(pk_set or [])
+
+
+@receiver([post_save, pre_delete], sender=Empresa)
+def invalidar_cache_usuarios_empresa(sender, instance, **kwargs):
+    """Un cambio de nombre o de estado de la empresa afecta a todos sus usuarios."""
+    if instance.pk:
+        invalidar_empresas_usuarios(instance.usuarios.values_list('pk', flat=True))
+
+
+@receiver([post_save, pre_delete], sender=Empresa)
+def invalidar_cache_filtro_admin(sender, instance, **kwargs):
+    """Las opciones del filtro por empresa del admin de terceros."""
+    cache.delete('admin_filtro_empresas')
+
+
+@receiver(pre_delete, sender=Empresa)
+def invalidar_namespace_empresa(sender, instance, **kwargs):
+    """Descarta de una vez todo lo cacheado de la empresa eliminada."""
+    invalidar_namespace(namespace_empresa(instance.pk))
@@ -1,3 +1,232 @@
-from django.test import TestCase
+from io import StringIO
+from datetime import timedelta
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.core.cache import cache
+from django.db import connection
+from django.contrib.auth.models import Permission, User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.utils import timezone
+from django.template.loader import render_to_string
 
-# Create your tests here.
+from apps.terceros.models import TipoIdentificacion, Pais, Division, Ciudad
+from .models import Empresa
+from .services import obtener_empresas_usuario, membresia_cache_key
+
+
+def consultas_empresa(queries):
+    """Filtra las consultas capturadas que leen la tabla de empresas."""
+    return [q for q in queries if '"empresa_empresa"' in q['sql']]
+
+
+def crear_empresas_de_prueba(cls):
+    """
+    Datos base de los tests con empresas, compartidos por todas las apps. Deja
+    en `cls` el tipo de identificación NIT (`tipo_id`), la cadena Colombia →
+    Cundinamarca → Bogotá (`pais`, `division`, `ciudad`) y dos empresas en
+    Bogotá (`empresa` y `otra_empresa`).
+    """
+    cls.tipo_id = TipoIdentificacion.objects.create(nombre="NIT")
+    cls.pais = Pais.objects.create(nombre="Colombia", codigo_iso="CO", geoname_id=3686110)
+    cls.division = Division.objects.create(nombre="Cundinamarca", codigo_iso="CO-CUN", geoname_id=3686210, pais=cls.pais)
+    cls.ciudad = Ciudad.objects.create(nombre="Bogotá", geoname_id=3688689, division=cls.division)
+    cls.empresa = Empresa.objects.create(
+        nombre="Empresa Uno", tipo_identificacion=cls.tipo_id, nif="900100", ciudad=cls.ciudad
+    )
+    cls.otra_empresa = Empresa.objects.create(
+        nombre="Empresa Dos", tipo_identificacion=cls.tipo_id, nif="900200", ciudad=cls.ciudad
+    )
+
+
+class EmpresaTestMixin:
+    """Datos base compartidos por los tests de la app empresa."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_empresas_de_prueba(cls)
+        cls.user = User.objects.create_user('usuario', 'usuario@test.com', 'pass')
+        cls.empresa.usuarios.add(cls.user)
+        cls.otra_empresa.usuarios.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def login_con_empresa(self):
+        self.client.login(username='usuario', password='pass')
+        session = self.client.session
+        session['empresa_id'] = self.empresa.pk
+        session['empresa_nombre'] = self.empresa.nombre
+        session.save()
+
+
+class EmpresasContextTestCase(EmpresaTestMixin, TestCase):
+    """Tests del context processor perezoso del selector de empresa."""
+
+    def test_pagina_sin_selector_no_consulta_empresas(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        request.session = {}
+
+        with CaptureQueriesContext(connection) as ctx:
+            render_to_string('includes/messages.html', request=request)
+
+        self.assertEqual(consultas_empresa(ctx.captured_queries), [])
+
+    def test_respuesta_json_no_consulta_empresas(self):
+        self.login_con_empresa()
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('terceros:api_verificar_tercero'), {'nroid': '123'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(consultas_empresa(ctx.captured_queries), [])
+
+    def test_pagina_con_selector_hace_como_maximo_una_consulta(self):
+        self.login_con_empresa()
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Empresa Dos')
+        self.assertLessEqual(len(consultas_empresa(ctx.captured_queries)), 1)
+
+        # Con el cache de membresías caliente, la segunda página no consulta empresas.
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('dashboard'))
+        self.assertEqual(consultas_empresa(ctx.captured_queries), [])
+
+    def test_cache_se_invalida_al_cambiar_membresias(self):
+        self.assertEqual(len(obtener_empresas_usuario(self.user)), 2)
+
+        self.otra_empresa.usuarios.remove(self.user)
+        self.assertIsNone(cache.get(membresia_cache_key(self.user.pk)))
+        self.assertEqual([e['nombre'] for e in obtener_empresas_usuario(self.user)], ['Empresa Uno'])
+
+        self.user.empresas.clear()
+        self.assertEqual(obtener_empresas_usuario(self.user), [])
+
+    def test_cache_se_invalida_al_desactivar_empresa(self):
+        self.assertEqual(len(obtener_empresas_usuario(self.user)), 2)
+
+        self.otra_empresa.activo = False
+        self.otra_empresa.save()
+
+        self.assertEqual(len(obtener_empresas_usuario(self.user)), 1)
+
+
+class FragmentosLayoutTestCase(EmpresaTestMixin, TestCase):
+    """Tests del menú y el selector de empresa cacheados en `base.html`."""
+
+    TABLAS_LAYOUT = ('usuarios_perfil', 'auth_permission', 'empresa_empresa')
+
+    def consultas_layout(self, queries):
+        return [q['sql'] for q in queries if any(tabla in q['sql'] for tabla in self.TABLAS_LAYOUT)]
+
+    def test_layout_cacheado_no_consulta(self):
+        self.login_con_empresa()
+        self.client.get(reverse('dashboard'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard'))
+
+        self.assertEqual(self.consultas_layout(ctx.captured_queries), [])
+        self.assertContains(response, 'Empresa Dos')
+        # La página y la empresa activas van fuera del fragmento cacheado.
+        self.assertContains(response, 'data-vista=":dashboard"')
+        self.assertContains(response, f'data-empresa-activa="{self.empresa.pk}"')
+        response = self.client.get(reverse('terceros:Lista_terceros'))
+        self.assertContains(response, 'data-vista="terceros:Lista_terceros"')
+
+    def test_selector_usa_un_unico_formulario(self):
+        self.login_con_empresa()
+        self.client.get(reverse('dashboard'))
+        response = self.client.get(reverse('dashboard'))
+
+        self.assertContains(response, 'type="submit" name="empresa_id"', count=2)
+        self.assertContains(response, 'id="empresaSelectorForm"', count=1)
+        response = self.client.post(reverse('empresa:seleccionar_empresa'), {'empresa_id': self.otra_empresa.pk})
+        self.assertEqual(self.client.session['empresa_id'], self.otra_empresa.pk)
+
+    def test_cambio_de_membresias_invalida_el_selector(self):
+        self.login_con_empresa()
+        self.assertContains(self.client.get(reverse('dashboard')), 'Empresa Dos')
+
+        self.otra_empresa.usuarios.remove(self.user)
+
+        self.assertNotContains(self.client.get(reverse('dashboard')), 'Empresa Dos')
+
+    def test_cambio_de_permisos_invalida_el_menu(self):
+        self.login_con_empresa()
+        self.assertNotContains(self.client.get(reverse('dashboard')), 'Crear Empresa')
+
+        self.user.user_permissions.add(Permission.objects.get(codename='add_empresa'))
+
+        self.assertContains(self.client.get(reverse('dashboard')), 'Crear Empresa')
+
+    def test_cambio_de_perfil_invalida_el_menu(self):
+        self.login_con_empresa()
+        self.assertNotContains(self.client.get(reverse('dashboard')), 'Crear Usuario')
+
+        perfil = self.user.perfil
+        perfil.es_admin_empresa = True
+        perfil.save()
+
+        self.assertContains(self.client.get(reverse('dashboard')), 'Crear Usuario')
+
+
+class EmpresaSeleccionadaMiddlewareTestCase(EmpresaTestMixin, TestCase):
+    """Tests del camino rápido del middleware de selección de empresa."""
+
+    def test_varias_empresas_redirige_con_una_sola_consulta(self):
+        self.client.login(username='usuario', password='pass')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('terceros:Lista_terceros'))
+
+        self.assertRedirects(response, reverse('empresa:seleccionar_empresa_inicial'), fetch_redirect_response=False)
+        self.assertEqual(len(consultas_empresa(ctx.captured_queries)), 1)
+
+    def test_una_empresa_se_autoselecciona(self):
+        self.otra_empresa.usuarios.remove(self.user)
+        self.client.login(username='usuario', password='pass')
+
+        self.client.get(reverse('dashboard'))
+
+        self.assertEqual(self.client.session['empresa_id'], self.empresa.pk)
+
+    def test_rutas_exentas_no_consultan_empresas(self):
+        self.client.login(username='usuario', password='pass')
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('admin:index'))
+            self.client.get('/static/css/main.css')
+
+        self.assertEqual(consultas_empresa(ctx.captured_queries), [])
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class SesionCacheadaTestCase(EmpresaTestMixin, TestCase):
+    """Con 'cached_db' la empresa activa se lee de la sesión sin tocar `django_session`."""
+
+    def test_lectura_de_sesion_sin_consultas(self):
+        self.login_con_empresa()
+        # Primera petición: puede cargar la sesión al cache.
+        self.client.get(reverse('terceros:api_verificar_tercero'), {'nroid': '123'})
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('terceros:api_verificar_tercero'), {'nroid': '123'})
+
+        self.assertEqual(response.status_code, 200)
+        consultas_sesion = [q for q in ctx.captured_queries if 'django_session' in q['sql']]
+        self.assertEqual(consultas_sesion, [])
+
+    def test_limpiar_sesiones_expiradas(self):
+        Session.objects.create(session_key='expirada', session_data='', expire_date=timezone.now() - timedelta(days=1))
+        Session.objects.create(session_key='vigente', session_data='', expire_date=timezone.now() + timedelta(days=1))
+
+        call_command('limpiar_sesiones', lote=1, stdout=StringIO())
+
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['vigente'])
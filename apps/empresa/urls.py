@@ -5,6 +5,7 @@ app_name = 'empresa'
 
 urlpatterns = [
     path('crear/', views.EmpresaCreateView.as_view(), name='crear_empresa'),
+    path('<int:pk>/editar/', views.EmpresaUpdateView.as_view(), name='editar_empresa'),
     path('seleccionar/', views.SeleccionarEmpresaView.as_view(), name='seleccionar_empresa'),
     # URL para la página de selección inicial después del login
     path('seleccionar-empresa/', views.SeleccionarEmpresaInicialView.as_view(), name='seleccionar_empresa_inicial'),
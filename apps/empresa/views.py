@@ -2,12 +2,13 @@ import logging
 from django.shortcuts import render, redirect
 from django.http import HttpRequest, HttpResponse
 from django.contrib import messages
-from django.views.generic import CreateView, TemplateView
+from django.views.generic import CreateView, UpdateView, TemplateView
 from django.views import View
 from django.urls import reverse, reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from .models import Empresa
 from .forms import EmpresaForm
+from apps.core.utils import ubicacion_inicial
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +48,40 @@ class EmpresaCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView)
         messages.success(self.request, f'Empresa "{empresa.nombre}" creada y seleccionada exitosamente.')
         return super().form_valid(form)
 
+class EmpresaUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
+    """
+    Vista para editar una empresa a la que el usuario tiene acceso.
+    """
+    model = Empresa
+    form_class = EmpresaForm
+    template_name = 'empresa/empresa_form.html'
+    success_url = reverse_lazy('dashboard')
+    permission_required = 'empresa.change_empresa'
+
+    def get_queryset(self):
+        """
+        Seguridad: solo empresas del usuario (el superusuario las ve todas).
+        La cadena geográfica se carga en la misma consulta del objeto.
+        """
+        queryset = Empresa.objects.select_related('ciudad__division__pais')
+        if self.request.user.is_superuser:
+            return queryset
+        return queryset.filter(usuarios=self.request.user)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['titulo'] = f'Editar Empresa: {self.object.nombre}'
+        context['ubicacion_inicial'] = ubicacion_inicial(self.object.ciudad)
+        return context
+
+    def form_valid(self, form):
+        empresa = form.save()
+        # Mantener el nombre mostrado en el selector si es la empresa activa.
+        if self.request.session.get('empresa_id') == empresa.id:
+            self.request.session['empresa_nombre'] = empresa.nombre
+        messages.success(self.request, f'Empresa "{empresa.nombre}" actualizada exitosamente.')
+        return redirect(self.success_url)
+
 class SeleccionarEmpresaView(LoginRequiredMixin, View):
     """
     Vista segura (basada en POST) para que el usuario seleccione la empresa
@@ -61,8 +96,10 @@ class SeleccionarEmpresaView(LoginRequiredMixin, View):
         try:
             # Seguridad: verificar que la empresa exista y que el usuario tenga acceso a ella.
             empresa = request.user.empresas.get(pk=empresa_id, activo=True)
-            request.session['empresa_id'] = empresa.id
-            request.session['empresa_nombre'] = empresa.nombre
+            # Solo escribimos la sesión si la empresa cambia, evitando un UPDATE innecesario.
+            if request.session.get('empresa_id') != empresa.id:
+                request.session['empresa_id'] = empresa.id
+                request.session['empresa_nombre'] = empresa.nombre
             messages.success(request, f'Has cambiado a la empresa "{empresa.nombre}".')
         except Empresa.DoesNotExist:
             messages.error(request, "La empresa seleccionada no es válida o no tienes acceso a ella.")
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Bodega
+from .models import Bodega, Producto, Existencia, MovimientoInventario, AlertaStock
+from .services import evaluar_alerta
 
 
 @admin.register(Bodega)
@@ -9,3 +10,59 @@ class BodegaAdmin(admin.ModelAdmin):
     list_filter = ('activo', 'ciudad__division__pais', 'ciudad')
     search_fields = ('nombre', 'direccion', 'responsable__nombre')
     list_per_page = 20
+
+
+@admin.register(Producto)
+class ProductoAdmin(admin.ModelAdmin):
+    list_display = ('codigo', 'nombre', 'empresa', 'activo')
+    list_filter = ('activo', 'empresa')
+    search_fields = ('codigo', 'nombre')
+    list_per_page = 20
+
+
+@admin.register(Existencia)
+class ExistenciaAdmin(admin.ModelAdmin):
+    """
+    El saldo solo se modifica a través de movimientos; aquí únicamente se
+    ajusta el stock mínimo, reevaluando la alerta de esa existencia.
+    """
+    list_display = ('producto', 'bodega', 'cantidad', 'stock_minimo', 'en_alerta')
+    list_filter = ('en_alerta', 'bodega')
+    search_fields = ('producto__codigo', 'producto__nombre')
+    readonly_fields = ('cantidad',)
+    list_per_page = 20
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('producto', 'bodega')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        evaluar_alerta(obj)
+
+
+@admin.register(MovimientoInventario)
+class MovimientoInventarioAdmin(admin.ModelAdmin):
+    list_display = ('fecha_creacion', 'tipo', 'existencia', 'cantidad', 'saldo', 'usuario')
+    list_filter = ('tipo',)
+    list_per_page = 50
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'existencia__producto', 'existencia__bodega', 'usuario'
+        )
+
+    def has_change_permission(self, request, obj=None):
+        # El libro de movimientos es inmutable.
+        return False
+
+
+@admin.register(AlertaStock)
+class AlertaStockAdmin(admin.ModelAdmin):
+    list_display = ('existencia', 'empresa', 'cantidad', 'stock_minimo', 'abierta', 'fecha_creacion', 'fecha_cierre')
+    list_filter = ('abierta', 'empresa')
+    list_per_page = 50
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'existencia__producto', 'existencia__bodega', 'empresa'
+        )
@@ -0,0 +1,12 @@
+from .services import contar_alertas_abiertas
+
+
+def alertas_stock_context(request):
+    """
+    Expone el número de alertas de reposición abiertas de la empresa activa
+    para el badge del menú. El valor se sirve desde cache.
+    """
+    empresa_id = request.session.get('empresa_id') if request.user.is_authenticated else None
+    if not empresa_id:
+        return {}
+    return {'alertas_stock_abiertas': contar_alertas_abiertas(empresa_id)}
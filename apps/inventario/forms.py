@@ -1,8 +1,10 @@
 from django import forms
+from django.urls import reverse_lazy
 from django.utils.translation import gettext_lazy as _
 from .models import Bodega
 from apps.terceros.models import Tercero
 from apps.core.forms import UbicacionFormMixin
+from apps.core.widgets import AutocompleteSelect
 
 
 class BodegaForm(UbicacionFormMixin, forms.ModelForm):
@@ -16,7 +18,10 @@ class BodegaForm(UbicacionFormMixin, forms.ModelForm):
         widgets = {
             'nombre': forms.TextInput(attrs={'class': 'form-control'}),
             'direccion': forms.TextInput(attrs={'class': 'form-control'}),
-            'responsable': forms.Select(attrs={'class': 'form-select'}),
+            'responsable': AutocompleteSelect(
+                url=reverse_lazy('terceros:api_buscar_terceros'),
+                campos_label=('id', 'nombre', 'nroid'),
+            ),
         }
 
     def __init__(self, *args, **kwargs):
@@ -25,10 +30,12 @@ class BodegaForm(UbicacionFormMixin, forms.ModelForm):
         super().__init__(*args, **kwargs)
 
         # Filtrar el queryset de responsables para mostrar solo los de la empresa activa.
+        # Nunca se recorre completo: el widget solo renderiza la opción seleccionada
+        # y la validación busca un único pk.
         if self.empresa:
-            self.fields['responsable'].queryset = Tercero.objects.filter(
-                activo=True, empresa=self.empresa
-            ).order_by('nombre')
+            self.fields['responsable'].queryset = Tercero.objects.de_empresa(self.empresa).activos().only(
+                'id', 'nombre', 'nroid'
+            )
         else:
             self.fields['responsable'].queryset = Tercero.objects.none()
 
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empresa', '0003_empresa_usuarios'),
+        ('inventario', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Producto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='Fecha de Modificación')),
+                ('activo', models.BooleanField(default=True, verbose_name='Activo')),
+                ('codigo', models.CharField(max_length=50, verbose_name='Código')),
+                ('nombre', models.CharField(max_length=150, verbose_name='Nombre del Producto')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='productos', to='empresa.empresa', verbose_name='Empresa Propietaria')),
+            ],
+            options={
+                'verbose_name': 'Producto',
+                'verbose_name_plural': 'Productos',
+                'ordering': ['nombre'],
+                'unique_together': {('empresa', 'codigo')},
+            },
+        ),
+        migrations.CreateModel(
+            name='Existencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='Fecha de Modificación')),
+                ('cantidad', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Cantidad')),
+                ('stock_minimo', models.DecimalField(decimal_places=2, default=0, help_text='Por debajo de esta cantidad se genera una alerta de reposición. 0 desactiva la alerta.', max_digits=14, verbose_name='Stock Mínimo')),
+                ('en_alerta', models.BooleanField(default=False, editable=False, verbose_name='En Alerta')),
+                ('bodega', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='existencias', to='inventario.bodega', verbose_name='Bodega')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='existencias', to='inventario.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Existencia',
+                'verbose_name_plural': 'Existencias',
+                'unique_together': {('producto', 'bodega')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AlertaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='Fecha de Modificación')),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Cantidad al Abrir')),
+                ('stock_minimo', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Stock Mínimo al Abrir')),
+                ('abierta', models.BooleanField(default=True, verbose_name='Abierta')),
+                ('fecha_cierre', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Cierre')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='alertas_stock', to='empresa.empresa', verbose_name='Empresa')),
+                ('existencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas', to='inventario.existencia', verbose_name='Existencia')),
+            ],
+            options={
+                'verbose_name': 'Alerta de Stock',
+                'verbose_name_plural': 'Alertas de Stock',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['empresa', 'abierta'], name='alerta_empresa_abierta')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('abierta', True)), fields=('existencia',), name='alerta_unica_abierta_por_existencia')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='Fecha de Modificación')),
+                ('tipo', models.CharField(choices=[('ENT', 'Entrada'), ('SAL', 'Salida'), ('AJU', 'Ajuste')], max_length=3, verbose_name='Tipo')),
+                ('cantidad', models.DecimalField(decimal_places=2, help_text='Positiva para entradas y salidas. En ajustes, el signo indica el sentido.', max_digits=14, verbose_name='Cantidad')),
+                ('saldo', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Saldo Resultante')),
+                ('observacion', models.CharField(blank=True, max_length=255, verbose_name='Observación')),
+                ('existencia', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='inventario.existencia', verbose_name='Existencia')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_inventario', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Inventario',
+                'verbose_name_plural': 'Movimientos de Inventario',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['existencia', '-fecha_creacion'], name='movimiento_existencia_fecha')],
+            },
+        ),
+    ]
@@ -1,9 +1,17 @@
 from django.db import models
+from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from apps.core.models import TimeStampedModel, SoftDeleteModel
+from apps.core.managers import SoftDeleteTenantQuerySet, TenantQuerySet
 from apps.terceros.models import Ciudad, Tercero
 
 
+class BodegaQuerySet(SoftDeleteTenantQuerySet):
+    relaciones_lista = ('ciudad__division', 'responsable')
+    campos_lista = ('nombre', 'ciudad__nombre', 'ciudad__division__nombre', 'responsable__nombre')
+    relaciones_detalle = ('ciudad__division__pais', 'responsable')
+
+
 class Bodega(TimeStampedModel, SoftDeleteModel):
     """
     Representa una ubicación física (almacén, sucursal, etc.)
@@ -44,6 +52,8 @@ class Bodega(TimeStampedModel, SoftDeleteModel):
         help_text=_('Tercero responsable de la gestión de la bodega.')
     )
 
+    objects = BodegaQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Bodega')
         verbose_name_plural = _('Bodegas')
@@ -52,3 +62,177 @@ class Bodega(TimeStampedModel, SoftDeleteModel):
 
     def __str__(self):
         return self.nombre
+
+
+class Producto(TimeStampedModel, SoftDeleteModel):
+    """
+    Artículo inventariable de una empresa.
+    """
+    empresa = models.ForeignKey(
+        'empresa.Empresa',
+        on_delete=models.PROTECT,
+        related_name='productos',
+        verbose_name=_('Empresa Propietaria')
+    )
+    codigo = models.CharField(_('Código'), max_length=50)
+    nombre = models.CharField(_('Nombre del Producto'), max_length=150)
+
+    objects = SoftDeleteTenantQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('Producto')
+        verbose_name_plural = _('Productos')
+        ordering = ['nombre']
+        unique_together = ('empresa', 'codigo')
+
+    def __str__(self):
+        return f"{self.nombre} ({self.codigo})"
+
+
+class ExistenciaQuerySet(TenantQuerySet):
+    empresa_field = 'bodega__empresa'
+    relaciones_lista = ('producto', 'bodega')
+    relaciones_detalle = ('producto', 'bodega')
+    orden = ('producto__nombre',)
+
+
+class Existencia(TimeStampedModel):
+    """
+    Saldo de un producto en una bodega. Es la unidad sobre la que se
+    evalúan los mínimos de reposición.
+    """
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.PROTECT,
+        related_name='existencias',
+        verbose_name=_('Producto')
+    )
+    bodega = models.ForeignKey(
+        Bodega,
+        on_delete=models.PROTECT,
+        related_name='existencias',
+        verbose_name=_('Bodega')
+    )
+    cantidad = models.DecimalField(_('Cantidad'), max_digits=14, decimal_places=2, default=0)
+    stock_minimo = models.DecimalField(
+        _('Stock Mínimo'),
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        help_text=_('Por debajo de esta cantidad se genera una alerta de reposición. 0 desactiva la alerta.')
+    )
+    # Estado desnormalizado: permite decidir si hay que abrir o cerrar una
+    # alerta sin consultar la tabla de alertas en cada movimiento.
+    en_alerta = models.BooleanField(_('En Alerta'), default=False, editable=False)
+
+    objects = ExistenciaQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('Existencia')
+        verbose_name_plural = _('Existencias')
+        unique_together = ('producto', 'bodega')
+
+    def __str__(self):
+        return f"{self.producto} en {self.bodega}: {self.cantidad}"
+
+    @property
+    def bajo_minimo(self):
+        return self.stock_minimo > 0 and self.cantidad < self.stock_minimo
+
+
+class MovimientoInventario(TimeStampedModel):
+    """
+    Registro inmutable (libro mayor) de cada entrada, salida o ajuste de
+    inventario. Solo debe crearse a través de `services.registrar_movimiento`.
+    """
+    class Tipo(models.TextChoices):
+        ENTRADA = 'ENT', _('Entrada')
+        SALIDA = 'SAL', _('Salida')
+        AJUSTE = 'AJU', _('Ajuste')
+
+    existencia = models.ForeignKey(
+        Existencia,
+        on_delete=models.PROTECT,
+        related_name='movimientos',
+        verbose_name=_('Existencia')
+    )
+    tipo = models.CharField(_('Tipo'), max_length=3, choices=Tipo.choices)
+    cantidad = models.DecimalField(
+        _('Cantidad'),
+        max_digits=14,
+        decimal_places=2,
+        help_text=_('Positiva para entradas y salidas. En ajustes, el signo indica el sentido.')
+    )
+    saldo = models.DecimalField(_('Saldo Resultante'), max_digits=14, decimal_places=2)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='movimientos_inventario',
+        verbose_name=_('Usuario')
+    )
+    observacion = models.CharField(_('Observación'), max_length=255, blank=True)
+
+    class Meta:
+        verbose_name = _('Movimiento de Inventario')
+        verbose_name_plural = _('Movimientos de Inventario')
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['existencia', '-fecha_creacion'], name='movimiento_existencia_fecha'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.cantidad} - {self.existencia}"
+
+
+class AlertaStockQuerySet(TenantQuerySet):
+    relaciones_lista = ('existencia__producto', 'existencia__bodega')
+    orden = ('-fecha_creacion',)
+
+    def abiertas(self):
+        return self.filter(abierta=True)
+
+
+class AlertaStock(TimeStampedModel):
+    """
+    Alerta de reposición para una existencia que cayó por debajo de su mínimo.
+    Solo puede haber una alerta abierta por existencia.
+    """
+    empresa = models.ForeignKey(
+        'empresa.Empresa',
+        on_delete=models.PROTECT,
+        related_name='alertas_stock',
+        verbose_name=_('Empresa')
+    )
+    existencia = models.ForeignKey(
+        Existencia,
+        on_delete=models.CASCADE,
+        related_name='alertas',
+        verbose_name=_('Existencia')
+    )
+    cantidad = models.DecimalField(_('Cantidad al Abrir'), max_digits=14, decimal_places=2)
+    stock_minimo = models.DecimalField(_('Stock Mínimo al Abrir'), max_digits=14, decimal_places=2)
+    abierta = models.BooleanField(_('Abierta'), default=True)
+    fecha_cierre = models.DateTimeField(_('Fecha de Cierre'), null=True, blank=True)
+
+    objects = AlertaStockQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('Alerta de Stock')
+        verbose_name_plural = _('Alertas de Stock')
+        ordering = ['-fecha_creacion']
+        indexes = [
+            # Sirve el conteo del badge y el listado de alertas abiertas por empresa.
+            models.Index(fields=['empresa', 'abierta'], name='alerta_empresa_abierta'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['existencia'],
+                condition=models.Q(abierta=True),
+                name='alerta_unica_abierta_por_existencia'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Alerta {self.existencia.producto} en {self.existencia.bodega}"
@@ -0,0 +1,97 @@
+import logging
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from apps.core.cache import clave_versionada, leer_cache, namespace_empresa
+from .models import Existencia, MovimientoInventario, AlertaStock
+
+logger = logging.getLogger(__name__)
+
+
+def alertas_cache_key(empresa_id) -> str:
+    """Clave de cache del contador de alertas abiertas de una empresa."""
+    return clave_versionada(f"alertas_stock_{empresa_id}", namespace_empresa(empresa_id))
+
+
+def contar_alertas_abiertas(empresa_id) -> int:
+    """
+    Devuelve el número de alertas abiertas de la empresa, sirviéndolo desde
+    cache. El contador solo se recalcula cuando una alerta se abre o se cierra.
+    """
+    cache_key = alertas_cache_key(empresa_id)
+    total = leer_cache(cache_key)
+    if total is None:
+        total = AlertaStock.objects.de_empresa(empresa_id).abiertas().count()
+        cache.set(cache_key, total, settings.CACHE_TIMEOUTS['ALERTAS_STOCK'])
+    return total
+
+
+def evaluar_alerta(existencia: Existencia) -> None:
+    """
+    Evalúa el mínimo de reposición de UNA existencia y abre o cierra su alerta.
+
+    Se apoya en `existencia.en_alerta` para no consultar la tabla de alertas
+    cuando el estado no cambia, que es el caso de la gran mayoría de movimientos.
+    Debe llamarse dentro de la transacción que modificó la existencia.
+    """
+    bajo_minimo = existencia.bajo_minimo
+    if bajo_minimo == existencia.en_alerta:
+        return
+
+    empresa_id = existencia.bodega.empresa_id
+    if bajo_minimo:
+        AlertaStock.objects.create(
+            empresa_id=empresa_id,
+            existencia=existencia,
+            cantidad=existencia.cantidad,
+            stock_minimo=existencia.stock_minimo,
+        )
+    else:
+        AlertaStock.objects.filter(existencia=existencia, abierta=True).update(
+            abierta=False, fecha_cierre=timezone.now()
+        )
+
+    existencia.en_alerta = bajo_minimo
+    Existencia.objects.filter(pk=existencia.pk).update(en_alerta=bajo_minimo)
+    # El badge solo se invalida si la transacción se confirma.
+    transaction.on_commit(lambda: cache.delete(alertas_cache_key(empresa_id)))
+
+
+def registrar_movimiento(*, producto, bodega, tipo: str, cantidad, usuario=None,
+                         observacion: str = '') -> MovimientoInventario:
+    """
+    Punto único de escritura del libro de inventario.
+
+    Actualiza el saldo de la existencia (producto, bodega) de forma atómica,
+    registra el movimiento y evalúa la alerta de reposición únicamente para
+    el saldo afectado.
+    """
+    cantidad = Decimal(cantidad)
+    if tipo == MovimientoInventario.Tipo.SALIDA:
+        delta = -cantidad
+    else:
+        delta = cantidad
+
+    with transaction.atomic():
+        existencia, _ = Existencia.objects.get_or_create(producto=producto, bodega=bodega)
+        Existencia.objects.filter(pk=existencia.pk).update(
+            cantidad=F('cantidad') + delta, fecha_modificacion=timezone.now()
+        )
+        # Releemos bajo bloqueo para obtener el saldo real tras la actualización concurrente.
+        existencia = Existencia.objects.select_for_update().select_related('bodega').get(pk=existencia.pk)
+
+        movimiento = MovimientoInventario.objects.create(
+            existencia=existencia,
+            tipo=tipo,
+            cantidad=cantidad,
+            saldo=existencia.cantidad,
+            usuario=usuario,
+            observacion=observacion,
+        )
+        evaluar_alerta(existencia)
+
+    logger.debug("Movimiento %s registrado. Saldo resultante: %s", movimiento.pk, existencia.cantidad)
+    return movimiento
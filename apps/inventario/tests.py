@@ -1,3 +1,159 @@
+from decimal import Decimal
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.core.cache import cache
+from django.contrib.auth.models import User
 
-# Create your tests here.
+from apps.empresa.tests import crear_empresas_de_prueba
+from apps.terceros.models import Tercero, TipoTercero
+from .forms import BodegaForm
+from .models import Bodega, Producto, Existencia, AlertaStock, MovimientoInventario
+from .services import registrar_movimiento, contar_alertas_abiertas, alertas_cache_key
+
+
+class AlertaStockTestCase(TestCase):
+    """Tests del motor de alertas de reposición evaluado por movimiento."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_empresas_de_prueba(cls)
+        cls.bodega = Bodega.objects.create(empresa=cls.empresa, nombre="Principal", ciudad=cls.ciudad)
+        cls.otra_bodega = Bodega.objects.create(empresa=cls.empresa, nombre="Norte", ciudad=cls.ciudad)
+        cls.producto = Producto.objects.create(empresa=cls.empresa, codigo="P-001", nombre="Tornillo")
+        cls.user = User.objects.create_user('operario', 'operario@test.com', 'pass')
+        cls.empresa.usuarios.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.existencia = Existencia.objects.create(
+            producto=self.producto, bodega=self.bodega, stock_minimo=Decimal('10')
+        )
+
+    def test_salida_bajo_minimo_abre_una_sola_alerta(self):
+        registrar_movimiento(producto=self.producto, bodega=self.bodega,
+                             tipo=MovimientoInventario.Tipo.ENTRADA, cantidad=12)
+        self.assertFalse(AlertaStock.objects.exists())
+
+        registrar_movimiento(producto=self.producto, bodega=self.bodega,
+                             tipo=MovimientoInventario.Tipo.SALIDA, cantidad=5)
+        registrar_movimiento(producto=self.producto, bodega=self.bodega,
+                             tipo=MovimientoInventario.Tipo.SALIDA, cantidad=1)
+
+        self.assertEqual(AlertaStock.objects.filter(abierta=True).count(), 1)
+        self.existencia.refresh_from_db()
+        self.assertEqual(self.existencia.cantidad, Decimal('6'))
+        self.assertTrue(self.existencia.en_alerta)
+
+    def test_reposicion_cierra_la_alerta(self):
+        registrar_movimiento(producto=self.producto, bodega=self.bodega,
+                             tipo=MovimientoInventario.Tipo.ENTRADA, cantidad=3)
+        registrar_movimiento(producto=self.producto, bodega=self.bodega,
+                             tipo=MovimientoInventario.Tipo.ENTRADA, cantidad=20)
+
+        alerta = AlertaStock.objects.get()
+        self.assertFalse(alerta.abierta)
+        self.assertIsNotNone(alerta.fecha_cierre)
+
+    def test_movimiento_sin_cambio_de_estado_no_consulta_alertas(self):
+        """Solo se evalúa el saldo tocado y sin leer la tabla de alertas."""
+        registrar_movimiento(producto=self.producto, bodega=self.bodega,
+                             tipo=MovimientoInventario.Tipo.ENTRADA, cantidad=50)
+
+        # savepoint + get existencia + update saldo + select_for_update + insert movimiento + release
+        with self.assertNumQueries(6):
+            registrar_movimiento(producto=self.producto, bodega=self.bodega,
+                                 tipo=MovimientoInventario.Tipo.SALIDA, cantidad=1)
+
+    def test_otras_existencias_no_se_evaluan(self):
+        Existencia.objects.create(producto=self.producto, bodega=self.otra_bodega, stock_minimo=Decimal('100'))
+        registrar_movimiento(producto=self.producto, bodega=self.bodega,
+                             tipo=MovimientoInventario.Tipo.ENTRADA, cantidad=50)
+        # La otra existencia está por debajo de su mínimo pero no tuvo movimientos.
+        self.assertFalse(AlertaStock.objects.exists())
+
+    def test_contador_se_sirve_desde_cache_y_se_invalida(self):
+        self.assertEqual(contar_alertas_abiertas(self.empresa.pk), 0)
+        with self.assertNumQueries(0):
+            contar_alertas_abiertas(self.empresa.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_movimiento(producto=self.producto, bodega=self.bodega,
+                                 tipo=MovimientoInventario.Tipo.ENTRADA, cantidad=1)
+
+        self.assertIsNone(cache.get(alertas_cache_key(self.empresa.pk)))
+        self.assertEqual(contar_alertas_abiertas(self.empresa.pk), 1)
+
+    def test_badge_en_plantilla_base(self):
+        registrar_movimiento(producto=self.producto, bodega=self.bodega,
+                             tipo=MovimientoInventario.Tipo.ENTRADA, cantidad=1)
+        self.client.login(username='operario', password='pass')
+        session = self.client.session
+        session['empresa_id'] = self.empresa.pk
+        session['empresa_nombre'] = self.empresa.nombre
+        session.save()
+
+        response = self.client.get(reverse('inventario:lista_alertas'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['alertas_stock_abiertas'], 1)
+        self.assertContains(response, 'Tornillo')
+
+
+class BodegaFormResponsableTestCase(TestCase):
+    """Tests del selector de responsable con autocompletado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_empresas_de_prueba(cls)
+        tipo_tercero = TipoTercero.objects.create(nombre="Empleado")
+        Tercero.objects.bulk_create([
+            Tercero(empresa=cls.empresa, tipo_tercero=tipo_tercero, tipo_identificacion=cls.tipo_id,
+                    nroid=f"{i:05d}", nombre=f"Empleado {i:05d}")
+            for i in range(200)
+        ])
+        cls.responsable = Tercero.objects.get(nroid="00150")
+        cls.user = User.objects.create_user('operario', 'operario@test.com', 'pass')
+        cls.empresa.usuarios.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_solo_se_renderiza_la_opcion_seleccionada(self):
+        bodega = Bodega.objects.create(
+            empresa=self.empresa, nombre="Principal", ciudad=self.ciudad, responsable=self.responsable
+        )
+        form = BodegaForm(instance=bodega, empresa=self.empresa)
+
+        with self.assertNumQueries(1):
+            html = str(form['responsable'])
+
+        self.assertEqual(html.count('<option'), 2)
+        self.assertIn('Empleado 00150 (00150)', html)
+        self.assertIn('data-autocomplete-url', html)
+
+    def test_validacion_busca_un_solo_pk(self):
+        bodega = Bodega.objects.create(empresa=self.empresa, nombre="Principal", ciudad=self.ciudad)
+        form = BodegaForm(data={'nombre': 'sur', 'responsable': self.responsable.pk},
+                          instance=bodega, empresa=self.empresa)
+
+        with self.assertNumQueries(2):  # responsable por pk + unicidad (empresa, nombre)
+            self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['responsable'], self.responsable)
+
+    def test_api_top_n_cacheado_y_busqueda(self):
+        self.client.login(username='operario', password='pass')
+        session = self.client.session
+        session['empresa_id'] = self.empresa.pk
+        session.save()
+        url = reverse('terceros:api_buscar_terceros')
+
+        primeros = self.client.get(url).json()
+        self.assertEqual(len(primeros), 50)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        self.assertEqual([q for q in ctx.captured_queries if 'terceros_tercero' in q['sql']], [])
+
+        encontrados = self.client.get(url, {'q': '00150'}).json()
+        self.assertEqual(encontrados, [{'id': self.responsable.pk, 'nombre': 'Empleado 00150 (00150)'}])
@@ -10,5 +10,8 @@ urlpatterns = [
     path('bodegas/<int:pk>/editar/', views.BodegaUpdateView.as_view(), name='editar_bodega'),
     path('bodegas/<int:pk>/eliminar/', views.BodegaDeleteView.as_view(), name='eliminar_bodega'),
 
+    # Alertas de reposición
+    path('alertas/', views.AlertaStockListView.as_view(), name='lista_alertas'),
+
     # Aquí añadiremos más URLs para productos, movimientos, etc.
 ]
\ No newline at end of file
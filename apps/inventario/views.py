@@ -4,11 +4,13 @@ from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.contrib import messages
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from apps.core.mixins import EmpresaRequiredMixin
-from .models import Bodega
+from apps.core.db_router import ReplicaMixin
+from apps.core.utils import ubicacion_inicial
+from .models import Bodega, AlertaStock
 from .forms import BodegaForm
 
 
-class BodegaListView(EmpresaRequiredMixin, ListView):
+class BodegaListView(ReplicaMixin, EmpresaRequiredMixin, ListView):
     model = Bodega
     template_name = 'inventario/bodega_list.html'
     context_object_name = 'bodegas'
@@ -16,9 +18,7 @@ class BodegaListView(EmpresaRequiredMixin, ListView):
 
     def get_queryset(self):
         """Optimización para precargar datos relacionados y mostrar solo activos de la empresa seleccionada."""
-        return Bodega.objects.filter(empresa=self.empresa_activa).select_related(
-            'ciudad__division__pais', 'responsable'
-        ).filter(activo=True).order_by('nombre')
+        return Bodega.objects.de_empresa(self.empresa_activa).activos().para_lista()
 
 
 class BodegaCreateView(EmpresaRequiredMixin, PermissionRequiredMixin, CreateView):
@@ -31,11 +31,12 @@ class BodegaCreateView(EmpresaRequiredMixin, PermissionRequiredMixin, CreateView
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['titulo'] = 'Crear Nueva Bodega'
+        context['ubicacion_inicial'] = None
         return context
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['empresa_id'] = self.empresa_activa.id
+        kwargs['empresa'] = self.empresa_activa
         return kwargs
 
     def form_valid(self, form):
@@ -51,23 +52,23 @@ class BodegaUpdateView(EmpresaRequiredMixin, UpdateView):
     template_name = 'inventario/bodega_form.html'
     success_url = reverse_lazy('inventario:lista_bodegas')
 
+    def get_queryset(self):
+        """
+        Seguridad: solo bodegas de la empresa activa. Se carga la cadena
+        geográfica y el responsable en la misma consulta.
+        """
+        return Bodega.objects.de_empresa(self.empresa_activa).para_detalle()
+
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['empresa_id'] = self.empresa_activa.id
+        kwargs['empresa'] = self.empresa_activa
         return kwargs
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['titulo'] = f'Editar Bodega: {self.object.nombre}'
-
         # Preparar datos de ubicación para el frontend
-        bodega = self.object
-        if bodega.ciudad:
-            context['ubicacion_inicial'] = {
-                'pais': {'id': bodega.ciudad.division.pais.geoname_id, 'nombre': bodega.ciudad.division.pais.nombre, 'codigo': bodega.ciudad.division.pais.codigo_iso},
-                'division': {'id': bodega.ciudad.division.geoname_id, 'nombre': bodega.ciudad.division.nombre, 'codigo': bodega.ciudad.division.codigo_iso},
-                'ciudad': {'id': bodega.ciudad.geoname_id, 'nombre': bodega.ciudad.nombre}
-            }
+        context['ubicacion_inicial'] = ubicacion_inicial(self.object.ciudad)
         return context
 
     def form_valid(self, form):
@@ -84,12 +85,24 @@ class BodegaDeleteView(EmpresaRequiredMixin, DeleteView):
         """
         Seguridad: Asegura que un usuario solo pueda eliminar bodegas de su empresa.
         """
-        return Bodega.objects.filter(empresa=self.empresa_activa)
+        return Bodega.objects.de_empresa(self.empresa_activa)
+
+    def post(self, request, *args, **kwargs):
+        # Eliminación suave con un UPDATE condicional, sin instanciar antes el objeto.
+        nombres = self.get_queryset().filter(pk=self.kwargs['pk']).cambiar_activo(False)
+        if nombres:
+            messages.success(request, f'La bodega "{nombres[0]}" ha sido eliminada.')
+        else:
+            messages.warning(request, 'La bodega no existe o ya estaba eliminada.')
+        return redirect(self.success_url)
 
 
-    def form_valid(self, form):
-        bodega = self.get_object()
-        bodega.activo = False
-        bodega.save(update_fields=['activo'])
-        messages.success(self.request, f'La bodega "{bodega.nombre}" ha sido eliminada.')
-        return redirect(self.success_url)
+class AlertaStockListView(ReplicaMixin, EmpresaRequiredMixin, ListView):
+    """Listado de alertas de reposición abiertas de la empresa activa."""
+    model = AlertaStock
+    template_name = 'inventario/alerta_list.html'
+    context_object_name = 'alertas'
+    paginate_by = 20
+
+    def get_queryset(self):
+        return AlertaStock.objects.de_empresa(self.empresa_activa).abiertas().para_lista()
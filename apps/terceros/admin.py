@@ -1,17 +1,121 @@
 # C:/proyecto/Guia/terceros/admin.py
+from django.conf import settings
 from django.contrib import admin
+from django.core.cache import cache
 from django.db import models
 from django.db.models import Count, Q
+from apps.core.cache import clave_versionada, leer_cache, namespace_empresa
+from apps.core.paginators import EstimatedCountPaginator
+from apps.empresa.models import Empresa
 from .models import Tercero, TipoIdentificacion, TipoTercero, Pais, Division, Ciudad
+from .services import cambiar_estado_queryset
+
+
+class CachedChoicesFilter(admin.SimpleListFilter):
+    """
+    Filtro cuyas opciones `(id, nombre)` se sirven desde cache, en lugar del
+    `SELECT` (o `SELECT DISTINCT`) que el admin lanza en cada carga del listado.
+    Las subclases definen `cache_key`, `campo` y el `modelo` de las opciones;
+    las que necesiten otra consulta sobrescriben `obtener_opciones()`.
+    """
+    cache_key = None
+    campo = None
+    modelo = None
+    timeout_key = 'FILTROS_ADMIN'
+
+    def obtener_opciones(self, request):
+        return self.modelo.objects.order_by('nombre').values_list('id', 'nombre')
+
+    def get_cache_key(self, request):
+        return self.cache_key
+
+    def lookups(self, request, model_admin):
+        cache_key = self.get_cache_key(request)
+        if cache_key is None:
+            return list(self.obtener_opciones(request))
+        opciones = leer_cache(cache_key)
+        if opciones is None:
+            opciones = list(self.obtener_opciones(request))
+            cache.set(cache_key, opciones, settings.CACHE_TIMEOUTS[self.timeout_key])
+        return opciones
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.campo: self.value()})
+        return queryset
+
+
+class EmpresaFilter(CachedChoicesFilter):
+    title = 'empresa'
+    parameter_name = 'empresa'
+    cache_key = 'admin_filtro_empresas'
+    campo = 'empresa_id'
+    modelo = Empresa
+
+
+class TipoTerceroFilter(CachedChoicesFilter):
+    title = 'tipo de tercero'
+    parameter_name = 'tipo_tercero'
+    # Misma clave que TerceroForm; la invalida la señal de TipoTercero.
+    cache_key = 'tipos_tercero_choices'
+    campo = 'tipo_tercero_id'
+    modelo = TipoTercero
+    timeout_key = 'FORM_CHOICES'
+
+
+class TipoIdentificacionFilter(CachedChoicesFilter):
+    title = 'tipo de identificación'
+    parameter_name = 'tipo_identificacion'
+    cache_key = 'tipos_identificacion_choices'
+    campo = 'tipo_identificacion_id'
+    modelo = TipoIdentificacion
+    timeout_key = 'FORM_CHOICES'
+
+
+class PaisFilter(CachedChoicesFilter):
+    """
+    Países con terceros, acotados a la empresa filtrada si la hay. Sustituye al
+    filtro por relación `ciudad__division__pais`, que recorre todos los países.
+
+    Sin empresa se leen los contadores `total_terceros_activos` de `Pais`, que
+    siempre están al día, así que no se cachea. Con empresa se cachea en su
+    namespace, que se invalida al guardar sus terceros.
+    """
+    title = 'país'
+    parameter_name = 'pais'
+    campo = 'ciudad__division__pais_id'
+    modelo = Pais
+
+    def _empresa_id(self, request):
+        empresa_id = request.GET.get(EmpresaFilter.parameter_name, '')
+        return int(empresa_id) if empresa_id.isdigit() else None
+
+    def get_cache_key(self, request):
+        empresa_id = self._empresa_id(request)
+        if empresa_id:
+            return clave_versionada(f"admin_filtro_paises_{empresa_id}", namespace_empresa(empresa_id))
+        return None
+
+    def obtener_opciones(self, request):
+        empresa_id = self._empresa_id(request)
+        if not empresa_id:
+            return super().obtener_opciones(request).filter(total_terceros_activos__gt=0)
+        terceros = Tercero.objects.filter(ciudad__isnull=False).de_empresa(empresa_id)
+        return terceros.order_by().values_list(
+            'ciudad__division__pais_id', 'ciudad__division__pais__nombre'
+        ).distinct().order_by('ciudad__division__pais__nombre')
 
 
 @admin.register(Tercero)
 class TerceroAdmin(admin.ModelAdmin):
     list_display = ('id', 'nombre', 'nroid', 'tipo_tercero', 'ciudad_completa', 'telefono', 'email', 'activo')
     search_fields = ('nombre', 'nroid', 'nombre_comercial', 'email')
-    list_filter = ('tipo_tercero', 'activo', 'ciudad__division__pais', 'tipo_identificacion')
+    list_filter = (EmpresaFilter, TipoTerceroFilter, 'activo', PaisFilter, TipoIdentificacionFilter)
     raw_id_fields = ('ciudad',)
     list_per_page = 20
+    # Conteos estimados/cacheados y sin el segundo COUNT(*) de la tabla completa.
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     # Optimización crítica: precargamos todas las relaciones necesarias
     def get_queryset(self, request):
@@ -34,15 +138,15 @@ class TerceroAdmin(admin.ModelAdmin):
     actions = ['activar_terceros', 'desactivar_terceros']
 
     def activar_terceros(self, request, queryset):
-        """Activa múltiples terceros de una vez."""
-        updated = queryset.update(activo=True)
+        """Activa múltiples terceros de una vez (mantiene contadores y caches)."""
+        updated = len(cambiar_estado_queryset(queryset, activo=True))
         self.message_user(request, f'{updated} terceros activados exitosamente.')
 
     activar_terceros.short_description = "Activar terceros seleccionados"
 
     def desactivar_terceros(self, request, queryset):
-        """Desactiva múltiples terceros de una vez."""
-        updated = queryset.update(activo=False)
+        """Desactiva múltiples terceros de una vez (mantiene contadores y caches)."""
+        updated = len(cambiar_estado_queryset(queryset, activo=False))
         self.message_user(request, f'{updated} terceros desactivados exitosamente.')
 
     desactivar_terceros.short_description = "Desactivar terceros seleccionados"
@@ -63,71 +167,40 @@ class ReadOnlyAdmin(admin.ModelAdmin):
 
 @admin.register(Pais)
 class PaisAdmin(ReadOnlyAdmin):
-    list_display = ('nombre', 'codigo_iso', 'geoname_id', 'total_terceros')
+    # El total es un contador desnormalizado: ordenar por él usa su índice.
+    list_display = ('nombre', 'codigo_iso', 'geoname_id', 'total_terceros_activos')
     search_fields = ('nombre', 'codigo_iso')
     list_per_page = 50
 
-    def get_queryset(self, request):
-        """Optimizamos con anotaciones para mostrar estadísticas."""
-        queryset = super().get_queryset(request)
-        return queryset.annotate(
-            total_terceros_activos=Count('divisiones__ciudades__tercero', distinct=True)
-        )
-
-    def total_terceros(self, obj):
-        """Muestra el total de terceros por país sin queries adicionales."""
-        return obj.total_terceros_activos
-
-    total_terceros.short_description = "Terceros Activos"
-    total_terceros.admin_order_field = 'total_terceros_activos'
-
 
 @admin.register(Division)
 class DivisionAdmin(ReadOnlyAdmin):
-    list_display = ('nombre', 'pais', 'codigo_iso', 'total_terceros')
+    list_display = ('nombre', 'pais', 'codigo_iso', 'total_terceros_activos')
     search_fields = ('nombre',)
     list_filter = ('pais',)
     list_per_page = 50
 
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
-        return queryset.select_related('pais').annotate(
-            total_terceros_activos=Count('ciudades__tercero', distinct=True)
-        )
-
-    def total_terceros(self, obj):
-        return obj.total_terceros_activos
-
-    total_terceros.short_description = "Terceros Activos"
-    total_terceros.admin_order_field = 'total_terceros_activos'
+        return queryset.select_related('pais')
 
 
 @admin.register(Ciudad)
 class CiudadAdmin(ReadOnlyAdmin):
-    list_display = ('nombre', 'division_completa', 'total_terceros')
+    list_display = ('nombre', 'division_completa', 'total_terceros_activos')
     search_fields = ('nombre',)
     list_filter = ('division__pais',)
     list_per_page = 50
 
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
-        return queryset.select_related(
-            'division__pais'
-        ).annotate(
-            total_terceros_activos=Count('tercero', distinct=True)
-        )
+        return queryset.select_related('division__pais')
 
     def division_completa(self, obj):
         return f"{obj.division.nombre}, {obj.division.pais.nombre}"
 
     division_completa.short_description = "División/País"
 
-    def total_terceros(self, obj):
-        return obj.total_terceros_activos
-
-    total_terceros.short_description = "Terceros Activos"
-    total_terceros.admin_order_field = 'total_terceros_activos'
-
 
 @admin.register(TipoTercero)
 class TipoTerceroAdmin(admin.ModelAdmin):
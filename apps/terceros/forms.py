@@ -3,6 +3,7 @@ from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from .models import Tercero, TipoTercero, TipoIdentificacion
+from apps.core.cache import leer_cache
 from apps.core.forms import UbicacionFormMixin
 
 
@@ -47,12 +48,12 @@ class TerceroForm(UbicacionFormMixin, forms.ModelForm):
         super().__init__(*args, **kwargs)
 
         # Cache de 1 hora para los tipos (cambian raramente)
-        tipos_tercero = cache.get('tipos_tercero_choices')
+        tipos_tercero = leer_cache('tipos_tercero_choices')
         if tipos_tercero is None:
             tipos_tercero = list(TipoTercero.objects.all().order_by('nombre').values_list('id', 'nombre'))
             cache.set('tipos_tercero_choices', tipos_tercero, settings.CACHE_TIMEOUTS['FORM_CHOICES'])
 
-        tipos_identificacion = cache.get('tipos_identificacion_choices')
+        tipos_identificacion = leer_cache('tipos_identificacion_choices')
         if tipos_identificacion is None:
             tipos_identificacion = list(TipoIdentificacion.objects.all().order_by('nombre').values_list('id', 'nombre'))
             cache.set('tipos_identificacion_choices', tipos_identificacion, settings.CACHE_TIMEOUTS['FORM_CHOICES'])
@@ -70,7 +71,7 @@ class TerceroForm(UbicacionFormMixin, forms.ModelForm):
 
         if nroid and self.empresa:
             # Optimización: usamos only() para traer solo el campo que necesitamos validar
-            query = Tercero.objects.filter(empresa=self.empresa, nroid=nroid)
+            query = Tercero.objects.de_empresa(self.empresa).filter(nroid=nroid)
 
             # Si estamos editando, excluimos el propio objeto de la validación
             if self.instance and self.instance.pk:
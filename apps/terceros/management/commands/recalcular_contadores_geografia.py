@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from apps.terceros.services import recalcular_contadores_geografia
+
+
+class Command(BaseCommand):
+    """
+    Reconstruye `total_terceros_activos` de ciudades, divisiones y países.
+
+    Los contadores se mantienen en cada escritura de terceros; este comando es
+    para después de cargas masivas que no pasen por el ORM (SQL directo,
+    `loaddata`) o si se sospecha que se han desviado.
+    """
+    help = "Recalcula los contadores de terceros activos por ciudad, división y país."
+
+    def handle(self, *args, **options):
+        recalcular_contadores_geografia()
+        self.stdout.write(self.style.SUCCESS("Contadores geográficos recalculados."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empresa', '0003_empresa_usuarios'),
+        ('terceros', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tercero',
+            index=models.Index(fields=['empresa', 'activo', 'nombre'], name='tercero_empresa_activo_nombre'),
+        ),
+    ]
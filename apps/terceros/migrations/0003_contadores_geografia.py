@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:52
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar_contadores(apps, schema_editor):
+    """Calcula los contadores iniciales (misma lógica que `recalcular_contadores_geografia`)."""
+    Tercero = apps.get_model('terceros', 'Tercero')
+    Ciudad = apps.get_model('terceros', 'Ciudad')
+    Division = apps.get_model('terceros', 'Division')
+    Pais = apps.get_model('terceros', 'Pais')
+
+    Ciudad.objects.update(total_terceros_activos=Coalesce(Subquery(
+        Tercero.objects.filter(ciudad=OuterRef('pk'), activo=True)
+        .order_by().values('ciudad').annotate(total=Count('id')).values('total')
+    ), Value(0)))
+    Division.objects.update(total_terceros_activos=Coalesce(Subquery(
+        Ciudad.objects.filter(division=OuterRef('pk'))
+        .order_by().values('division').annotate(total=Sum('total_terceros_activos')).values('total')
+    ), Value(0)))
+    Pais.objects.update(total_terceros_activos=Coalesce(Subquery(
+        Division.objects.filter(pais=OuterRef('pk'))
+        .order_by().values('pais').annotate(total=Sum('total_terceros_activos')).values('total')
+    ), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('terceros', '0002_tercero_indice_listado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ciudad',
+            name='total_terceros_activos',
+            field=models.IntegerField(db_index=True, default=0, editable=False, verbose_name='Terceros activos'),
+        ),
+        migrations.AddField(
+            model_name='division',
+            name='total_terceros_activos',
+            field=models.IntegerField(db_index=True, default=0, editable=False, verbose_name='Terceros activos'),
+        ),
+        migrations.AddField(
+            model_name='pais',
+            name='total_terceros_activos',
+            field=models.IntegerField(db_index=True, default=0, editable=False, verbose_name='Terceros activos'),
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,7 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 from apps.core.models import TimeStampedModel, SoftDeleteModel
+from apps.core.managers import SoftDeleteTenantQuerySet
 
 # --- Modelos Geográficos ---
 # Esta estructura normalizada es preferible a usar campos de texto libre.
@@ -13,6 +14,9 @@ class Pais(models.Model):
     nombre = models.CharField(max_length=100, unique=True, verbose_name=_("Nombre"))
     codigo_iso = models.CharField(max_length=2, unique=True, verbose_name=_("Código ISO"))
     geoname_id = models.PositiveIntegerField(unique=True, null=True, blank=True, verbose_name=_("GeoNames ID"))
+    # Contador desnormalizado de terceros activos; lo mantienen las señales y los
+    # cambios masivos de `services.py`. Se reconstruye con `recalcular_contadores_geografia`.
+    total_terceros_activos = models.IntegerField(default=0, editable=False, db_index=True, verbose_name=_("Terceros activos"))
 
     class Meta:
         verbose_name = _("País")
@@ -32,6 +36,9 @@ class Division(models.Model):
         max_length=10, unique=True, verbose_name=_("Código ISO de subdivisión")
     )
     geoname_id = models.PositiveIntegerField(unique=True, null=True, blank=True, verbose_name=("GeoNames ID"))
+    # Contador desnormalizado de terceros activos; lo mantienen las señales y los
+    # cambios masivos de `services.py`. Se reconstruye con `recalcular_contadores_geografia`.
+    total_terceros_activos = models.IntegerField(default=0, editable=False, db_index=True, verbose_name=_("Terceros activos"))
 
     class Meta:
         verbose_name = _("División")
@@ -50,6 +57,9 @@ class Ciudad(models.Model):
     )
     nombre = models.CharField(max_length=100, verbose_name=_("Nombre"))
     geoname_id = models.PositiveIntegerField(unique=True, null=True, blank=True, verbose_name=("GeoNames ID"))
+    # Contador desnormalizado de terceros activos; lo mantienen las señales y los
+    # cambios masivos de `services.py`. Se reconstruye con `recalcular_contadores_geografia`.
+    total_terceros_activos = models.IntegerField(default=0, editable=False, db_index=True, verbose_name=_("Terceros activos"))
 
     class Meta:
         verbose_name = _("Ciudad")
@@ -86,6 +96,12 @@ class TipoIdentificacion(models.Model):
     def __str__(self):
         return self.nombre
 
+class TerceroQuerySet(SoftDeleteTenantQuerySet):
+    relaciones_lista = ('tipo_identificacion',)
+    campos_lista = ('nombre', 'nroid', 'telefono', 'email', 'activo', 'tipo_identificacion__nombre')
+    relaciones_detalle = ('tipo_tercero', 'tipo_identificacion', 'ciudad__division__pais')
+
+
 class Tercero(TimeStampedModel, SoftDeleteModel):
     """
     Modelo para almacenar la información de terceros (clientes, proveedores, etc.).
@@ -178,11 +194,17 @@ class Tercero(TimeStampedModel, SoftDeleteModel):
         null=True
     )
 
+    objects = TerceroQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Tercero')
         verbose_name_plural = _('Terceros')
         ordering = ['nombre']
         unique_together = ('empresa', 'nroid')
+        indexes = [
+            # Cubre el filtro por empresa y estado ordenado por nombre de los listados.
+            models.Index(fields=['empresa', 'activo', 'nombre'], name='tercero_empresa_activo_nombre'),
+        ]
 
     def __str__(self):
         """Representación en texto del objeto."""
@@ -0,0 +1,215 @@
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from apps.core.bloom import FiltroBloom
+from apps.core.cache import clave_versionada, leer_cache, namespace_empresa
+from .models import Tercero, Pais, Division, Ciudad
+
+# Filas por sentencia en los cambios masivos (holgado frente al límite de parámetros de SQLite).
+TAMANO_LOTE = 500
+
+# Filtro de nroids: holgura sobre el total actual y tasa de falsos positivos.
+FILTRO_NROIDS_CAPACIDAD_MINIMA = 1000
+FILTRO_NROIDS_HOLGURA = 1.5
+FILTRO_NROIDS_TASA_ERROR = 0.01
+# Segundos que se retiene el cerrojo de escritura del filtro (reconstrucción o alta).
+FILTRO_NROIDS_CERROJO = 10
+
+
+def dashboard_cache_key(empresa_id) -> str:
+    """Clave de las estadísticas del dashboard, en el namespace de la empresa."""
+    return clave_versionada(f"dashboard_stats_{empresa_id}", namespace_empresa(empresa_id))
+
+
+def terceros_choices_cache_key(empresa_id) -> str:
+    """Clave de las opciones de autocompletado de terceros, en el namespace de la empresa."""
+    return clave_versionada(f"terceros_choices_{empresa_id}", namespace_empresa(empresa_id))
+
+
+def filtro_nroids_cache_key(empresa_id) -> str:
+    """Clave del filtro de Bloom de nroids de la empresa."""
+    return clave_versionada(f"terceros_nroids_{empresa_id}", namespace_empresa(empresa_id))
+
+
+def _cerrojo_filtro(empresa_id) -> str:
+    return f"terceros_nroids_cerrojo_{empresa_id}"
+
+
+def _tomar_cerrojo(clave: str, intentos: int = 20, espera: float = 0.05) -> bool:
+    """Cerrojo entre procesos con `cache.add`; espera un poco si otro lo tiene."""
+    for _ in range(intentos):
+        if cache.add(clave, 1, FILTRO_NROIDS_CERROJO):
+            return True
+        time.sleep(espera)
+    return False
+
+
+def _construir_filtro_nroids(empresa_id) -> FiltroBloom:
+    nroids = list(Tercero.objects.filter(empresa_id=empresa_id).values_list('nroid', flat=True))
+    filtro = FiltroBloom.para(
+        max(FILTRO_NROIDS_CAPACIDAD_MINIMA, int(len(nroids) * FILTRO_NROIDS_HOLGURA)),
+        FILTRO_NROIDS_TASA_ERROR,
+    )
+    for nroid in nroids:
+        filtro.add(nroid)
+    return filtro
+
+
+def obtener_filtro_nroids(empresa_id, reconstruir: bool = False) -> FiltroBloom:
+    """
+    Filtro de Bloom con los nroids de la empresa, desde el cache compartido.
+    Se reconstruye (una consulta de una columna) si no está, si se saturó o si
+    se pide con `reconstruir` (p. ej. para calentar el cache).
+    """
+    clave = filtro_nroids_cache_key(empresa_id)
+    datos = None if reconstruir else leer_cache(clave)
+    if datos is not None:
+        filtro = FiltroBloom.desde_dict(datos)
+        if not filtro.saturado:
+            return filtro
+
+    # Con el cerrojo, una alta concurrente no puede perderse entre la lectura
+    # de la base de datos y la escritura del filtro en el cache.
+    cerrojo = _cerrojo_filtro(empresa_id)
+    tomado = _tomar_cerrojo(cerrojo)
+    try:
+        filtro = _construir_filtro_nroids(empresa_id)
+        if tomado:
+            cache.set(clave, filtro.a_dict(), settings.CACHE_TIMEOUTS.get('FILTRO_NROIDS', 86400))
+    finally:
+        if tomado:
+            cache.delete(cerrojo)
+    return filtro
+
+
+def registrar_nroid(empresa_id, nroid: str) -> None:
+    """
+    Añade un nroid al filtro cacheado de la empresa. Si el filtro no está en
+    cache no hay nada que hacer: se construirá completo cuando se pida. Si no
+    se consigue el cerrojo, se descarta el filtro para no dejar un falso negativo.
+    """
+    clave = filtro_nroids_cache_key(empresa_id)
+    cerrojo = _cerrojo_filtro(empresa_id)
+    if not _tomar_cerrojo(cerrojo):
+        cache.delete(clave)
+        return
+    try:
+        datos = cache.get(clave)
+        if datos is None:
+            return
+        filtro = FiltroBloom.desde_dict(datos)
+        if nroid in filtro:
+            return
+        filtro.add(nroid)
+        cache.set(clave, filtro.a_dict(), settings.CACHE_TIMEOUTS.get('FILTRO_NROIDS', 86400))
+    finally:
+        cache.delete(cerrojo)
+
+
+def nroid_puede_existir(empresa_id, nroid: str) -> bool:
+    """False solo si es seguro que la empresa no tiene un tercero con ese nroid."""
+    return nroid in obtener_filtro_nroids(empresa_id)
+
+
+def invalidar_caches_terceros(empresa_id) -> None:
+    """
+    Invalida los caches derivados de los terceros de una empresa. Las señales lo
+    hacen fila a fila; las escrituras masivas con `update()` lo llaman una sola vez.
+    """
+    cache.delete_many([dashboard_cache_key(empresa_id), terceros_choices_cache_key(empresa_id)])
+
+
+def _aplicar_deltas(modelo, deltas) -> None:
+    """Suma `deltas[pk]` al contador; una sentencia por valor de delta distinto."""
+    por_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            por_delta[delta].append(pk)
+    for delta, pks in por_delta.items():
+        modelo.objects.filter(pk__in=pks).update(
+            total_terceros_activos=F('total_terceros_activos') + delta
+        )
+
+
+def ajustar_contadores_geografia(deltas_por_ciudad) -> None:
+    """
+    Propaga a ciudad, división y país la variación de terceros activos de cada
+    ciudad (`{ciudad_id: delta}`). Los `F()` hacen el incremento atómico en la
+    base de datos; debe llamarse dentro de la transacción de la escritura.
+    """
+    deltas = {ciudad_id: delta for ciudad_id, delta in deltas_por_ciudad.items() if ciudad_id and delta}
+    if not deltas:
+        return
+
+    por_division, por_pais = Counter(), Counter()
+    cadena = Ciudad.objects.filter(pk__in=deltas).values_list('id', 'division_id', 'division__pais_id')
+    for ciudad_id, division_id, pais_id in cadena:
+        por_division[division_id] += deltas[ciudad_id]
+        por_pais[pais_id] += deltas[ciudad_id]
+
+    _aplicar_deltas(Ciudad, deltas)
+    _aplicar_deltas(Division, por_division)
+    _aplicar_deltas(Pais, por_pais)
+
+
+def recalcular_contadores_geografia() -> None:
+    """
+    Reconstruye los contadores desde cero con tres `UPDATE ... SET = (subconsulta)`,
+    de abajo hacia arriba. Útil tras cargas masivas o si se sospecha desviación.
+    """
+    activos_por_ciudad = Tercero.objects.filter(
+        ciudad=OuterRef('pk'), activo=True
+    ).order_by().values('ciudad').annotate(total=Count('id')).values('total')
+    suma_por_division = Ciudad.objects.filter(
+        division=OuterRef('pk')
+    ).order_by().values('division').annotate(total=Sum('total_terceros_activos')).values('total')
+    suma_por_pais = Division.objects.filter(
+        pais=OuterRef('pk')
+    ).order_by().values('pais').annotate(total=Sum('total_terceros_activos')).values('total')
+
+    with transaction.atomic():
+        Ciudad.objects.update(total_terceros_activos=Coalesce(Subquery(activos_por_ciudad), Value(0)))
+        Division.objects.update(total_terceros_activos=Coalesce(Subquery(suma_por_division), Value(0)))
+        Pais.objects.update(total_terceros_activos=Coalesce(Subquery(suma_por_pais), Value(0)))
+
+
+def _cambiar_estado(base, pks, activo: bool, lote: int) -> list:
+    """Núcleo de los cambios masivos de estado: UPDATE por lote, contadores y caches."""
+    pks = list(pks)
+    filas = []
+    with transaction.atomic():
+        for inicio in range(0, len(pks), lote):
+            filas += base.filter(pk__in=pks[inicio:inicio + lote]).cambiar_activo(
+                activo, campos=('nombre', 'ciudad_id', 'empresa_id')
+            )
+        deltas = Counter()
+        for _, ciudad_id, _ in filas:
+            deltas[ciudad_id] += 1 if activo else -1
+        ajustar_contadores_geografia(deltas)
+        empresas = {empresa_id for _, _, empresa_id in filas if empresa_id}
+        if empresas:
+            # Una sola invalidación por empresa para todo el cambio, y solo si se confirma.
+            def invalidar_empresas():
+                for empresa_id in empresas:
+                    invalidar_caches_terceros(empresa_id)
+
+            transaction.on_commit(invalidar_empresas)
+    return [nombre for nombre, _, _ in filas]
+
+
+def cambiar_estado_terceros(empresa, pks, activo: bool, lote: int = TAMANO_LOTE) -> list:
+    """
+    Activa o desactiva los terceros indicados de la empresa con una sentencia
+    UPDATE condicional por lote. Los ids de otras empresas o que ya estaban en
+    el estado pedido se ignoran. Devuelve los nombres de los terceros modificados.
+    """
+    return _cambiar_estado(Tercero.objects.de_empresa(empresa), pks, activo, lote)
+
+
+def cambiar_estado_queryset(queryset, activo: bool, lote: int = TAMANO_LOTE) -> list:
+    """Igual que `cambiar_estado_terceros`, para una selección arbitraria (acciones del admin)."""
+    return _cambiar_estado(Tercero.objects.all(), queryset.values_list('pk', flat=True), activo, lote)
@@ -1,7 +1,13 @@
-from django.db.models.signals import post_save, post_delete
+from collections import Counter
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
 from django.core.cache import cache
-from .models import Tercero, TipoIdentificacion, TipoTercero
+from .models import Tercero, TipoIdentificacion, TipoTercero, Pais, Division, Ciudad
+from .services import (
+    ajustar_contadores_geografia, dashboard_cache_key, registrar_nroid, terceros_choices_cache_key,
+)
 
 
 @receiver([post_save, post_delete], sender=Tercero)
@@ -11,8 +17,27 @@ def invalidar_cache_dashboard(sender, instance, **kwargs):
     de esa empresa se crea, actualiza o elimina.
     """
     if instance.empresa_id:
-        cache_key = f"dashboard_stats_{instance.empresa_id}"
-        cache.delete(cache_key)
+        cache.delete(dashboard_cache_key(instance.empresa_id))
+
+
+@receiver([post_save, post_delete], sender=Tercero)
+def invalidar_cache_terceros_choices(sender, instance, **kwargs):
+    """Invalida las opciones de autocompletado de terceros de la empresa."""
+    if instance.empresa_id:
+        cache.delete(terceros_choices_cache_key(instance.empresa_id))
+
+@receiver(post_save, sender=Tercero)
+def registrar_nroid_en_filtro(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Añade el nroid al filtro de Bloom de la empresa tras confirmar la
+    transacción. Los borrados no se reflejan: un nroid que ya no existe solo
+    provoca un falso positivo, que la consulta de verificación descarta.
+    """
+    if raw or not instance.empresa_id or not instance.nroid:
+        return
+    if update_fields is not None and 'nroid' not in update_fields:
+        return
+    transaction.on_commit(lambda: registrar_nroid(instance.empresa_id, instance.nroid))
 
 @receiver([post_save, post_delete], sender=TipoIdentificacion)
 def invalidar_cache_tipos_id(sender, instance, **kwargs):
@@ -22,4 +47,56 @@ def invalidar_cache_tipos_id(sender, instance, **kwargs):
 @receiver([post_save, post_delete], sender=TipoTercero)
 def invalidar_cache_tipos_tercero(sender, instance, **kwargs):
     """Invalida el cache de los tipos de tercero cuando cambian."""
-    cache.delete('tipos_tercero_choices')
\ No newline at end of file
+    cache.delete('tipos_tercero_choices')
+
+@receiver(pre_save, sender=Tercero)
+def recordar_ubicacion_anterior(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Guarda la ciudad y el estado previos para ajustar los contadores geográficos
+    en `post_save`. Se omite la lectura si el guardado no toca esos campos.
+    """
+    instance._ubicacion_anterior = (None, False)
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not {'activo', 'ciudad'} & set(update_fields):
+        instance._ubicacion_anterior = None
+        return
+    anterior = Tercero.objects.filter(pk=instance.pk).values_list('ciudad_id', 'activo').first()
+    if anterior:
+        instance._ubicacion_anterior = anterior
+
+
+@receiver(post_save, sender=Tercero)
+def actualizar_contadores_geografia(sender, instance, raw=False, **kwargs):
+    """Ajusta `total_terceros_activos` de ciudad, división y país si el tercero cambió de conteo."""
+    anterior = getattr(instance, '_ubicacion_anterior', None)
+    if raw or anterior is None:
+        return
+    ciudad_anterior, activo_anterior = anterior
+    deltas = Counter()
+    if activo_anterior and ciudad_anterior:
+        deltas[ciudad_anterior] -= 1
+    if instance.activo and instance.ciudad_id:
+        deltas[instance.ciudad_id] += 1
+    ajustar_contadores_geografia(deltas)
+
+
+@receiver(post_delete, sender=Tercero)
+def descontar_tercero_eliminado(sender, instance, **kwargs):
+    if instance.activo and instance.ciudad_id:
+        ajustar_contadores_geografia({instance.ciudad_id: -1})
+
+
+@receiver(pre_delete, sender=Ciudad)
+def descontar_ciudad_eliminada(sender, instance, **kwargs):
+    """
+    Al borrar una ciudad sus terceros quedan sin ciudad (SET_NULL, sin señales):
+    se descuentan de su división y país.
+    """
+    fila = Ciudad.objects.filter(pk=instance.pk).values_list(
+        'total_terceros_activos', 'division_id', 'division__pais_id'
+    ).first()
+    if fila and fila[0]:
+        total, division_id, pais_id = fila
+        Division.objects.filter(pk=division_id).update(total_terceros_activos=F('total_terceros_activos') - total)
+        Pais.objects.filter(pk=pais_id).update(total_terceros_activos=F('total_terceros_activos') - total)
@@ -0,0 +1,24 @@
+"""Tareas en segundo plano de terceros (ver `apps.core.trabajos`)."""
+from apps.core.trabajos import tarea
+from .services import obtener_filtro_nroids, recalcular_contadores_geografia
+
+
+@tarea('terceros.recalcular_contadores_geografia')
+def recalcular_contadores(trabajo, progreso):
+    progreso.avanzar(0, mensaje="Recalculando contadores geográficos...", forzar=True)
+    recalcular_contadores_geografia()
+    return {'mensaje': "Contadores geográficos recalculados."}
+
+
+@tarea('terceros.calentar_filtros_nroids')
+def calentar_filtros_nroids(trabajo, progreso):
+    """Reconstruye el filtro de nroids de las empresas indicadas (o de todas)."""
+    from apps.empresa.models import Empresa
+
+    empresas = trabajo.parametros.get('empresas')
+    if empresas is None:
+        empresas = list(Empresa.objects.filter(activo=True).values_list('pk', flat=True))
+    for procesadas, empresa_id in enumerate(empresas, start=1):
+        obtener_filtro_nroids(empresa_id, reconstruir=True)
+        progreso.avanzar(procesadas, len(empresas))
+    return {'empresas': len(empresas)}
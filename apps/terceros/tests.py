@@ -3,13 +3,18 @@ from django.test import TestCase, TransactionTestCase
 from django.urls import reverse
 from django.core.cache import cache
 from django.db import connection
-from django.test.utils import override_settings
+from django.test.utils import override_settings, CaptureQueriesContext
 from django.contrib.auth.models import User
 from unittest.mock import patch, Mock
 import json
+from io import StringIO
+from django.core.management import call_command
 
 from .models import Tercero, TipoTercero, TipoIdentificacion, Pais, Division, Ciudad
 from .forms import TerceroForm
+from .services import cambiar_estado_terceros, dashboard_cache_key, filtro_nroids_cache_key, obtener_filtro_nroids
+from apps.core.cache import NAMESPACE_GEONAMES, clave_versionada
+from apps.empresa.tests import crear_empresas_de_prueba
 
 
 class QueryOptimizationTestCase(TestCase):
@@ -222,8 +227,12 @@ class CacheInvalidationTestCase(TransactionTestCase):
         self.client.login(username='admin', password='pass')
 
         # Establecer datos en cache
-        cache.set('dashboard_stats', {'test': 'data'}, 300)
-        cache.set(f'geonames_paises_test', [{'test': 'data'}], 300)
+        claves = [
+            clave_versionada('geonames_paises_test', NAMESPACE_GEONAMES),
+            clave_versionada('geonames_divisiones_3686110_test', NAMESPACE_GEONAMES),
+        ]
+        for clave in claves:
+            cache.set(clave, [{'test': 'data'}], 300)
 
         # Llamar API de invalidación
         url = reverse('terceros:api_invalidar_cache')
@@ -233,8 +242,10 @@ class CacheInvalidationTestCase(TransactionTestCase):
         data = response.json()
         self.assertIn('mensaje', data)
 
-        # Verificar que el cache se invalidó
-        self.assertIsNone(cache.get('dashboard_stats'))
+        # Verificar que se invalidaron todas las claves de GeoNames, no solo la de países
+        self.assertIsNone(cache.get(clave_versionada('geonames_paises_test', NAMESPACE_GEONAMES)))
+        self.assertIsNone(cache.get(clave_versionada('geonames_divisiones_3686110_test', NAMESPACE_GEONAMES)))
+        self.assertEqual(cache.get(claves[0]), [{'test': 'data'}])  # huérfana, caduca sola
 
 
 class FormValidationTestCase(TestCase):
@@ -349,6 +360,426 @@ class StressTestCase(TransactionTestCase):
 
 
 # Utilidad para tests de performance
+class CambioEstadoTestCase(TestCase):
+    """Tests de la eliminación suave y reactivación con UPDATE condicional."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_empresas_de_prueba(cls)
+        tipo_tercero = TipoTercero.objects.create(nombre="Cliente")
+        tipo_id = cls.tipo_id
+        cls.terceros = Tercero.objects.bulk_create([
+            Tercero(empresa=cls.empresa, tipo_tercero=tipo_tercero, tipo_identificacion=tipo_id,
+                    nroid=f"{i}", nombre=f"Tercero {i}")
+            for i in range(5)
+        ])
+        cls.ajeno = Tercero.objects.create(
+            empresa=cls.otra_empresa, tipo_tercero=tipo_tercero, tipo_identificacion=tipo_id,
+            nroid="99", nombre="Ajeno"
+        )
+        cls.user = User.objects.create_user('usuario', 'usuario@test.com', 'pass')
+        cls.empresa.usuarios.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='usuario', password='pass')
+        session = self.client.session
+        session['empresa_id'] = self.empresa.pk
+        session.save()
+
+    def consultas_tercero(self, queries):
+        return [q['sql'] for q in queries if '"terceros_tercero"' in q['sql']]
+
+    def test_eliminar_bloquea_y_actualiza_sin_instanciar(self):
+        tercero = self.terceros[0]
+        cache.set(dashboard_cache_key(self.empresa.pk), {'terceros': {}})
+
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('terceros:eliminar_tercero', kwargs={'pk': tercero.pk}))
+
+        self.assertRedirects(response, reverse('terceros:Lista_terceros'), fetch_redirect_response=False)
+        consultas = self.consultas_tercero(ctx.captured_queries)
+        self.assertEqual(len(consultas), 2)
+        self.assertTrue(consultas[0].startswith('SELECT'))
+        self.assertTrue(consultas[1].startswith('UPDATE'))
+        self.assertFalse(Tercero.objects.get(pk=tercero.pk).activo)
+        self.assertIsNone(cache.get(dashboard_cache_key(self.empresa.pk)))
+
+    def test_no_se_modifican_terceros_de_otra_empresa(self):
+        response = self.client.post(reverse('terceros:eliminar_tercero', kwargs={'pk': self.ajeno.pk}), follow=True)
+
+        self.assertContains(response, 'no existe o ya estaba eliminado')
+        self.assertTrue(Tercero.objects.get(pk=self.ajeno.pk).activo)
+
+    def test_reactivar_devuelve_el_nombre(self):
+        tercero = self.terceros[1]
+        Tercero.objects.filter(pk=tercero.pk).update(activo=False)
+
+        response = self.client.post(reverse('terceros:activar_tercero', kwargs={'pk': tercero.pk}), follow=True)
+
+        self.assertContains(response, 'El tercero &quot;Tercero 1&quot; ha sido reactivado')
+        self.assertTrue(Tercero.objects.get(pk=tercero.pk).activo)
+
+    def test_cambio_masivo_por_lotes(self):
+        pks = [t.pk for t in self.terceros] + [self.ajeno.pk]
+
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True) as callbacks:
+            nombres = cambiar_estado_terceros(self.empresa, pks, activo=False, lote=2)
+
+        self.assertEqual(len(nombres), 5)
+        # 6 ids en lotes de 2: bloqueo + UPDATE por lote y una sola invalidación.
+        self.assertEqual(len(self.consultas_tercero(ctx.captured_queries)), 6)
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(Tercero.objects.filter(empresa=self.empresa, activo=True).exists())
+        self.assertTrue(Tercero.objects.get(pk=self.ajeno.pk).activo)
+
+    def test_vista_de_cambio_masivo(self):
+        pks = [self.terceros[0].pk, self.terceros[1].pk]
+
+        response = self.client.post(reverse('terceros:cambiar_estado_masivo'), {
+            'ids': pks, 'accion': 'desactivar', 'estado': 'activos'
+        })
+
+        self.assertRedirects(response, f"{reverse('terceros:Lista_terceros')}?estado=activos", fetch_redirect_response=False)
+        self.assertEqual(Tercero.objects.filter(pk__in=pks, activo=False).count(), 2)
+
+
+class TerceroAdminChangelistTestCase(TestCase):
+    """Tests del changelist de terceros: filtros cacheados y conteos sin COUNT(*) repetidos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_empresas_de_prueba(cls)
+        tipo_tercero = TipoTercero.objects.create(nombre="Cliente")
+        peru = Pais.objects.create(nombre="Perú", codigo_iso="PE", geoname_id=3932488)
+        lima = Ciudad.objects.create(nombre="Lima", geoname_id=3936456, division=Division.objects.create(
+            nombre="Lima", codigo_iso="PE-LIM", geoname_id=3936452, pais=peru))
+        bogota = cls.ciudad
+        for empresa, nroid, ciudad in [(cls.empresa, '1', bogota), (cls.empresa, '2', bogota), (cls.otra_empresa, '3', lima)]:
+            Tercero.objects.create(empresa=empresa, tipo_tercero=tipo_tercero, tipo_identificacion=cls.tipo_id,
+                                   nroid=nroid, nombre=f"Tercero {nroid}", ciudad=ciudad)
+        cls.admin = User.objects.create_superuser('admin', 'admin@test.com', 'pass')
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='admin', password='pass')
+        self.url = reverse('admin:terceros_tercero_changelist')
+
+    def test_segunda_carga_sin_distinct_ni_count(self):
+        self.client.get(self.url)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 3)
+        sqls = [q['sql'] for q in ctx.captured_queries]
+        self.assertFalse([sql for sql in sqls if 'DISTINCT' in sql])
+        self.assertFalse([sql for sql in sqls if 'COUNT(' in sql])
+
+    def test_paises_acotados_a_la_empresa(self):
+        response = self.client.get(self.url, {'empresa': self.empresa.pk})
+
+        filtro_pais = next(f for f in response.context['cl'].filter_specs if getattr(f, 'parameter_name', None) == 'pais')
+        self.assertEqual([nombre for _, nombre in filtro_pais.lookup_choices], ['Colombia'])
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+    def test_paises_sin_empresa_salen_de_los_contadores(self):
+        tercero = Tercero.objects.get(nroid='3')
+        cambiar_estado_terceros(tercero.empresa, [tercero.pk], activo=False)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+
+        filtro_pais = next(f for f in response.context['cl'].filter_specs if getattr(f, 'parameter_name', None) == 'pais')
+        # Perú deja de aparecer al momento, sin esperar a que caduque ningún cache.
+        self.assertEqual([nombre for _, nombre in filtro_pais.lookup_choices], ['Colombia'])
+        self.assertFalse([q for q in ctx.captured_queries if 'DISTINCT' in q['sql']])
+
+    def test_filtro_por_pais(self):
+        peru = Pais.objects.get(codigo_iso="PE")
+        response = self.client.get(self.url, {'pais': peru.pk})
+
+        self.assertEqual([t.nombre for t in response.context['cl'].result_list], ['Tercero 3'])
+
+
+class ContadoresGeografiaTestCase(TestCase):
+    """Tests de los contadores desnormalizados de terceros activos por ubicación."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_empresas_de_prueba(cls)
+        cls.tipo_tercero = TipoTercero.objects.create(nombre="Cliente")
+        cls.bogota = cls.ciudad
+        cls.soacha = Ciudad.objects.create(nombre="Soacha", geoname_id=3667905, division=cls.division)
+
+    def crear_tercero(self, nroid, ciudad):
+        return Tercero.objects.create(
+            empresa=self.empresa, tipo_tercero=self.tipo_tercero, tipo_identificacion=self.tipo_id,
+            nroid=nroid, nombre=f"Tercero {nroid}", ciudad=ciudad
+        )
+
+    def assertContadores(self, bogota, soacha):
+        self.assertEqual(Ciudad.objects.get(pk=self.bogota.pk).total_terceros_activos, bogota)
+        self.assertEqual(Ciudad.objects.get(pk=self.soacha.pk).total_terceros_activos, soacha)
+        self.assertEqual(Division.objects.get(pk=self.division.pk).total_terceros_activos, bogota + soacha)
+        self.assertEqual(Pais.objects.get(pk=self.pais.pk).total_terceros_activos, bogota + soacha)
+
+    def test_crear_mover_y_eliminar(self):
+        tercero = self.crear_tercero('1', self.bogota)
+        self.crear_tercero('2', self.bogota)
+        self.assertContadores(bogota=2, soacha=0)
+
+        tercero.ciudad = self.soacha
+        tercero.save()
+        self.assertContadores(bogota=1, soacha=1)
+
+        tercero.activo = False
+        tercero.save(update_fields=['activo'])
+        self.assertContadores(bogota=1, soacha=0)
+
+        Tercero.objects.filter(pk=tercero.pk).first().delete()
+        Tercero.objects.get(nroid='2').delete()
+        self.assertContadores(bogota=0, soacha=0)
+
+    def test_guardado_sin_cambios_de_ubicacion_no_consulta(self):
+        tercero = self.crear_tercero('1', self.bogota)
+        tercero.telefono = '555'
+
+        with CaptureQueriesContext(connection) as ctx:
+            tercero.save(update_fields=['telefono'])
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_cambio_masivo_ajusta_contadores(self):
+        pks = [self.crear_tercero(str(i), self.bogota if i % 2 else self.soacha).pk for i in range(5)]
+        self.assertContadores(bogota=2, soacha=3)
+
+        cambiar_estado_terceros(self.empresa, pks, activo=False, lote=2)
+        self.assertContadores(bogota=0, soacha=0)
+
+        cambiar_estado_terceros(self.empresa, pks[:3], activo=True)
+        self.assertContadores(bogota=1, soacha=2)
+
+    def test_recalcular_desde_cero(self):
+        self.crear_tercero('1', self.bogota)
+        self.crear_tercero('2', self.soacha)
+        Ciudad.objects.update(total_terceros_activos=99)
+        Pais.objects.update(total_terceros_activos=0)
+
+        call_command('recalcular_contadores_geografia', stdout=StringIO())
+
+        self.assertContadores(bogota=1, soacha=1)
+
+    def test_borrar_ciudad_descuenta_division_y_pais(self):
+        self.crear_tercero('1', self.bogota)
+        self.crear_tercero('2', self.soacha)
+
+        Ciudad.objects.get(pk=self.soacha.pk).delete()
+
+        self.assertEqual(Division.objects.get(pk=self.division.pk).total_terceros_activos, 1)
+        self.assertEqual(Pais.objects.get(pk=self.pais.pk).total_terceros_activos, 1)
+
+    def test_admin_de_paises_sin_agregados(self):
+        User.objects.create_superuser('admin', 'admin@test.com', 'pass')
+        self.client.login(username='admin', password='pass')
+        self.crear_tercero('1', self.bogota)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin:terceros_pais_changelist'), {'o': '-4'})
+
+        self.assertEqual(response.status_code, 200)
+        consultas_pais = [q['sql'] for q in ctx.captured_queries if 'FROM "terceros_pais"' in q['sql']]
+        self.assertTrue(consultas_pais)
+        self.assertFalse([sql for sql in consultas_pais if 'JOIN' in sql or 'GROUP BY' in sql])
+
+
+class RecalcularContadoresTrabajoTestCase(TestCase):
+    """El recálculo de contadores se encola como trabajo y la interfaz consulta su estado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_empresas_de_prueba(cls)
+        cls.staff = User.objects.create_user('staff', 'staff@test.com', 'pass', is_staff=True)
+        cls.usuario = User.objects.create_user('usuario', 'usuario@test.com', 'pass')
+        cls.empresa.usuarios.add(cls.staff, cls.usuario)
+
+    def login(self, username):
+        self.client.login(username=username, password='pass')
+        session = self.client.session
+        session['empresa_id'] = self.empresa.pk
+        session.save()
+
+    def test_encola_una_sola_vez_y_expone_su_estado(self):
+        from apps.core.models import Trabajo
+        from apps.core.trabajos import ejecutar, reclamar_siguiente
+
+        self.login('staff')
+        url = reverse('terceros:api_recalcular_contadores')
+        response = self.client.post(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 202)
+        datos = response.json()
+        self.assertEqual(self.client.post(url, HTTP_ACCEPT='application/json').json()['id'], datos['id'])
+        self.assertEqual(Trabajo.objects.count(), 1)
+
+        ejecutar(reclamar_siguiente('w1'))
+        estado = self.client.get(datos['estado_url']).json()
+        self.assertEqual(estado['estado'], 'completado')
+        self.assertTrue(estado['terminado'])
+
+    def test_solo_staff(self):
+        self.login('usuario')
+        response = self.client.post(reverse('terceros:api_recalcular_contadores'), HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertNotContains(self.client.get(reverse('dashboard')), 'data-trabajo')
+
+    def test_dashboard_muestra_el_boton_al_staff(self):
+        self.login('staff')
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, reverse('terceros:api_recalcular_contadores'))
+        self.assertContains(response, 'js/trabajos.js')
+
+
+class GeonamesETagTestCase(TestCase):
+    """Las listas de ubicaciones completas se revalidan por ETag (304 sin cuerpo)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user('usuario', 'usuario@test.com', 'pass')
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='usuario', password='pass')
+
+    def respuesta_geonames(self, elementos):
+        mock_response = Mock(status_code=200)
+        mock_response.json.return_value = {'geonames': elementos}
+        return mock_response
+
+    @patch('apps.terceros.views.requests.get')
+    def test_lista_completa_de_paises_sin_tope(self, mock_get):
+        mock_get.return_value = self.respuesta_geonames([
+            {'geonameId': i, 'countryName': f'País {i:03d}', 'countryCode': f'{i:02d}'} for i in range(120)
+        ])
+
+        response = self.client.get(reverse('terceros:api_buscar_paises'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 120)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    @patch('apps.terceros.views.requests.get')
+    def test_if_none_match_devuelve_304(self, mock_get):
+        mock_get.return_value = self.respuesta_geonames([{'geonameId': 3688689, 'name': 'Bogotá'}])
+        url = reverse('terceros:api_buscar_ciudades')
+
+        primera = self.client.get(url, {'geoname_id': 3686210})
+        segunda = self.client.get(url, {'geoname_id': 3686210}, HTTP_IF_NONE_MATCH=primera['ETag'])
+
+        self.assertEqual(segunda.status_code, 304)
+        self.assertEqual(segunda.content, b'')
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+        self.assertEqual(mock_get.call_count, 1)
+
+        # Otra lista, otro ETag: no se confunde con la ya revalidada.
+        mock_get.return_value = self.respuesta_geonames([{'geonameId': 3687925, 'name': 'Cali'}])
+        otra = self.client.get(url, {'geoname_id': 3687951}, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(otra.status_code, 200)
+
+    @patch('apps.terceros.views.requests.get')
+    def test_datos_incompletos_generan_un_solo_aviso(self, mock_get):
+        ciudades = [{'geonameId': i} for i in range(1000)] + [{'geonameId': 3688689, 'name': 'Bogotá'}]
+        mock_get.return_value = self.respuesta_geonames(ciudades)
+
+        with self.assertLogs('apps.terceros.views', 'WARNING') as logs:
+            response = self.client.get(reverse('terceros:api_buscar_ciudades'), {'geoname_id': 3686210})
+
+        self.assertEqual(response.json(), [{'id': 3688689, 'nombre': 'Bogotá'}])
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].args[0], 1000)
+
+    @patch('apps.terceros.views.requests.get')
+    def test_lista_vacia_no_se_cachea_en_el_navegador(self, mock_get):
+        mock_get.return_value = Mock(status_code=429)
+
+        response = self.client.get(reverse('terceros:api_buscar_divisiones'), {'geoname_id': 3686110})
+
+        self.assertEqual(response.json(), [])
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIn('no-store', response['Cache-Control'])
+
+
+class FiltroNroidsTestCase(TestCase):
+    """La verificación de documento responde "no existe" sin consultar la base de datos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_empresas_de_prueba(cls)
+        cls.tipo_tercero = TipoTercero.objects.create(nombre="Cliente")
+        Tercero.objects.bulk_create([
+            Tercero(empresa=cls.empresa, tipo_tercero=cls.tipo_tercero, tipo_identificacion=cls.tipo_id,
+                    nroid=f"800{i}", nombre=f"Tercero {i}")
+            for i in range(20)
+        ])
+        Tercero.objects.create(empresa=cls.otra_empresa, tipo_tercero=cls.tipo_tercero,
+                               tipo_identificacion=cls.tipo_id, nroid="555", nombre="Ajeno")
+        cls.user = User.objects.create_user('usuario', 'usuario@test.com', 'pass')
+        cls.empresa.usuarios.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='usuario', password='pass')
+        session = self.client.session
+        session['empresa_id'] = self.empresa.pk
+        session.save()
+
+    def verificar(self, nroid):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('terceros:api_verificar_tercero'), {'nroid': nroid})
+        consultas = [q['sql'] for q in ctx.captured_queries if 'FROM "terceros_tercero"' in q['sql']]
+        return response.json(), consultas
+
+    def test_no_existe_sin_consultar_terceros(self):
+        obtener_filtro_nroids(self.empresa.pk)
+
+        data, consultas = self.verificar('123456789')
+
+        self.assertEqual(data, {'existe': False})
+        self.assertEqual(consultas, [])
+
+    def test_positivo_se_confirma_en_la_base_de_datos(self):
+        data, _ = self.verificar(' 8007 ')
+        self.assertEqual(data, {'existe': True, 'nombre': 'Tercero 7'})
+
+        # El nroid de otra empresa no está en el filtro de esta.
+        data, consultas = self.verificar('555')
+        self.assertEqual(data, {'existe': False})
+        self.assertEqual(consultas, [])
+
+    def test_alta_actualiza_el_filtro_cacheado(self):
+        obtener_filtro_nroids(self.empresa.pk)
+        n_inicial = cache.get(filtro_nroids_cache_key(self.empresa.pk))['n']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tercero.objects.create(empresa=self.empresa, tipo_tercero=self.tipo_tercero,
+                                   tipo_identificacion=self.tipo_id, nroid="900999", nombre="Nuevo")
+
+        self.assertEqual(cache.get(filtro_nroids_cache_key(self.empresa.pk))['n'], n_inicial + 1)
+        data, _ = self.verificar('900999')
+        self.assertEqual(data, {'existe': True, 'nombre': 'Nuevo'})
+
+    def test_descarga_del_filtro_con_etag(self):
+        url = reverse('terceros:api_filtro_nroids')
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'m', 'k', 'bits'})
+
+        revalidada = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidada.status_code, 304)
+
+
 class QueryCountMixin:
     """Mixin para facilitar el conteo de queries en tests."""
 
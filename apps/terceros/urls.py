@@ -15,6 +15,7 @@ urlpatterns = [
     path('<int:pk>/editar/', views.TerceroUpdateView.as_view(), name='editar_tercero'),
     path('<int:pk>/eliminar/', views.TerceroDeleteView.as_view(), name='eliminar_tercero'),
     path('<int:pk>/activar/', views.TerceroActivateView.as_view(), name='activar_tercero'),
+    path('cambiar-estado/', views.TerceroCambioEstadoMasivoView.as_view(), name='cambiar_estado_masivo'),
 
     # URLs para la API de GeoNames - OPTIMIZADAS CON CACHE
     # El cache se maneja dentro de las vistas para mayor control y eficiencia
@@ -22,9 +23,14 @@ urlpatterns = [
     path('api/geonames/divisiones/', views.buscar_divisiones_geonames, name='api_buscar_divisiones'),
     path('api/geonames/ciudades/', views.buscar_ciudades_geonames, name='api_buscar_ciudades'),
 
+    # Autocompletado de terceros (ej. responsable de bodega)
+    path('api/buscar/', views.buscar_terceros, name='api_buscar_terceros'),
+
     # La verificación debe ser siempre en tiempo real, sin cache
     path('api/verificar-tercero/', views.verificar_existencia_tercero, name='api_verificar_tercero'),
+    path('api/filtro-nroids/', views.filtro_nroids_tercero, name='api_filtro_nroids'),
 
-    # URL utilitaria para administradores
+    # URLs utilitarias para administradores
     path('api/invalidar-cache/', views.invalidar_cache_geonames, name='api_invalidar_cache'),
+    path('api/recalcular-contadores/', views.recalcular_contadores_geografia_view, name='api_recalcular_contadores'),
 ]
\ No newline at end of file
@@ -1,25 +1,42 @@
 # C:/proyecto/Guia/terceros/views.py
+import hashlib
 import logging
+import time
 import requests
 from typing import List, Dict, Any, Optional
+from urllib.parse import urlsplit
 from django.http import JsonResponse, HttpRequest, HttpResponse
 from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.urls import reverse, reverse_lazy
+from django.views import View
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.core.cache import cache
+from django.db.models import Q
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
 from apps.core.mixins import EmpresaRequiredMixin
+from apps.core.db_router import ReplicaMixin, usar_replica
+from apps.core.metricas import registrar_geonames
+from apps.core.ratelimit import limitar
+from apps.core.utils import ubicacion_inicial
 from .forms import TerceroForm
+from .services import (
+    cambiar_estado_terceros, nroid_puede_existir, obtener_filtro_nroids, terceros_choices_cache_key,
+)
+from apps.core.cache import NAMESPACE_GEONAMES, clave_versionada, invalidar_namespace, leer_cache
+from apps.core.trabajos import encolar_unico
 from .models import Tercero, TipoTercero, TipoIdentificacion
 
 # Obtenemos una instancia del logger para registrar eventos importantes, especialmente errores.
 logger = logging.getLogger(__name__)
 
 
-class TerceroListView(EmpresaRequiredMixin, ListView):
+class TerceroListView(ReplicaMixin, EmpresaRequiredMixin, ListView):
     model = Tercero
     template_name = 'terceros/tercero_list.html'
     context_object_name = 'terceros'
@@ -30,21 +47,17 @@ class TerceroListView(EmpresaRequiredMixin, ListView):
         Optimizado con select_related para evitar N+1 queries.
         Incluye la cadena completa de ubicación geográfica y filtra por estado.
         """
-        base_queryset = Tercero.objects.filter(empresa=self.empresa_activa).select_related(
-            'tipo_identificacion',
-            'tipo_tercero',
-            'ciudad__division__pais'  # Precarga toda la cadena geográfica
-        )
+        base_queryset = Tercero.objects.de_empresa(self.empresa_activa).para_lista()
 
         # Obtener el parámetro de estado, por defecto 'activos'
         estado = self.request.GET.get('estado', 'activos')
 
         if estado == 'activos':
-            return base_queryset.filter(activo=True).order_by('nombre')
+            return base_queryset.filter(activo=True)
         elif estado == 'inactivos':
-            return base_queryset.filter(activo=False).order_by('nombre')
+            return base_queryset.filter(activo=False)
         else: # 'todos' o cualquier otro valor
-            return base_queryset.order_by('nombre')
+            return base_queryset
 
     def get_context_data(self, **kwargs):
         """Añade el estado del filtro al contexto para usarlo en la plantilla."""
@@ -62,6 +75,11 @@ class TerceroCreateView(EmpresaRequiredMixin, PermissionRequiredMixin, CreateVie
     success_url = reverse_lazy('terceros:Lista_terceros')
     permission_required = 'terceros.add_tercero'
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['empresa'] = self.empresa_activa
+        return kwargs
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Asegura que la variable siempre exista para el JS, especialmente en la creación
@@ -91,36 +109,20 @@ class TerceroUpdateView(EmpresaRequiredMixin, UpdateView):
         Seguridad: Asegura que un usuario solo pueda editar terceros
         de la empresa que tiene activa en su sesión.
         """
-        return Tercero.objects.filter(empresa=self.empresa_activa)
+        return Tercero.objects.de_empresa(self.empresa_activa).para_detalle()
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['empresa'] = self.empresa_activa
+        return kwargs
 
     def get_context_data(self, **kwargs):
         """
         Optimizamos el contexto para evitar queries adicionales en el template.
         """
         context = super().get_context_data(**kwargs)
-
-        # Si el tercero tiene ciudad, preparamos los datos para el frontend
-        tercero = self.object
-        # Aseguramos que la variable siempre exista, incluso si no hay ciudad
-        context['ubicacion_inicial'] = None
-        if tercero.ciudad:
-            context['ubicacion_inicial'] = {
-                'pais': {
-                    'id': tercero.ciudad.division.pais.geoname_id,
-                    'nombre': tercero.ciudad.division.pais.nombre,
-                    'codigo': tercero.ciudad.division.pais.codigo_iso
-                },
-                'division': {
-                    'id': tercero.ciudad.division.geoname_id,
-                    'nombre': tercero.ciudad.division.nombre,
-                    'codigo': tercero.ciudad.division.codigo_iso
-                },
-                'ciudad': {
-                    'id': tercero.ciudad.geoname_id,
-                    'nombre': tercero.ciudad.nombre
-                }
-            }
-
+        # La cadena geográfica ya viene en la consulta del objeto (para_detalle).
+        context['ubicacion_inicial'] = ubicacion_inicial(self.object.ciudad)
         return context
 
     def form_valid(self, form):
@@ -143,16 +145,18 @@ class TerceroDeleteView(EmpresaRequiredMixin, DeleteView):
         """
         Seguridad: Asegura que un usuario solo pueda eliminar terceros de su empresa.
         """
-        return Tercero.objects.filter(empresa=self.empresa_activa)
+        return Tercero.objects.de_empresa(self.empresa_activa)
 
-    def form_valid(self, form):
+    def post(self, request, *args, **kwargs):
         """
-        En lugar de borrar, implementamos la eliminación suave.
+        En lugar de borrar, implementamos la eliminación suave con un UPDATE
+        condicional (sin instanciar antes el objeto).
         """
-        tercero = self.get_object()
-        tercero.activo = False
-        tercero.save(update_fields=['activo'])  # Optimización: solo actualiza el campo necesario
-        messages.success(self.request, f'El tercero "{tercero.nombre}" ha sido eliminado.')
+        nombres = cambiar_estado_terceros(self.empresa_activa, [self.kwargs['pk']], activo=False)
+        if nombres:
+            messages.success(request, f'El tercero "{nombres[0]}" ha sido eliminado.')
+        else:
+            messages.warning(request, 'El tercero no existe o ya estaba eliminado.')
         return redirect(self.success_url)
 
 class TerceroActivateView(EmpresaRequiredMixin, DeleteView):
@@ -168,37 +172,66 @@ class TerceroActivateView(EmpresaRequiredMixin, DeleteView):
         """
         Seguridad: Asegura que un usuario solo pueda activar terceros de su empresa.
         """
-        return Tercero.objects.filter(empresa=self.empresa_activa)
+        return Tercero.objects.de_empresa(self.empresa_activa)
 
-    def form_valid(self, form):
+    def post(self, request, *args, **kwargs):
         """
-        En lugar de borrar, reactivamos el tercero.
+        En lugar de borrar, reactivamos el tercero con un UPDATE condicional.
         """
-        tercero = self.get_object()
-        tercero.activo = True
-        tercero.save(update_fields=['activo'])
-        messages.success(self.request, f'El tercero "{tercero.nombre}" ha sido reactivado exitosamente.')
+        nombres = cambiar_estado_terceros(self.empresa_activa, [self.kwargs['pk']], activo=True)
+        if nombres:
+            messages.success(request, f'El tercero "{nombres[0]}" ha sido reactivado exitosamente.')
+        else:
+            messages.warning(request, 'El tercero no existe o ya estaba activo.')
         return redirect(self.success_url)
 
+
+class TerceroCambioEstadoMasivoView(EmpresaRequiredMixin, View):
+    """
+    Desactiva o reactiva varios terceros seleccionados en el listado.
+    Actualiza por lotes y hace una sola invalidación del dashboard.
+    """
+    acciones = {'desactivar': False, 'activar': True}
+
+    def post(self, request, *args, **kwargs):
+        accion = request.POST.get('accion')
+        # Ignoramos valores no numéricos en lugar de fallar con un 500.
+        pks = [int(pk) for pk in request.POST.getlist('ids') if pk.isdigit()]
+        estado = 'inactivos' if request.POST.get('estado') == 'inactivos' else 'activos'
+        url_lista = f"{reverse('terceros:Lista_terceros')}?estado={estado}"
+
+        if accion not in self.acciones or not pks:
+            messages.warning(request, 'Seleccione al menos un tercero y una acción válida.')
+            return redirect(url_lista)
+
+        nombres = cambiar_estado_terceros(self.empresa_activa, pks, activo=self.acciones[accion])
+        verbo = 'reactivado(s)' if self.acciones[accion] else 'eliminado(s)'
+        messages.success(request, f'{len(nombres)} tercero(s) {verbo}.')
+        return redirect(url_lista)
+
 def _consultar_geonames_con_cache(url: str, cache_key: str, cache_time: int = 3600) -> List[Dict[str, Any]]:
     """
     Función auxiliar optimizada con cache para consultar la API de GeoNames.
     Los datos geográficos cambian raramente, por lo que el cache es muy efectivo.
     """
     # Intentar obtener desde cache primero
-    cached_data = cache.get(cache_key)
+    cached_data = leer_cache(cache_key)
     if cached_data is not None:
-        logger.debug(f"Cache hit para: {cache_key}")
+        logger.debug("Cache hit para: %s", cache_key)
         return cached_data
 
     # Si no está en cache, consultar API
-    logger.debug(f"Cache miss para: {cache_key}, consultando API...")
+    logger.debug("Cache miss para: %s, consultando API...", cache_key)
 
+    recurso = urlsplit(url).path.strip('/')
+    inicio = time.perf_counter()
     try:
         response = requests.get(url, timeout=10)
+        registrar_geonames(recurso, segundos=time.perf_counter() - inicio)
 
         # Manejar explícitamente el límite de peticiones (Rate Limit)
         if response.status_code == 429:
+            registrar_geonames(recurso, error='limite')
             logger.warning("Límite de peticiones a la API de GeoNames excedido. URL: %s", url)
             return []
 
@@ -210,36 +243,70 @@ def _consultar_geonames_con_cache(url: str, cache_key: str, cache_time: int = 36
         # Guardar en cache solo si obtuvimos datos válidos
         if data:
             cache.set(cache_key, data, cache_time)
-            logger.debug(f"Datos guardados en cache: {cache_key}")
+            logger.debug("Datos guardados en cache: %s", cache_key)
 
         return data
 
     except requests.Timeout:
+        registrar_geonames(recurso, segundos=time.perf_counter() - inicio, error='timeout')
         logger.error("Timeout al intentar conectar con la API de GeoNames. URL: %s", url)
     except requests.RequestException as e:
+        registrar_geonames(recurso, error='http' if isinstance(e, requests.HTTPError) else 'red')
         logger.error("Error de red o HTTP al consultar GeoNames: %s. URL: %s", e, url)
 
     # En caso de cualquier error, devolvemos una lista vacía para que el frontend no falle.
     return []
 
 
+def _advertir_incompletos(tipo: str, incompletos: list) -> None:
+    """
+    Un solo aviso por respuesta con el total y un ejemplo, en lugar de uno por
+    registro: un payload defectuoso de 1000 ciudades no genera 1000 líneas.
+    """
+    if incompletos:
+        logger.warning(
+            "%d dato(s) de %s incompleto(s) recibido(s) de GeoNames. Ejemplo: %r",
+            len(incompletos), tipo, incompletos[0],
+        )
+
+
+def _respuesta_con_etag(request: HttpRequest, datos) -> HttpResponse:
+    """
+    Respuesta JSON con ETag para datos que el navegador guarda y revalida.
+
+    `location-selector.js` pide la lista completa de ubicaciones una vez por
+    padre y filtra en el navegador; al revalidar con `If-None-Match` recibe un
+    304 sin cuerpo. Las respuestas vacías (error de GeoNames) no llevan ETag
+    para no fijarlas en el cache del navegador.
+    """
+    response = JsonResponse(datos, safe=False)
+    patch_vary_headers(response, ('Cookie',))
+    if not datos:
+        patch_cache_control(response, no_store=True)
+        return response
+    patch_cache_control(response, private=True, no_cache=True)
+    response['ETag'] = quote_etag(hashlib.md5(response.content, usedforsecurity=False).hexdigest())
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
 @login_required
-def buscar_paises_geonames(request: HttpRequest) -> JsonResponse:
+@usar_replica
+def buscar_paises_geonames(request: HttpRequest) -> HttpResponse:
     """
     Búsqueda de países optimizada con cache y validación de datos.
     """
     username = settings.GEONAMES_USERNAME
     search_term = request.GET.get('q', '').lower()
-    logger.debug(f"Buscando países con término: '{search_term}'")
+    logger.debug("Buscando países con término: '%s'", search_term)
 
     # Cache key único para la lista completa de países
-    cache_key = f"geonames_paises_{username}"
+    cache_key = clave_versionada(f"geonames_paises_{username}", NAMESPACE_GEONAMES)
     url = f"http://api.geonames.org/countryInfoJSON?username={username}&lang=es"
 
     cache_timeout = settings.CACHE_TIMEOUTS.get('GEONAMES_PAISES', 86400)
     data = _consultar_geonames_con_cache(url, cache_key, cache_timeout)
 
-    paises = []
+    paises, incompletos = [], []
     for p in data:
         # Validación de datos: Asegurarse de que los campos necesarios existen
         if all(k in p for k in ['geonameId', 'countryName', 'countryCode']):
@@ -249,22 +316,23 @@ def buscar_paises_geonames(request: HttpRequest) -> JsonResponse:
                 'codigo': p['countryCode']
             })
         else:
-            logger.warning(f"Dato de país incompleto recibido de GeoNames: {p}")
+            incompletos.append(p)
+    _advertir_incompletos('país', incompletos)
 
     # Filtrado local (más eficiente que múltiples requests a la API)
     if search_term:
         paises = [p for p in paises if search_term in p['nombre'].lower()]
 
+    # Sin tope: el selector descarga la lista completa una vez y limita lo que muestra.
     paises_ordenados = sorted(paises, key=lambda x: x['nombre'])
+    logger.debug("Devolviendo %d países.", len(paises_ordenados))
 
-    results = paises_ordenados[:50] # Devolver hasta 50 para una mejor experiencia inicial
-    logger.debug(f"Devolviendo {len(results)} países.")
-
-    return JsonResponse(results, safe=False)
+    return _respuesta_con_etag(request, paises_ordenados)
 
 
 @login_required
-def buscar_divisiones_geonames(request: HttpRequest) -> JsonResponse:
+@usar_replica
+def buscar_divisiones_geonames(request: HttpRequest) -> HttpResponse:
     """
     Búsqueda de divisiones optimizada con cache por país y validación de datos.
     """
@@ -273,17 +341,17 @@ def buscar_divisiones_geonames(request: HttpRequest) -> JsonResponse:
     if not pais_geoname_id:
         return JsonResponse([], safe=False)
 
-    logger.debug(f"Buscando divisiones para país {pais_geoname_id} con término: '{search_term}'")
+    logger.debug("Buscando divisiones para país %s con término: '%s'", pais_geoname_id, search_term)
 
     username = settings.GEONAMES_USERNAME
-    cache_key = f"geonames_divisiones_{pais_geoname_id}_{username}"
+    cache_key = clave_versionada(f"geonames_divisiones_{pais_geoname_id}_{username}", NAMESPACE_GEONAMES)
     url = (f"http://api.geonames.org/childrenJSON?geonameId={pais_geoname_id}&username={username}&lang=es"
            f"&featureCode=ADM1&maxRows=500")
 
     cache_timeout = settings.CACHE_TIMEOUTS.get('GEONAMES_DIVISIONES', 21600)
     data = _consultar_geonames_con_cache(url, cache_key, cache_timeout)
 
-    divisiones = []
+    divisiones, incompletos = [], []
     for d in data:
         if all(k in d for k in ['geonameId', 'name', 'adminCode1']):
             divisiones.append({
@@ -292,18 +360,20 @@ def buscar_divisiones_geonames(request: HttpRequest) -> JsonResponse:
                 'codigo': d['adminCode1']
             })
         else:
-            logger.warning(f"Dato de división incompleto recibido de GeoNames: {d}")
+            incompletos.append(d)
+    _advertir_incompletos('división', incompletos)
 
     if search_term:
         divisiones = [d for d in divisiones if search_term in d['nombre'].lower()]
 
     divisiones_ordenadas = sorted(divisiones, key=lambda x: x['nombre'])
-    logger.debug(f"Devolviendo {len(divisiones_ordenadas)} divisiones.")
-    return JsonResponse(divisiones_ordenadas, safe=False)
+    logger.debug("Devolviendo %d divisiones.", len(divisiones_ordenadas))
+    return _respuesta_con_etag(request, divisiones_ordenadas)
 
 
 @login_required
-def buscar_ciudades_geonames(request: HttpRequest) -> JsonResponse:
+@usar_replica
+def buscar_ciudades_geonames(request: HttpRequest) -> HttpResponse:
     """
     Búsqueda de ciudades optimizada con cache por división y validación de datos.
     """
@@ -312,35 +382,40 @@ def buscar_ciudades_geonames(request: HttpRequest) -> JsonResponse:
     if not division_geoname_id:
         return JsonResponse([], safe=False)
 
-    logger.debug(f"Buscando ciudades para división {division_geoname_id} con término: '{search_term}'")
+    logger.debug("Buscando ciudades para división %s con término: '%s'", division_geoname_id, search_term)
 
     username = settings.GEONAMES_USERNAME
-    cache_key = f"geonames_ciudades_{division_geoname_id}_{username}"
+    cache_key = clave_versionada(f"geonames_ciudades_{division_geoname_id}_{username}", NAMESPACE_GEONAMES)
     url = (f"http://api.geonames.org/childrenJSON?geonameId={division_geoname_id}&username={username}&lang=es"
            f"&featureCode=PPL&featureCode=PPLC&maxRows=1000")
 
     cache_timeout = settings.CACHE_TIMEOUTS.get('GEONAMES_CIUDADES', 7200)
     data = _consultar_geonames_con_cache(url, cache_key, cache_timeout)
 
-    ciudades = []
+    ciudades, incompletos = [], []
     for c in data:
         if all(k in c for k in ['geonameId', 'name']):
             ciudades.append({'id': c['geonameId'], 'nombre': c['name']})
         else:
-            logger.warning(f"Dato de ciudad incompleto recibido de GeoNames: {c}")
+            incompletos.append(c)
+    _advertir_incompletos('ciudad', incompletos)
 
     if search_term:
         ciudades = [c for c in ciudades if search_term in c['nombre'].lower()]
 
     ciudades_ordenadas = sorted(ciudades, key=lambda x: x['nombre'])
-    logger.debug(f"Devolviendo {len(ciudades_ordenadas)} ciudades.")
-    return JsonResponse(ciudades_ordenadas, safe=False)
+    logger.debug("Devolviendo %d ciudades.", len(ciudades_ordenadas))
+    return _respuesta_con_etag(request, ciudades_ordenadas)
 
 
 @login_required
 def verificar_existencia_tercero(request: HttpRequest) -> JsonResponse:
     """
-    Verifica si un tercero ya existe - Optimizada con select_related.
+    Verifica si un tercero ya existe en la empresa activa.
+
+    La respuesta habitual ("no existe") sale del filtro de Bloom de nroids sin
+    consultar la base de datos; solo los posibles positivos se confirman con
+    una consulta.
     """
     nro_id = request.GET.get('nroid')
     empresa_id = request.session.get('empresa_id')
@@ -352,10 +427,13 @@ def verificar_existencia_tercero(request: HttpRequest) -> JsonResponse:
         # Esto no debería ocurrir si se llama desde la app, pero es una salvaguarda.
         return JsonResponse({'error': 'No hay una empresa activa en la sesión.'}, status=400)
 
+    nro_id = nro_id.strip()
+    if not nroid_puede_existir(empresa_id, nro_id):
+        return JsonResponse({'existe': False})
+
     # Optimización: solo seleccionamos los campos necesarios
-    tercero_existente = Tercero.objects.filter(
-        empresa_id=empresa_id,
-        nroid=nro_id.strip()
+    tercero_existente = Tercero.objects.de_empresa(empresa_id).filter(
+        nroid=nro_id
     ).only('nombre', 'nroid').first()
 
     if tercero_existente:
@@ -367,6 +445,57 @@ def verificar_existencia_tercero(request: HttpRequest) -> JsonResponse:
         return JsonResponse({'existe': False})
 
 
+@login_required
+def filtro_nroids_tercero(request: HttpRequest) -> HttpResponse:
+    """
+    Filtro de Bloom de los nroids de la empresa activa, para que el formulario
+    descarte en el navegador los documentos que seguro no existen. Los posibles
+    positivos se siguen confirmando con `verificar_existencia_tercero`.
+    """
+    empresa_id = request.session.get('empresa_id')
+    if not empresa_id:
+        return JsonResponse({'error': 'No hay una empresa activa en la sesión.'}, status=400)
+    return _respuesta_con_etag(request, obtener_filtro_nroids(empresa_id).a_json())
+
+
+TERCEROS_AUTOCOMPLETE_TOP = 50
+TERCEROS_AUTOCOMPLETE_LIMITE = 20
+
+
+def _formatear_opciones_tercero(filas) -> List[Dict[str, Any]]:
+    return [{'id': pk, 'nombre': f"{nombre} ({nroid})"} for pk, nombre, nroid in filas]
+
+
+@login_required
+@usar_replica
+def buscar_terceros(request: HttpRequest) -> JsonResponse:
+    """
+    Autocompletado de terceros activos de la empresa activa (ej. responsable de bodega).
+    Sin término de búsqueda devuelve los primeros terceros por nombre desde un
+    cache por empresa; con término consulta solo las columnas necesarias.
+    """
+    empresa_id = request.session.get('empresa_id')
+    if not empresa_id:
+        return JsonResponse({'error': 'No hay una empresa activa en la sesión.'}, status=400)
+
+    search_term = request.GET.get('q', '').strip()
+    terceros = Tercero.objects.de_empresa(empresa_id).activos().order_by('nombre')
+
+    if not search_term:
+        cache_key = terceros_choices_cache_key(empresa_id)
+        opciones = leer_cache(cache_key)
+        if opciones is None:
+            filas = terceros.values_list('id', 'nombre', 'nroid')[:TERCEROS_AUTOCOMPLETE_TOP]
+            opciones = _formatear_opciones_tercero(filas)
+            cache.set(cache_key, opciones, settings.CACHE_TIMEOUTS['FORM_CHOICES'])
+        return JsonResponse(opciones, safe=False)
+
+    filas = terceros.filter(
+        Q(nombre__icontains=search_term) | Q(nroid__startswith=search_term)
+    ).values_list('id', 'nombre', 'nroid')[:TERCEROS_AUTOCOMPLETE_LIMITE]
+    return JsonResponse(_formatear_opciones_tercero(filas), safe=False)
+
+
 def invalidar_cache_geonames(request: HttpRequest) -> JsonResponse:
     """
     Vista utilitaria para invalidar el cache de GeoNames (útil para desarrollo/administración).
@@ -374,17 +503,38 @@ def invalidar_cache_geonames(request: HttpRequest) -> JsonResponse:
     if not request.user.is_staff:
         return JsonResponse({'error': 'No autorizado'}, status=403)
 
-    cache_pattern = 'geonames_*'
-    # En producción con Redis, usarías cache.delete_pattern()
-    # Para desarrollo, limpiamos manualmente las keys conocidas
-    cache_keys = [
-        f"geonames_paises_{settings.GEONAMES_USERNAME}",
-        'dashboard_stats'
-    ]
-
-    cache.delete_many(cache_keys)
+    # Subir la versión del namespace invalida de una vez países, divisiones y
+    # ciudades, sin recorrer claves por patrón (igual en Redis que en memoria).
+    invalidar_namespace(NAMESPACE_GEONAMES)
 
     return JsonResponse({
         'mensaje': 'Cache de GeoNames invalidado exitosamente',
-        'keys_eliminadas': cache_keys
-    })
\ No newline at end of file
+        'namespaces_invalidados': [NAMESPACE_GEONAMES]
+    })
+
+
+TAREA_RECALCULAR_CONTADORES = 'terceros.recalcular_contadores_geografia'
+
+
+@limitar('trabajos')
+@login_required
+@require_POST
+def recalcular_contadores_geografia_view(request: HttpRequest) -> HttpResponse:
+    """
+    Encola el recálculo de los contadores geográficos (solo staff). Devuelve
+    202 con la URL de `estado_trabajo` que consulta `static/js/trabajos.js`.
+    Mientras haya uno pendiente o en curso, se devuelve ese en lugar de encolar
+    otro, también con dos peticiones simultáneas (`encolar_unico`).
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+
+    trabajo = encolar_unico(TAREA_RECALCULAR_CONTADORES, usuario=request.user)
+
+    if 'application/json' not in request.headers.get('Accept', ''):
+        # Sin JavaScript: el formulario se envía de forma normal.
+        messages.info(request, "El recálculo de contadores geográficos se está ejecutando en segundo plano.")
+        return redirect('dashboard')
+    return JsonResponse(
+        {'id': trabajo.pk, 'estado_url': reverse('estado_trabajo', args=[trabajo.pk])}, status=202
+    )
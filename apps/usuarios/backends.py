@@ -0,0 +1,18 @@
+from django.contrib.auth.backends import ModelBackend
+
+from .services import obtener_permisos_usuario
+
+
+class PermisosCacheBackend(ModelBackend):
+    """
+    `ModelBackend` que lee los permisos del usuario del cache compartido en
+    lugar de consultarlos en cada petición. `has_perm`, `has_module_perms` y
+    `PermissionRequiredMixin` pasan todos por `get_all_permissions`.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            user_obj._perm_cache = obtener_permisos_usuario(user_obj)
+        return user_obj._perm_cache
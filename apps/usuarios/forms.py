@@ -2,7 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from apps.empresa.models import Empresa
-from django.contrib.auth.models import Permission
+from .services import GRUPO_STAFF, obtener_grupo
 
 class CustomUserCreationForm(UserCreationForm):
     """
@@ -96,15 +96,10 @@ class CustomUserCreationForm(UserCreationForm):
             if empresas:
                 user.empresas.set(empresas)
 
-            # Lógica clave: Asignar permisos si es staff pero no superusuario
+            # Lógica clave: el staff que no es superusuario recibe los permisos
+            # de nuestras apps principales a través del grupo del rol.
             if user.is_staff and not user.is_superuser:
-                # Damos todos los permisos sobre nuestras apps principales
-                permissions = Permission.objects.filter(
-                    content_type__app_label__in=['empresa', 'terceros', 'inventario', 'usuarios']
-                )
-                user.user_permissions.set(permissions)
-            elif not user.is_staff:
-                user.user_permissions.clear()  # Limpiamos por si se le quita el rol
+                user.groups.add(obtener_grupo(GRUPO_STAFF))
 
         return user
 
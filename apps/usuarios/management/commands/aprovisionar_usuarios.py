@@ -0,0 +1,62 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.empresa.models import Empresa
+from apps.usuarios.services import TAMANO_LOTE, UsuarioNuevo, aprovisionar_usuarios
+
+VERDADEROS = {'1', 'si', 'sí', 'true', 'x', 's', 'y', 'yes'}
+
+
+class Command(BaseCommand):
+    """
+    Da de alta usuarios en bloque desde un CSV con cabecera:
+
+        username,email,first_name,last_name,empresas,es_admin_empresa,is_staff,password
+
+    `empresas` es una lista de NIF separados por `;`. Solo `username` es
+    obligatorio; sin `password` el usuario queda con una contraseña inutilizable
+    y debe restablecerla. Los usuarios que ya existen se omiten, así que el
+    mismo fichero se puede volver a cargar.
+    """
+    help = "Crea usuarios, perfiles, membresías de empresa y permisos en bloque desde un CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichero', help="Ruta del CSV.")
+        parser.add_argument('--delimitador', default=',', help="Separador de columnas del CSV.")
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Filas por sentencia INSERT.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['fichero'], newline='', encoding='utf-8-sig') as f:
+                filas = list(csv.DictReader(f, delimiter=options['delimitador']))
+        except OSError as exc:
+            raise CommandError(f"No se pudo leer el fichero: {exc}")
+        if filas and 'username' not in filas[0]:
+            raise CommandError("El CSV debe tener una columna 'username'.")
+
+        nifs = {nif.strip() for fila in filas for nif in (fila.get('empresas') or '').split(';') if nif.strip()}
+        empresas = dict(Empresa.objects.filter(nif__in=nifs).values_list('nif', 'pk'))
+        desconocidas = sorted(nifs - set(empresas))
+        if desconocidas:
+            self.stderr.write(f"Empresas no encontradas (se ignoran): {', '.join(desconocidas)}")
+
+        usuarios = [
+            UsuarioNuevo(
+                username=fila['username'] or '',
+                email=fila.get('email') or '',
+                first_name=fila.get('first_name') or '',
+                last_name=fila.get('last_name') or '',
+                password=fila.get('password') or None,
+                empresas=[empresas[nif.strip()] for nif in (fila.get('empresas') or '').split(';')
+                          if nif.strip() in empresas],
+                es_admin_empresa=(fila.get('es_admin_empresa') or '').strip().lower() in VERDADEROS,
+                is_staff=(fila.get('is_staff') or '').strip().lower() in VERDADEROS,
+            )
+            for fila in filas
+        ]
+        resultado = aprovisionar_usuarios(usuarios, lote=options['lote'])
+
+        if resultado.existentes:
+            self.stdout.write(f"{len(resultado.existentes)} usuarios ya existían y se omitieron.")
+        self.stdout.write(self.style.SUCCESS(f"{len(resultado.creados)} usuarios creados."))
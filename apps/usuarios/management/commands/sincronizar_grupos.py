@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.usuarios.services import sincronizar_grupos
+
+
+class Command(BaseCommand):
+    """
+    Crea los grupos de roles que falten y les asigna los permisos actuales de
+    sus apps. Conviene ejecutarlo tras `migrate` cuando se añaden modelos: sus
+    permisos nuevos no llegan solos a los grupos sembrados por la migración.
+    """
+    help = "Sincroniza los grupos de roles con los permisos de sus apps."
+
+    def handle(self, *args, **options):
+        for grupo in sincronizar_grupos():
+            self.stdout.write(f"{grupo.name}: {grupo.permissions.count()} permisos.")
+        self.stdout.write(self.style.SUCCESS("Grupos sincronizados."))
@@ -0,0 +1,103 @@
+import logging
+
+from django.apps import apps as global_apps
+from django.contrib.auth.management import create_permissions
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+# Copia de `services.ROLES` en el momento de la migración: las migraciones no
+# deben depender del código actual de la app.
+ROLES = {
+    'Staff': ('empresa', 'terceros', 'inventario', 'usuarios'),
+}
+GRUPO_STAFF = 'Staff'
+
+
+def _crear_permisos(apps):
+    # Los permisos se crean en `post_migrate`, después de todas las migraciones:
+    # en una base de datos nueva aún no existirían. `create_permissions` recibe
+    # la configuración real de cada app y toma los modelos del estado histórico.
+    for app_label in {label for labels in ROLES.values() for label in labels}:
+        create_permissions(global_apps.get_app_config(app_label), apps=apps, verbosity=0)
+
+
+def sembrar_grupos(apps, schema_editor):
+    Group = apps.get_model('auth', 'Group')
+    Permission = apps.get_model('auth', 'Permission')
+    User = apps.get_model('auth', 'User')
+
+    # Foto de los permisos que ya existían antes de crear los de modelos nuevos:
+    # el staff de siempre tiene como permisos directos exactamente esos, no los
+    # de modelos añadidos después de su último `set(...)`.
+    existentes = {
+        nombre: set(Permission.objects.filter(content_type__app_label__in=app_labels).values_list('pk', flat=True))
+        for nombre, app_labels in ROLES.items()
+    }
+    _crear_permisos(apps)
+
+    for nombre, app_labels in ROLES.items():
+        grupo, _ = Group.objects.get_or_create(name=nombre)
+        grupo.permissions.set(Permission.objects.filter(content_type__app_label__in=app_labels))
+
+    # Solo pasa al grupo el staff que ya tenía como permisos directos todos los
+    # del rol. A quien se le dieron permisos más restringidos no se le amplían:
+    # conserva sus permisos directos y se deja en el log para revisarlo a mano.
+    grupo = Group.objects.get(name=GRUPO_STAFF)
+    requeridos = existentes[GRUPO_STAFF]
+    PermisoUsuario = User.user_permissions.through
+    directos = {}
+    for user_id, permiso_id in PermisoUsuario.objects.filter(
+        user__is_staff=True, user__is_superuser=False
+    ).values_list('user_id', 'permission_id'):
+        directos.setdefault(user_id, set()).add(permiso_id)
+
+    # En una base de datos nueva no hay permisos previos: nadie pasa al grupo.
+    completos = [user_id for user_id, permisos in directos.items() if requeridos and permisos >= requeridos]
+    User.groups.through.objects.bulk_create(
+        [User.groups.through(user_id=user_id, group_id=grupo.pk) for user_id in completos], ignore_conflicts=True
+    )
+    PermisoUsuario.objects.filter(
+        user_id__in=completos, permission__content_type__app_label__in=ROLES[GRUPO_STAFF]
+    ).delete()
+
+    revisar = list(
+        User.objects.filter(is_staff=True, is_superuser=False).exclude(pk__in=completos)
+        .order_by('username').values_list('username', flat=True)
+    )
+    if revisar:
+        logger.warning(
+            "Usuarios staff sin todos los permisos del grupo '%s'; no se añadieron al grupo, "
+            "revise sus permisos a mano: %s", GRUPO_STAFF, ', '.join(revisar),
+        )
+
+
+def deshacer_grupos(apps, schema_editor):
+    Group = apps.get_model('auth', 'Group')
+    User = apps.get_model('auth', 'User')
+    grupo = Group.objects.filter(name=GRUPO_STAFF).first()
+    if grupo is None:
+        return
+    permisos = list(grupo.permissions.values_list('pk', flat=True))
+    staff = list(User.objects.filter(groups=grupo).values_list('pk', flat=True))
+    User.user_permissions.through.objects.bulk_create(
+        [User.user_permissions.through(user_id=u, permission_id=p) for u in staff for p in permisos],
+        ignore_conflicts=True,
+    )
+    Group.objects.filter(name__in=ROLES).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('empresa', '0003_empresa_usuarios'),
+        ('terceros', '0003_contadores_geografia'),
+        ('inventario', '0002_productos_existencias_alertas'),
+    ]
+
+    operations = [
+        migrations.RunPython(sembrar_grupos, deshacer_grupos),
+    ]
@@ -20,8 +20,11 @@ class Perfil(models.Model):
         return f"Perfil de {self.usuario.username}"
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
-def crear_o_actualizar_perfil_usuario(sender, instance, created, **kwargs):
-    """Crea un perfil automáticamente cuando se crea un nuevo usuario."""
-    if created:
-        Perfil.objects.create(usuario=instance)
-    instance.perfil.save()
+def crear_o_actualizar_perfil_usuario(sender, instance, created, raw=False, **kwargs):
+    """
+    Crea el perfil cuando se crea un nuevo usuario. Los demás guardados del
+    usuario (p. ej. `last_login` en cada inicio de sesión) no tocan el perfil:
+    quien lo modifica lo guarda explícitamente.
+    """
+    if created and not raw:
+        Perfil.objects.get_or_create(usuario=instance)
@@ -0,0 +1,76 @@
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.core.cache import invalidar_namespace, namespace_usuario
+from .models import Perfil
+from .services import invalidar_permisos_usuarios, usuarios_de_grupos
+
+ACCIONES = ('post_add', 'post_remove', 'pre_clear')
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_permisos_pertenencia(sender, instance, action, reverse, pk_set, **kwargs):
+    """Altas y bajas de usuarios en grupos, desde cualquiera de los dos lados."""
+    if action not in ACCIONES:
+        return
+
+    if not reverse:
+        # `instance` es el usuario.
+        invalidar_permisos_usuarios([instance.pk])
+    elif action == 'pre_clear':
+        invalidar_permisos_usuarios(instance.user_set.values_list('pk', flat=True))
+    else:
+        invalidar_permisos_usuarios(pk_set or [])
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidar_permisos_directos(sender, instance, action, reverse, pk_set, **kwargs):
+    """Permisos asignados directamente a un usuario."""
+    if action not in ACCIONES:
+        return
+
+    if not reverse:
+        invalidar_permisos_usuarios([instance.pk])
+    elif action == 'pre_clear':
+        invalidar_permisos_usuarios(instance.user_set.values_list('pk', flat=True))
+    else:
+        invalidar_permisos_usuarios(pk_set or [])
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidar_permisos_grupo(sender, instance, action, reverse, pk_set, **kwargs):
+    """Un cambio en los permisos de un grupo afecta a todos sus usuarios."""
+    if action not in ACCIONES:
+        return
+
+    if not reverse:
+        # `instance` es el grupo.
+        invalidar_permisos_usuarios(usuarios_de_grupos([instance.pk]))
+    elif action == 'pre_clear':
+        invalidar_permisos_usuarios(usuarios_de_grupos(instance.group_set.values_list('pk', flat=True)))
+    else:
+        invalidar_permisos_usuarios(usuarios_de_grupos(pk_set or []))
+
+
+@receiver(pre_delete, sender=Group)
+def invalidar_permisos_grupo_eliminado(sender, instance, **kwargs):
+    invalidar_permisos_usuarios(usuarios_de_grupos([instance.pk]))
+
+
+@receiver(post_save, sender=User)
+def invalidar_permisos_usuario(sender, instance, created, update_fields=None, **kwargs):
+    """
+    `is_superuser` o `is_active` pueden haber cambiado. El guardado de
+    `last_login` en cada inicio de sesión no afecta a los permisos.
+    """
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    invalidar_permisos_usuarios([instance.pk])
+
+
+@receiver(post_save, sender=Perfil)
+def invalidar_menu_perfil(sender, instance, created, **kwargs):
+    """`es_admin_empresa` decide qué enlace de creación de usuarios muestra el menú."""
+    if not created:
+        invalidar_namespace(namespace_usuario(instance.usuario_id))
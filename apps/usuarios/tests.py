@@ -1,3 +1,216 @@
+import importlib
+import os
+import tempfile
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.empresa.tests import crear_empresas_de_prueba
+from .models import Perfil
+from .services import GRUPO_STAFF, UsuarioNuevo, aprovisionar_usuarios, permisos_rol, sincronizar_grupos
+
+
+class AprovisionamientoTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        crear_empresas_de_prueba(cls)
+
+
+class PerfilSignalTestCase(TestCase):
+    """El perfil se crea con el usuario y no se vuelve a escribir en cada guardado."""
+
+    def test_crear_usuario_crea_perfil(self):
+        user = User.objects.create_user('nuevo', 'nuevo@test.com', 'pass')
+        self.assertTrue(Perfil.objects.filter(usuario=user).exists())
+
+    def test_login_no_toca_el_perfil(self):
+        User.objects.create_user('usuario', 'usuario@test.com', 'pass')
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(self.client.login(username='usuario', password='pass'))
+
+        consultas_perfil = [q['sql'] for q in ctx.captured_queries if 'usuarios_perfil' in q['sql']]
+        self.assertEqual(consultas_perfil, [])
+
+
+class AprovisionarUsuariosTestCase(AprovisionamientoTestMixin, TestCase):
+
+    def test_crea_usuarios_perfiles_membresias_y_permisos(self):
+        resultado = aprovisionar_usuarios([
+            UsuarioNuevo('ana', 'ANA@test.com', 'ana', 'pérez', empresas=[self.empresa.pk, self.otra_empresa.pk],
+                         es_admin_empresa=True, is_staff=True),
+            UsuarioNuevo('luis', empresas=[self.empresa.pk]),
+        ])
+
+        self.assertEqual(sorted(resultado.creados), ['ana', 'luis'])
+        ana = User.objects.get(username='ana')
+        self.assertEqual((ana.email, ana.first_name), ('ana@test.com', 'Ana'))
+        self.assertFalse(ana.has_usable_password())
+        self.assertTrue(ana.perfil.es_admin_empresa)
+        self.assertEqual(set(ana.empresas.all()), {self.empresa, self.otra_empresa})
+        self.assertEqual(list(ana.groups.values_list('name', flat=True)), [GRUPO_STAFF])
+        self.assertEqual(ana.user_permissions.count(), 0)
+        self.assertTrue(ana.has_perm('terceros.add_tercero'))
+
+        luis = User.objects.get(username='luis')
+        self.assertFalse(luis.perfil.es_admin_empresa)
+        self.assertEqual(list(luis.empresas.all()), [self.empresa])
+        self.assertFalse(luis.groups.exists())
+        self.assertFalse(luis.has_perm('terceros.add_tercero'))
+
+    def test_consultas_no_dependen_del_numero_de_usuarios(self):
+        def alta(prefijo, cantidad):
+            # Sin staff: los permisos (usuarios x permisos filas) se parten en más lotes.
+            usuarios = [UsuarioNuevo(f'{prefijo}{i}', empresas=[self.empresa.pk]) for i in range(cantidad)]
+            with CaptureQueriesContext(connection) as ctx:
+                aprovisionar_usuarios(usuarios)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(alta('pocos', 2), alta('muchos', 50))
+        self.assertEqual(self.empresa.usuarios.count(), 52)
+
+    def test_omite_usuarios_existentes(self):
+        User.objects.create_user('ana', 'ana@test.com', 'pass')
+
+        resultado = aprovisionar_usuarios([UsuarioNuevo('ana'), UsuarioNuevo('luis')])
+
+        self.assertEqual(resultado.existentes, ['ana'])
+        self.assertEqual(resultado.creados, ['luis'])
+        self.assertTrue(User.objects.get(username='ana').check_password('pass'))
+
+
+class AprovisionarUsuariosCommandTestCase(AprovisionamientoTestMixin, TestCase):
+
+    def test_carga_csv(self):
+        contenido = (
+            "username,email,first_name,last_name,empresas,es_admin_empresa,is_staff,password\n"
+            "ana,ana@test.com,Ana,Pérez,900100;900200,si,1,secreta123\n"
+            "luis,luis@test.com,Luis,Gómez,900100;999999,,,\n"
+        )
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as f:
+            f.write(contenido)
+        self.addCleanup(os.remove, f.name)
+
+        out, err = StringIO(), StringIO()
+        call_command('aprovisionar_usuarios', f.name, stdout=out, stderr=err)
+
+        self.assertIn("2 usuarios creados", out.getvalue())
+        self.assertIn("999999", err.getvalue())
+        ana = User.objects.get(username='ana')
+        self.assertTrue(ana.check_password('secreta123'))
+        self.assertTrue(ana.is_staff)
+        self.assertTrue(ana.perfil.es_admin_empresa)
+        self.assertEqual(list(User.objects.get(username='luis').empresas.all()), [self.empresa])
+
+
+class PermisosTestCase(TestCase):
+    """Grupos de roles y cache de permisos por usuario."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.grupo = Group.objects.get(name=GRUPO_STAFF)
+        cls.user = User.objects.create_user('staff', 'staff@test.com', 'pass', is_staff=True)
+        cls.user.groups.add(cls.grupo)
+
+    def setUp(self):
+        cache.clear()
+
+    def usuario(self):
+        # Instancia nueva en cada llamada, como en cada petición.
+        return User.objects.get(pk=self.user.pk)
+
+    def test_migracion_siembra_grupo_staff(self):
+        self.assertEqual(set(self.grupo.permissions.all()), set(permisos_rol(GRUPO_STAFF)))
+        self.assertTrue(self.grupo.permissions.filter(codename='add_tercero').exists())
+
+    def test_sincronizar_grupos_restaura_permisos(self):
+        self.grupo.permissions.clear()
+        sincronizar_grupos()
+        self.assertEqual(self.grupo.permissions.count(), permisos_rol(GRUPO_STAFF).count())
+
+    def test_permisos_se_sirven_desde_cache(self):
+        self.assertTrue(self.usuario().has_perm('terceros.add_tercero'))
+
+        user = self.usuario()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('terceros.add_tercero'))
+            self.assertTrue(user.has_module_perms('inventario'))
+
+    def test_login_no_invalida_permisos(self):
+        self.usuario().has_perm('terceros.add_tercero')
+        self.client.login(username='staff', password='pass')
+
+        user = self.usuario()
+        with self.assertNumQueries(0):
+            user.has_perm('terceros.add_tercero')
+
+    def test_quitar_del_grupo_invalida(self):
+        self.assertTrue(self.usuario().has_perm('terceros.add_tercero'))
+        self.grupo.user_set.remove(self.user)
+        self.assertFalse(self.usuario().has_perm('terceros.add_tercero'))
+
+    def test_cambiar_permisos_del_grupo_invalida(self):
+        self.assertTrue(self.usuario().has_perm('terceros.add_tercero'))
+        self.grupo.permissions.remove(Permission.objects.get(codename='add_tercero'))
+        self.assertFalse(self.usuario().has_perm('terceros.add_tercero'))
+
+    def test_permiso_directo_invalida(self):
+        self.assertFalse(self.usuario().has_perm('auth.view_user'))
+        self.user.user_permissions.add(Permission.objects.get(codename='view_user'))
+        self.assertTrue(self.usuario().has_perm('auth.view_user'))
+
+    def test_vaciar_grupos_invalida(self):
+        self.assertTrue(self.usuario().has_perm('terceros.add_tercero'))
+        self.usuario().groups.clear()
+        self.assertEqual(self.usuario().get_all_permissions(), set())
+
+    def test_hacer_superusuario_invalida(self):
+        self.assertFalse(self.usuario().has_perm('auth.delete_user'))
+        user = self.usuario()
+        user.is_superuser = True
+        user.save()
+        self.assertIn('auth.delete_user', self.usuario().get_all_permissions())
+
+
+class MigracionGruposTestCase(TestCase):
+    """La migración solo pasa al grupo al staff que ya tenía todos sus permisos."""
+
+    migracion = importlib.import_module('apps.usuarios.migrations.0002_grupos_roles')
+
+    def test_staff_con_permisos_restringidos_no_se_amplia(self):
+        restringido = User.objects.create_user('restringido', is_staff=True)
+        permiso = Permission.objects.get(codename='view_tercero')
+        restringido.user_permissions.add(permiso)
+        completo = User.objects.create_user('completo', is_staff=True)
+        completo.user_permissions.set(permisos_rol(GRUPO_STAFF))
+
+        with self.assertLogs(self.migracion.__name__, 'WARNING') as logs:
+            self.migracion.sembrar_grupos(apps, None)
+
+        self.assertFalse(restringido.groups.exists())
+        self.assertEqual(list(restringido.user_permissions.all()), [permiso])
+        self.assertIn('restringido', logs.output[0])
+        self.assertEqual(list(completo.groups.values_list('name', flat=True)), [GRUPO_STAFF])
+        self.assertEqual(completo.user_permissions.count(), 0)
+
+    def test_staff_con_los_permisos_previos_a_los_modelos_nuevos_pasa_al_grupo(self):
+        # Base de datos anterior a Producto/Existencia/AlertaStock/MovimientoInventario:
+        # sus permisos aún no existen y el staff tiene todos los demás del rol.
+        nuevos = ['producto', 'existencia', 'alertastock', 'movimientoinventario']
+        Permission.objects.filter(content_type__app_label='inventario', content_type__model__in=nuevos).delete()
+        antiguo = User.objects.create_user('antiguo', is_staff=True)
+        antiguo.user_permissions.set(permisos_rol(GRUPO_STAFF))
+
+        self.migracion.sembrar_grupos(apps, None)
 
-# Create your tests here.
+        antiguo = User.objects.get(pk=antiguo.pk)
+        self.assertEqual(list(antiguo.groups.values_list('name', flat=True)), [GRUPO_STAFF])
+        self.assertEqual(antiguo.user_permissions.count(), 0)
+        self.assertTrue(antiguo.has_perm('inventario.view_producto'))
+        self.assertTrue(antiguo.has_perm('inventario.view_bodega'))
@@ -0,0 +1,79 @@
+"""
+Benchmark del backend de cache local: `FileBasedCache` frente a `SQLiteCache`.
+
+Cargas medidas:
+- ratelimit: `add` + `incr` sobre un puñado de claves, como hace
+  el límite de peticiones (`apps.core.ratelimit`) en cada petición.
+- geonames: lecturas de listas grandes (~1000 ciudades) repartidas entre
+  varias claves, con alguna escritura por fallo de cache.
+- purga: escrituras de claves nuevas por encima de MAX_ENTRIES, que obligan
+  a cada backend a expulsar entradas.
+
+Uso:
+    DEBUG=True SECRET_KEY=x GEONAMES_USERNAME=demo python benchmarks/bench_cache_local.py
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'guia_erp.settings')
+
+import django
+
+django.setup()
+
+from django.core.cache.backends.filebased import FileBasedCache
+from apps.core.cache_backends import SQLiteCache
+
+OPERACIONES = 5000
+CIUDADES = [
+    {'geonameId': 3688689 + i, 'name': f'Ciudad {i}', 'adminCode1': '33', 'countryCode': 'CO'}
+    for i in range(1000)
+]
+
+
+def ratelimit(cache):
+    for i in range(OPERACIONES):
+        clave = f'rl:usuario:{i % 20}'
+        cache.add(clave, 0, 60)
+        cache.incr(clave)
+
+
+def geonames(cache):
+    for i in range(OPERACIONES):
+        clave = f'geonames_ciudades_{i % 50}'
+        if cache.get(clave) is None:
+            cache.set(clave, CIUDADES, 7200)
+
+
+def purga(cache):
+    for i in range(OPERACIONES):
+        cache.set(f'dato_{i}', i, 300)
+
+
+def medir(nombre, fabrica, carga):
+    with tempfile.TemporaryDirectory() as directorio:
+        cache = fabrica(directorio)
+        inicio = time.perf_counter()
+        carga(cache)
+        total = time.perf_counter() - inicio
+    print(f"  {nombre:<16} {total * 1e6 / OPERACIONES:9.1f} µs/op")
+
+
+def main():
+    opciones = {'OPTIONS': {'MAX_ENTRIES': 1000, 'CULL_FREQUENCY': 3}}
+    backends = {
+        'FileBasedCache': lambda d: FileBasedCache(d, opciones),
+        'SQLiteCache': lambda d: SQLiteCache(os.path.join(d, 'cache.sqlite3'), opciones),
+    }
+    for carga in (ratelimit, geonames, purga):
+        print(f"{carga.__name__} ({OPERACIONES} operaciones):")
+        for nombre, fabrica in backends.items():
+            medir(nombre, fabrica, carga)
+
+
+if __name__ == '__main__':
+    main()
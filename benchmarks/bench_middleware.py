@@ -0,0 +1,70 @@
+"""
+Microbenchmark del `EmpresaSeleccionadaMiddleware`.
+
+Compara el coste por petición de la comprobación de rutas exentas
+(antes: cuatro `reverse()` y una lista por petición; ahora: conjunto y
+prefijos precalculados al arrancar) y del camino habitual con empresa en sesión.
+
+Uso:
+    SECRET_KEY=x GEONAMES_USERNAME=demo python benchmarks/bench_middleware.py
+"""
+import os
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'guia_erp.settings')
+
+import django
+
+django.setup()
+
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from apps.empresa.middleware import EmpresaSeleccionadaMiddleware
+
+ITERACIONES = 20000
+
+
+class UsuarioFalso:
+    is_authenticated = True
+    is_superuser = False
+
+
+def rutas_exentas_legado(path):
+    """Reproduce la comprobación anterior, que se ejecutaba en cada petición."""
+    allowed_paths = [
+        reverse('empresa:seleccionar_empresa_inicial'),
+        reverse('empresa:seleccionar_empresa'),
+        reverse('logout'),
+        reverse('empresa:crear_empresa'),
+    ]
+    return path.startswith('/admin/') or path in allowed_paths
+
+
+def medir(nombre, funcion):
+    total = timeit.timeit(funcion, number=ITERACIONES)
+    print(f"{nombre:<55} {total / ITERACIONES * 1e6:8.2f} µs/petición")
+    return total
+
+
+def main():
+    middleware = EmpresaSeleccionadaMiddleware(lambda request: HttpResponse())
+    factory = RequestFactory()
+
+    print(f"Iteraciones: {ITERACIONES}\n")
+    for path in ['/empresas/seleccionar/', '/terceros/api/geonames/ciudades/', '/dashboard/']:
+        legado = medir(f"exención legado   {path}", lambda: rutas_exentas_legado(path))
+        actual = medir(f"exención actual   {path}", lambda: middleware.es_ruta_exenta(path))
+        print(f"{'':<55} x{legado / actual:6.1f}\n")
+
+    request = factory.get('/terceros/')
+    request.user = UsuarioFalso()
+    request.session = {'empresa_id': 1, 'empresa_nombre': 'Demo'}
+    medir("__call__ con empresa en sesión (sin consultas)", lambda: middleware(request))
+
+
+if __name__ == '__main__':
+    main()
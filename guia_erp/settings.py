@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -59,6 +60,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'apps.core.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -73,20 +75,33 @@ ROOT_URLCONF = 'guia_erp.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [BASE_DIR / 'templates']
-        ,
-        'APP_DIRS': True,
+        'DIRS': [BASE_DIR / 'templates'],
+        # Cargadores explícitos en lugar de APP_DIRS: el cargador cacheado guarda
+        # cada plantilla compilada en memoria del worker. En desarrollo el
+        # autorecargador vacía ese cache al editar una plantilla.
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'apps.empresa.context_processors.empresas_context',
+                'apps.inventario.context_processors.alertas_stock_context',
             ],
         },
     },
 ]
 
+# Compilar todas las plantillas al arrancar cada worker de gunicorn
+# (`post_worker_init` en gunicorn.conf.py), para que la primera visita a cada
+# página tras un despliegue no pague la compilación. Ver apps/core/plantillas.py.
+PRECOMPILAR_PLANTILLAS = config('PRECOMPILAR_PLANTILLAS', default=not DEBUG, cast=bool)
+
 WSGI_APPLICATION = 'guia_erp.wsgi.application'
 
 
@@ -99,8 +114,49 @@ WSGI_APPLICATION = 'guia_erp.wsgi.application'
 DATABASES = {'default': dj_database_url.config(
     default=f'sqlite:///{BASE_DIR / "db.sqlite3"}')}
 
+# --- Réplicas de lectura ---
+# Lista de URLs separadas por comas. Cada una se registra como 'replica_1',
+# 'replica_2', ... y solo reciben las lecturas de las vistas marcadas con
+# `usar_replica`/`ReplicaMixin` (listados, dashboard, exportaciones).
+# Para probar en local basta con dos ficheros SQLite, por ejemplo:
+#   DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3  (copia de db.sqlite3)
+DATABASE_REPLICA_URLS = config('DATABASE_REPLICA_URLS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+for indice, replica_url in enumerate(DATABASE_REPLICA_URLS, start=1):
+    DATABASES[f'replica_{indice}'] = dj_database_url.parse(replica_url)
+    # En los tests, las réplicas apuntan a la base de datos de pruebas principal.
+    DATABASES[f'replica_{indice}']['TEST'] = {'MIRROR': 'default'}
+
+# --- Conexiones persistentes y pool ---
+# Sin CONN_MAX_AGE cada petición abre (y cierra) una conexión nueva, lo que en
+# PostgreSQL domina la latencia de vistas pequeñas como la verificación de terceros.
+#   - DATABASE_CONN_MAX_AGE: segundos que se reutiliza una conexión (0 = por petición).
+#   - DATABASE_CONN_HEALTH_CHECKS: verifica la conexión reutilizada antes de usarla.
+#   - DATABASE_POOL: activa el pool nativo de Django 5.x para PostgreSQL
+#     (requiere `psycopg[pool]`). Con pool, Django exige CONN_MAX_AGE = 0.
+DATABASE_CONN_MAX_AGE = config('DATABASE_CONN_MAX_AGE', default=0 if DEBUG else 60, cast=int)
+DATABASE_CONN_HEALTH_CHECKS = config('DATABASE_CONN_HEALTH_CHECKS', default=True, cast=bool)
+DATABASE_POOL = config('DATABASE_POOL', default=False, cast=bool)
+DATABASE_POOL_OPTIONS = {
+    'min_size': config('DATABASE_POOL_MIN_SIZE', default=2, cast=int),
+    'max_size': config('DATABASE_POOL_MAX_SIZE', default=10, cast=int),
+    'timeout': config('DATABASE_POOL_TIMEOUT', default=10, cast=int),
+}
+
+for db_settings in DATABASES.values():
+    if DATABASE_POOL and db_settings['ENGINE'] == 'django.db.backends.postgresql':
+        db_settings['CONN_MAX_AGE'] = 0
+        db_settings.setdefault('OPTIONS', {})['pool'] = dict(DATABASE_POOL_OPTIONS)
+    else:
+        db_settings['CONN_MAX_AGE'] = DATABASE_CONN_MAX_AGE
+        db_settings['CONN_HEALTH_CHECKS'] = DATABASE_CONN_HEALTH_CHECKS
+
+DATABASE_ROUTERS = ['apps.core.db_router.ReplicaRouter']
+# Segundos durante los que un usuario lee del primario después de escribir.
+DATABASE_REPLICA_PIN_SECONDS = config('DATABASE_REPLICA_PIN_SECONDS', default=5, cast=int)
+
 # --- Cache Configuration ---
 # Configuración de caché robusta que se adapta al entorno.
+CACHE_URL = config('CACHE_URL', default=None)
 if DEBUG:
     # Para desarrollo: LocMemCache es la más simple y no deja archivos.
     # No necesitamos que sea compatible con ratelimit porque no se cargará.
@@ -112,7 +168,6 @@ if DEBUG:
     }
 else:
     # Para producción: Se prioriza Redis si está configurado.
-    CACHE_URL = config('CACHE_URL', default=None)
     if CACHE_URL and CACHE_URL.startswith('redis://'):
         CACHES = {
             'default': {
@@ -121,18 +176,61 @@ else:
                 'OPTIONS': {
                     'CLIENT_CLASS': 'django_redis.client.DefaultClient',
                 }
+            },
+            # Alias propio para las sesiones: un `cache.clear()` o un cambio de
+            # versión del cache de aplicación no cierra las sesiones de los usuarios.
+            'sessions': {
+                'BACKEND': 'django_redis.cache.RedisCache',
+                'LOCATION': CACHE_URL,
+                'KEY_PREFIX': 'sesion',
+                'OPTIONS': {
+                    'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                }
             }
         }
     else:
-        # Fallback a FileBasedCache si no se provee una URL de Redis.
+        # Fallback para un solo servidor sin Redis: cache local en SQLite (WAL),
+        # compartido por todos los workers, con LRU, tope de entradas e `incr`
+        # atómico para los contadores de ratelimit. Ver apps/core/cache_backends.py.
         cache_dir = '/tmp/django_cache' if config('RAILWAY_ENVIRONMENT_NAME', default=None) else BASE_DIR / 'django_cache'
         CACHES = {
             'default': {
-                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-                'LOCATION': cache_dir,
+                'BACKEND': 'apps.core.cache_backends.SQLiteCache',
+                'LOCATION': Path(cache_dir) / 'cache.sqlite3',
+                'OPTIONS': {
+                    'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=50000, cast=int),
+                    'CULL_FREQUENCY': 4,
+                },
             }
         }
 
+# --- Sesiones ---
+# La empresa activa (`empresa_id`/`empresa_nombre`) se lee de la sesión en cada
+# petición. Con el backend 'db' eso es un SELECT a `django_session` por petición.
+#
+# SESSION_BACKEND admite:
+#   - 'db' (por defecto): compatible con cualquier despliegue.
+#   - 'cached_db': lectura desde cache (Redis vía CACHE_URL) con escritura en la
+#     base de datos como respaldo. Es el modo recomendado en producción.
+#   - 'signed_cookies': sin estado en servidor; la sesión viaja firmada en la cookie.
+#
+# Migración de 'db' a 'cached_db': basta con cambiar la variable y reiniciar.
+# Las sesiones existentes siguen en `django_session` y se cargan al cache en su
+# primera lectura, por lo que ningún usuario pierde la sesión. Las filas
+# expiradas se eliminan con `python manage.py limpiar_sesiones`.
+SESSION_BACKEND = config('SESSION_BACKEND', default='db')
+_SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+if SESSION_BACKEND not in _SESSION_ENGINES:
+    raise ImproperlyConfigured(
+        f"SESSION_BACKEND={SESSION_BACKEND!r} no es válido. Valores admitidos: {', '.join(_SESSION_ENGINES)}."
+    )
+SESSION_ENGINE = _SESSION_ENGINES[SESSION_BACKEND]
+SESSION_CACHE_ALIAS = 'sessions' if 'sessions' in CACHES else 'default'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -178,8 +276,22 @@ STATICFILES_DIRS = [
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 # Almacenamiento de archivos estáticos para un cache-busting eficiente en producción.
+# `STATICFILES_STORAGE` ya no existe en Django 5.1+: se configura con `STORAGES`.
+# En producción `collectstatic` genera nombres con hash (manifiesto) y variantes
+# .gz/.br, que sirve `StaticFilesMiddleware` con `Cache-Control: immutable`.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'apps.core.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 if not DEBUG:
-    STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+    # Justo después de SecurityMiddleware: los estáticos no pasan por sesión ni autenticación.
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+                      'apps.core.middleware.StaticFilesMiddleware')
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -189,22 +301,51 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # GEONAMES_USERNAME es requerido para la funcionalidad de geolocalización.
 GEONAMES_USERNAME = config('GEONAMES_USERNAME')
 
-# --- Django Ratelimit Configuration ---
+# --- Límite de peticiones (apps/core/ratelimit.py) ---
+# Ventana deslizante por usuario + empresa (los anónimos, por IP), con un
+# presupuesto por ámbito. Formato: '<peticiones>/<periodo>' con periodo s, m, h, d
+# (admite múltiplos, p. ej. '20/5m').
 RATELIMIT_ENABLE = config('RATELIMIT_ENABLE', default=True, cast=bool)
-RATELIMIT_KEY = 'ip'
-RATELIMIT_RATE = config('RATELIMIT_RATE', default='100/m')
-RATELIMIT_BLOCK = config('RATELIMIT_BLOCK', default=True, cast=bool)
-RATELIMIT_VIEW = 'django_ratelimit.views.ratelimited'
 RATELIMIT_USE_CACHE = 'default'
+RATELIMIT_PRESUPUESTOS = {
+    'default': config('RATELIMIT_RATE', default='300/m'),
+    # Consultas a la API externa de GeoNames (cuota limitada por cuenta).
+    'geonames': config('RATELIMIT_RATE_GEONAMES', default='60/m'),
+    # Verificación de documento al escribir en el formulario de terceros.
+    'verificacion': config('RATELIMIT_RATE_VERIFICACION', default='120/m'),
+    # Vistas que encolan trabajos pesados en segundo plano (se asignan con @limitar('trabajos')).
+    'trabajos': config('RATELIMIT_RATE_TRABAJOS', default='10/h'),
+}
+RATELIMIT_RUTAS = {
+    'terceros:api_buscar_paises': 'geonames',
+    'terceros:api_buscar_divisiones': 'geonames',
+    'terceros:api_buscar_ciudades': 'geonames',
+    'terceros:api_verificar_tercero': 'verificacion',
+    'terceros:api_filtro_nroids': 'verificacion',
+}
 
-# --- Activación Condicional de Ratelimit ---
-# La práctica estándar es activar `ratelimit` solo en producción (cuando DEBUG=False)
-# para evitar problemas con cachés de desarrollo y simplificar el entorno local.
+# Como antes, el límite solo se activa en producción (DEBUG=False).
 if not DEBUG and RATELIMIT_ENABLE:
-    # Añadir 'django_ratelimit' a las aplicaciones instaladas
-    INSTALLED_APPS.append('django_ratelimit')
-    # Insertar el middleware en una posición adecuada. Después de CommonMiddleware es una buena opción.
-    MIDDLEWARE.insert(3, 'django_ratelimit.middleware.RatelimitMiddleware')
+    MIDDLEWARE.append('apps.core.middleware.RatelimitMiddleware')
+
+# --- Métricas Prometheus (apps/core/metricas.py) ---
+# Requiere `prometheus_client`; sin él el middleware se desactiva solo. Con
+# gunicorn, exporte PROMETHEUS_MULTIPROC_DIR (un directorio vacío) para
+# agregar las métricas de todos los workers. Si METRICAS_TOKEN tiene valor,
+# /metrics exige `Authorization: Bearer <token>`; sin él, en producción solo lo
+# ven los usuarios staff con sesión iniciada.
+METRICAS_ENABLE = config('METRICAS_ENABLE', default=True, cast=bool)
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+if METRICAS_ENABLE:
+    # El primero: mide la petición completa, incluidos los demás middlewares.
+    MIDDLEWARE.insert(0, 'apps.core.middleware.MetricasMiddleware')
+if not DEBUG and METRICAS_TOKEN:
+    # Prometheus suele consultar por HTTP dentro de la red interna. Sin token
+    # no se exime: el acceso por sesión de staff debe ir siempre por HTTPS.
+    SECURE_REDIRECT_EXEMPT = [r'^metrics$']
+
+# Permisos servidos desde el cache compartido (ver apps/usuarios/signals.py).
+AUTHENTICATION_BACKENDS = ['apps.usuarios.backends.PermisosCacheBackend']
 
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
@@ -217,7 +358,49 @@ CACHE_TIMEOUTS = {
     'GEONAMES_CIUDADES': 7200,     # 2 horas
     'FORM_CHOICES': 3600,          # 1 hora
     'DASHBOARD_STATS': 300,        # 5 minutos
+    'EMPRESAS_USUARIO': 3600,      # 1 hora (se invalida al cambiar membresías)
+    'ALERTAS_STOCK': 600,          # 10 minutos (se invalida al abrir/cerrar alertas)
+    'CONTEOS_ADMIN': 300,          # 5 minutos (totales de paginación del admin)
+    'FILTROS_ADMIN': 600,          # 10 minutos (opciones de filtros del admin)
+    'FILTRO_NROIDS': 86400,        # 24 horas (se actualiza al guardar terceros)
+    'PERMISOS_USUARIO': 3600,      # 1 hora (se invalida al cambiar grupos o permisos)
+    'FRAGMENTOS_LAYOUT': 3600,     # 1 hora (menú y selector de empresa de base.html)
 }
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
+
+# --- Logging ---
+# En producción, una línea JSON por registro (apps/core/logs.py); en desarrollo,
+# texto legible. Los avisos repetidos de una misma plantilla se limitan a
+# LOG_MUESTREO_MAXIMO por LOG_MUESTREO_VENTANA segundos (ERROR siempre pasa).
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOG_FORMATO = config('LOG_FORMATO', default='texto' if DEBUG else 'json')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'muestreo': {
+            '()': 'apps.core.logs.FiltroMuestreo',
+            'maximo': config('LOG_MUESTREO_MAXIMO', default=10, cast=int),
+            'ventana': config('LOG_MUESTREO_VENTANA', default=60, cast=int),
+        },
+    },
+    'formatters': {
+        'json': {'()': 'apps.core.logs.FormateadorJSON'},
+        'texto': {'format': '%(asctime)s %(levelname)s [%(name)s] %(message)s'},
+    },
+    'handlers': {
+        'consola': {
+            'class': 'logging.StreamHandler',
+            'formatter': LOG_FORMATO,
+            'filters': ['muestreo'],
+        },
+    },
+    'root': {'handlers': ['consola'], 'level': LOG_LEVEL},
+    'loggers': {
+        'django': {'handlers': ['consola'], 'level': config('DJANGO_LOG_LEVEL', default='INFO'), 'propagate': False},
+        # Las consultas SQL solo con LOG_LEVEL=DEBUG explícito para este logger.
+        'django.db.backends': {'level': 'WARNING'},
+    },
+}
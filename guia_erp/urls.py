@@ -22,6 +22,8 @@ from apps.core import views as core_views
 urlpatterns = [
     path('', core_views.landing_page_view, name='landing_page'),
     path('dashboard/', core_views.dashboard_view, name='dashboard'),
+    path('trabajos/<int:pk>/', core_views.estado_trabajo, name='estado_trabajo'),
+    path('metrics', core_views.metricas_view, name='metricas'),
     path('accounts/', include('django.contrib.auth.urls')),
     path('terceros/', include('apps.terceros.urls', namespace='terceros')),
     path('inventario/', include('apps.inventario.urls', namespace='inventario')),
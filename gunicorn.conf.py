@@ -0,0 +1,39 @@
+"""
+Configuración de gunicorn para producción.
+
+    gunicorn guia_erp.wsgi -c gunicorn.conf.py
+
+Con métricas multiproceso, exporte antes PROMETHEUS_MULTIPROC_DIR apuntando a
+un directorio vacío (se limpia al arrancar el maestro).
+"""
+import os
+import shutil
+
+from decouple import config
+
+bind = config('GUNICORN_BIND', default='0.0.0.0:8000')
+workers = config('GUNICORN_WORKERS', default=(os.cpu_count() or 1) * 2 + 1, cast=int)
+threads = config('GUNICORN_THREADS', default=1, cast=int)
+timeout = config('GUNICORN_TIMEOUT', default=30, cast=int)
+
+
+def on_starting(server):
+    # Las métricas de una ejecución anterior no deben sumarse a las nuevas.
+    directorio = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directorio:
+        shutil.rmtree(directorio, ignore_errors=True)
+        os.makedirs(directorio, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from apps.core.metricas import marcar_proceso_terminado
+    marcar_proceso_terminado(worker.pid)
+
+
+def post_worker_init(worker):
+    # Aquí la aplicación ya está cargada en el worker (en `post_fork` Django
+    # aún no está configurado, salvo con `preload_app`).
+    from django.conf import settings
+    if settings.PRECOMPILAR_PLANTILLAS:
+        from apps.core.plantillas import precompilar_y_registrar
+        precompilar_y_registrar()
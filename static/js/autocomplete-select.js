@@ -0,0 +1,43 @@
+// Inicializa TomSelect en los <select data-autocomplete-url="..."> renderizados por
+// apps.core.widgets.AutocompleteSelect. El servidor devuelve [{id, nombre}, ...].
+document.addEventListener('DOMContentLoaded', function () {
+    const CONFIG = { debounceTime: 300, minQueryLength: 2 };
+
+    document.querySelectorAll('select[data-autocomplete-url]').forEach(function (element) {
+        const url = element.dataset.autocompleteUrl;
+        let controller = null;
+
+        new TomSelect(element, {
+            valueField: 'id',
+            labelField: 'nombre',
+            searchField: ['nombre'],
+            create: false,
+            preload: 'focus',
+            loadThrottle: CONFIG.debounceTime,
+            placeholder: 'Escribe para buscar...',
+            shouldLoad: function (query) {
+                // Sin texto se cargan los más usados (cacheados en el servidor).
+                return query.length === 0 || query.length >= CONFIG.minQueryLength;
+            },
+            load: function (query, callback) {
+                if (controller) controller.abort();
+                controller = new AbortController();
+
+                fetch(`${url}?q=${encodeURIComponent(query)}`, { signal: controller.signal })
+                    .then(response => {
+                        if (!response.ok) {
+                            throw new Error(`Error de red: ${response.status}`);
+                        }
+                        return response.json();
+                    })
+                    .then(json => callback(json))
+                    .catch(error => {
+                        if (error.name !== 'AbortError') {
+                            console.error('Error al cargar opciones:', error);
+                        }
+                        callback();
+                    });
+            }
+        });
+    });
+});
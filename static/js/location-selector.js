@@ -25,6 +25,95 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     };
 
+    // --- Listas de ubicaciones -------------------------------------------------
+    // Cada selector descarga la lista completa una vez por padre (país o
+    // departamento) y TomSelect filtra en local mientras se escribe. Las listas
+    // se guardan en sessionStorage con expulsión LRU; si el navegador ya tiene la
+    // respuesta, el servidor la revalida por ETag y contesta 304 sin cuerpo.
+    const PREFIJO_LISTA = 'ubicaciones:';
+    const CLAVE_INDICE = PREFIJO_LISTA + 'indice';
+    const MAX_LISTAS = 40;
+    const listasEnCurso = new Map();
+
+    function leerIndice() {
+        try {
+            return JSON.parse(sessionStorage.getItem(CLAVE_INDICE)) || [];
+        } catch (e) {
+            return [];
+        }
+    }
+
+    function escribirIndice(indice) {
+        try {
+            sessionStorage.setItem(CLAVE_INDICE, JSON.stringify(indice));
+        } catch (e) {
+            // sessionStorage no disponible (modo privado, cuota): se trabaja sin él.
+        }
+    }
+
+    function leerLista(url) {
+        let lista = null;
+        try {
+            lista = JSON.parse(sessionStorage.getItem(PREFIJO_LISTA + url));
+        } catch (e) {
+            return null;
+        }
+        if (lista) {
+            // Marca la lista como la usada más recientemente.
+            escribirIndice(leerIndice().filter(clave => clave !== url).concat(url));
+        }
+        return lista;
+    }
+
+    function guardarLista(url, lista) {
+        const indice = leerIndice().filter(clave => clave !== url);
+        indice.push(url);
+        while (indice.length > MAX_LISTAS) {
+            sessionStorage.removeItem(PREFIJO_LISTA + indice.shift());
+        }
+        // Si se agota la cuota, se expulsan las menos usadas hasta que quepa.
+        while (indice.length) {
+            try {
+                sessionStorage.setItem(PREFIJO_LISTA + url, JSON.stringify(lista));
+                break;
+            } catch (e) {
+                if (indice.length === 1) {
+                    indice.pop();
+                    break;
+                }
+                sessionStorage.removeItem(PREFIJO_LISTA + indice.shift());
+            }
+        }
+        escribirIndice(indice);
+    }
+
+    function obtenerLista(url, signal) {
+        const guardada = leerLista(url);
+        if (guardada) {
+            return Promise.resolve(guardada);
+        }
+        // Si dos selectores piden la misma lista a la vez, comparten la petición.
+        if (!listasEnCurso.has(url)) {
+            const peticion = fetch(url, { signal, headers: { 'Accept': 'application/json' } })
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`Error de red: ${response.status} - ${response.statusText} para URL: ${response.url}`);
+                    }
+                    return response.json();
+                })
+                .then(lista => {
+                    // Una lista vacía suele ser un fallo de GeoNames: no se guarda.
+                    if (lista.length) {
+                        guardarLista(url, lista);
+                    }
+                    return lista;
+                })
+                .finally(() => listasEnCurso.delete(url));
+            listasEnCurso.set(url, peticion);
+        }
+        return listasEnCurso.get(url);
+    }
+
     function createTomSelect(elementId, options) {
         const element = document.getElementById(elementId);
         if (!element) {
@@ -32,40 +121,87 @@ document.addEventListener('DOMContentLoaded', function () {
             return null;
         }
 
-        return new TomSelect(element, {
+        const tomSelect = new TomSelect(element, {
             valueField: 'id',
             labelField: 'nombre',
             searchField: 'nombre',
+            sortField: { field: 'nombre' },
+            maxOptions: 100,
             create: false,
             placeholder: options.placeholder,
-            preload: options.preload || false, // Carga inicial al enfocar
-            load: function (query, callback) {
-                let fetchUrl = `${options.url}?q=${encodeURIComponent(query)}`;
-                if (options.parentField && options.parentField.getValue()) {
-                    fetchUrl += `&geoname_id=${options.parentField.getValue()}`;
-                }
-                fetch(fetchUrl)
-                    .then(response => {
-                        if (!response.ok) {
-                            throw new Error('Error de red: ${response.status} - ${response.statusText} para URL: ${response.url}');
-                        }
-                        return response.json();
-                    })
-                    .then(json => callback(json))
-                    .catch((error) => {
-                        console.error('Error al cargar datos de ubicación:', error);
-                        this.clearOptions();
-                        this.addOption({id:'', nombre: 'Error al cargar datos'});
-                        this.disable();
-                        callback([]);
-                    });
-                    },
             onChange: function() {
                 // Evita que el dropdown se cierre inmediatamente después de seleccionar
                 // una opción que fue cargada dinámicamente.
                 this.refreshOptions(false);
             }
         });
+
+        let controlador = null;
+        let urlCargada = null;
+
+        // Carga (o reutiliza) la lista del padre actual. Una petición en curso
+        // para otro padre se cancela, así que una respuesta tardía nunca pisa
+        // las opciones del padre elegido después.
+        tomSelect.cargarOpciones = function () {
+            let url = options.url;
+            if (options.parentField) {
+                const parentId = options.parentField.getValue();
+                if (!parentId) {
+                    return;
+                }
+                url += `?geoname_id=${encodeURIComponent(parentId)}`;
+            }
+            if (url === urlCargada) {
+                return;
+            }
+            if (controlador) {
+                controlador.abort();
+            }
+            controlador = new AbortController();
+            const actual = controlador;
+            urlCargada = url;
+
+            tomSelect.wrapper.classList.add('loading');
+            obtenerLista(url, actual.signal)
+                .then(lista => {
+                    if (actual.signal.aborted) {
+                        return;
+                    }
+                    tomSelect.clearOptions();
+                    tomSelect.addOptions(lista);
+                    tomSelect.refreshOptions(tomSelect.isFocused);
+                })
+                .catch(error => {
+                    if (error.name === 'AbortError' || actual.signal.aborted) {
+                        return;
+                    }
+                    urlCargada = null;
+                    console.error('Error al cargar datos de ubicación:', error);
+                    tomSelect.clearOptions();
+                    tomSelect.addOption({id:'', nombre: 'Error al cargar datos'});
+                    tomSelect.disable();
+                })
+                .finally(() => {
+                    if (controlador === actual) {
+                        controlador = null;
+                        tomSelect.wrapper.classList.remove('loading');
+                    }
+                });
+        };
+
+        tomSelect.reiniciarOpciones = function () {
+            if (controlador) {
+                controlador.abort();
+                controlador = null;
+            }
+            urlCargada = null;
+            tomSelect.clear();
+            tomSelect.clearOptions();
+        };
+
+        // La lista se pide al abrir el selector, no en cada pulsación.
+        tomSelect.on('focus', tomSelect.cargarOpciones);
+        return tomSelect;
     }
 
     function updateHiddenFields(type, item) {
@@ -75,7 +211,7 @@ document.addEventListener('DOMContentLoaded', function () {
         if (fields.codigo) fields.codigo.value = item?.codigo || '';
     }
 
-    const tomSelectPais = createTomSelect('id_pais', { url: urls.paises, placeholder: 'Busca un país...', preload: 'focus' });
+    const tomSelectPais = createTomSelect('id_pais', { url: urls.paises, placeholder: 'Busca un país...' });
     const tomSelectDivision = createTomSelect('id_division', { url: urls.divisiones, placeholder: 'Primero selecciona un país...', parentField: tomSelectPais });
     const tomSelectCiudad = createTomSelect('id_ciudad', { url: urls.ciudades, placeholder: 'Primero selecciona un departamento...', parentField: tomSelectDivision });
 
@@ -86,11 +222,10 @@ document.addEventListener('DOMContentLoaded', function () {
 
     tomSelectPais.on('change', function(value){
         updateHiddenFields('pais', this.options[value]);
-        tomSelectDivision.clear();
-        tomSelectDivision.clearOptions();
+        tomSelectDivision.reiniciarOpciones();
         tomSelectDivision.enable();
-        tomSelectDivision.load('');
-        tomSelectCiudad.clear();
+        tomSelectDivision.cargarOpciones();
+        tomSelectCiudad.reiniciarOpciones();
         tomSelectCiudad.disable();
         updateHiddenFields('division', null);
         updateHiddenFields('ciudad', null);
@@ -98,10 +233,9 @@ document.addEventListener('DOMContentLoaded', function () {
 
     tomSelectDivision.on('change', function(value){
         updateHiddenFields('division', this.options[value]);
-        tomSelectCiudad.clear();
-        tomSelectCiudad.clearOptions();
+        tomSelectCiudad.reiniciarOpciones();
         tomSelectCiudad.enable();
-        tomSelectCiudad.load('');
+        tomSelectCiudad.cargarOpciones();
         updateHiddenFields('ciudad', null);
     });
 
@@ -109,23 +243,24 @@ document.addEventListener('DOMContentLoaded', function () {
         updateHiddenFields('ciudad', this.options[value]);
     });
 
-    // Cargar datos iniciales si estamos en modo de edición
+    // Cargar datos iniciales si estamos en modo de edición. Se fijan en silencio
+    // para no disparar los `change` en cascada: las listas se piden al abrir cada selector.
     if (ubicacionInicialData && ubicacionInicialData.pais) {
         const pais = ubicacionInicialData.pais;
         const division = ubicacionInicialData.division;
         const ciudad = ubicacionInicialData.ciudad;
 
         tomSelectPais.addOption(pais);
-        tomSelectPais.setValue(pais.id);
+        tomSelectPais.setValue(pais.id, true);
         updateHiddenFields('pais', pais);
 
         tomSelectDivision.addOption(division);
-        tomSelectDivision.setValue(division.id);
+        tomSelectDivision.setValue(division.id, true);
         updateHiddenFields('division', division);
         tomSelectDivision.enable();
 
         tomSelectCiudad.addOption(ciudad);
-        tomSelectCiudad.setValue(ciudad.id);
+        tomSelectCiudad.setValue(ciudad.id, true);
         updateHiddenFields('ciudad', ciudad);
         tomSelectCiudad.enable();
     }
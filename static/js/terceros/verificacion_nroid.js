@@ -0,0 +1,138 @@
+document.addEventListener('DOMContentLoaded', () => {
+    // Verifica mientras se escribe si el documento ya está registrado en la
+    // empresa. El formulario indica las URLs en `data-verificar-url` y
+    // `data-filtro-url`.
+    const form = document.getElementById('terceros-form');
+    const tipoIdSelect = document.getElementById('id_tipo_identificacion');
+    const nroidInput = document.getElementById('id_nroid');
+    const validationMessageEl = document.getElementById('id-validation-message');
+    const submitButton = document.getElementById('submit-button');
+    if (!form || !tipoIdSelect || !nroidInput || !validationMessageEl) return;
+
+    const { verificarUrl, filtroUrl } = form.dataset;
+
+    const CONFIG = {
+        debounceTime: 500,
+        messages: {
+            loading: 'Verificando...',
+            exists: (nombre) => `¡Atención! ID ya registrado para: ${nombre}`,
+            available: 'ID disponible',
+            networkError: 'Error de red al verificar',
+        },
+        icons: { loading: 'fa-spinner fa-spin', danger: 'fa-exclamation-triangle', success: 'fa-check-circle', error: 'fa-times-circle' }
+    };
+
+    const habilitarEnvio = (habilitado) => {
+        if (submitButton) submitButton.disabled = !habilitado;
+    };
+
+    const showValidationMessage = (message, type, icon) => {
+        validationMessageEl.innerHTML = `<i class="fas ${icon} me-1"></i>${message}`;
+        validationMessageEl.className = `validation-message ${type}`;
+    };
+
+    const clearValidationMessage = () => {
+        validationMessageEl.innerHTML = '';
+        validationMessageEl.className = '';
+    };
+
+    // --- Filtro local de documentos -------------------------------------------
+    // Filtro de Bloom con los nroids de la empresa (mismo algoritmo que
+    // apps/core/bloom.py). Si dice que el documento no está, es seguro y no se
+    // consulta al servidor; si dice que puede estar, el servidor decide.
+    let filtroNroids = null;
+
+    const fnv1a = (bytes, base) => {
+        let h = base;
+        for (const byte of bytes) {
+            h = Math.imul(h ^ byte, 0x01000193) >>> 0;
+        }
+        return h >>> 0;
+    };
+
+    const filtroPuedeContener = (valor) => {
+        const { m, k, bits } = filtroNroids;
+        const bytes = new TextEncoder().encode(valor);
+        const h1 = fnv1a(bytes, 0x811C9DC5);
+        const h2 = (fnv1a(bytes, 0x050C5D1F) | 1) >>> 0;
+        for (let i = 0; i < k; i++) {
+            // BigInt evita perder precisión en h1 + i * h2 (puede superar 2^53).
+            const posicion = Number((BigInt(h1) + BigInt(i) * BigInt(h2)) % BigInt(m));
+            if (!(bits[posicion >> 3] & (1 << (posicion & 7)))) {
+                return false;
+            }
+        }
+        return true;
+    };
+
+    const cargarFiltroNroids = async () => {
+        if (!filtroUrl) return;
+        try {
+            const response = await fetch(filtroUrl, { headers: { 'Accept': 'application/json' } });
+            if (!response.ok) return;
+            const data = await response.json();
+            filtroNroids = {
+                m: data.m,
+                k: data.k,
+                bits: Uint8Array.from(atob(data.bits), c => c.charCodeAt(0)),
+            };
+        } catch (error) {
+            // Sin filtro se verifica siempre contra el servidor.
+            filtroNroids = null;
+        }
+    };
+
+    // --- Verificación contra el servidor ----------------------------------------
+    let verificacionEnCurso = null;
+    let debounceTimeout = null;
+
+    const checkTerceroExists = async () => {
+        const tipoID = tipoIdSelect.value;
+        const nroId = nroidInput.value.trim();
+        if (verificacionEnCurso) {
+            verificacionEnCurso.abort();
+            verificacionEnCurso = null;
+        }
+        if (!tipoID || !nroId) {
+            clearValidationMessage();
+            return;
+        }
+        if (filtroNroids && !filtroPuedeContener(nroId)) {
+            showValidationMessage(CONFIG.messages.available, 'success', CONFIG.icons.success);
+            habilitarEnvio(true);
+            return;
+        }
+        showValidationMessage(CONFIG.messages.loading, 'loading', CONFIG.icons.loading);
+        const url = new URL(verificarUrl, window.location.origin);
+        url.searchParams.append('tipo_identificacion', tipoID);
+        url.searchParams.append('nroid', nroId);
+
+        const controlador = new AbortController();
+        verificacionEnCurso = controlador;
+        try {
+            const response = await fetch(url, { signal: controlador.signal });
+            const data = await response.json();
+            if (data.existe) {
+                showValidationMessage(CONFIG.messages.exists(data.nombre), 'danger', CONFIG.icons.danger);
+                habilitarEnvio(false);
+            } else {
+                showValidationMessage(CONFIG.messages.available, 'success', CONFIG.icons.success);
+                habilitarEnvio(true);
+            }
+        } catch (error) {
+            if (error.name === 'AbortError') return;
+            showValidationMessage(CONFIG.messages.networkError, 'danger', CONFIG.icons.error);
+        } finally {
+            if (verificacionEnCurso === controlador) verificacionEnCurso = null;
+        }
+    };
+
+    const debouncedCheck = () => {
+        clearTimeout(debounceTimeout);
+        debounceTimeout = setTimeout(checkTerceroExists, CONFIG.debounceTime);
+    };
+
+    cargarFiltroNroids();
+    tipoIdSelect.addEventListener('change', checkTerceroExists);
+    nroidInput.addEventListener('input', debouncedCheck);
+});
@@ -0,0 +1,74 @@
+/**
+ * Trabajos en segundo plano (apps/core/trabajos.py).
+ *
+ * Al enviar un formulario `[data-trabajo]` (templates/includes/trabajo_estado.html)
+ * se encola el trabajo por POST y se consulta `estado_trabajo` hasta que
+ * termina, espaciando las consultas poco a poco para no cargar el servidor.
+ */
+(function () {
+    'use strict';
+
+    const INTERVALO_INICIAL = 1000;
+    const INTERVALO_MAXIMO = 5000;
+    const CABECERAS = { 'Accept': 'application/json' };
+
+    function pintar(form, datos) {
+        const progreso = form.querySelector('[data-trabajo-progreso]');
+        const barra = progreso.querySelector('.progress-bar');
+        const mensaje = form.querySelector('[data-trabajo-mensaje]');
+
+        progreso.classList.remove('d-none');
+        // Sin total conocido, la barra queda completa y animada (indeterminada).
+        barra.style.width = `${datos.porcentaje ?? 100}%`;
+        barra.classList.toggle('progress-bar-animated', !datos.terminado);
+        barra.classList.toggle('bg-success', datos.estado === 'completado');
+        barra.classList.toggle('bg-danger', datos.estado === 'fallido');
+
+        if (datos.estado === 'completado') {
+            mensaje.textContent = (datos.resultado && datos.resultado.mensaje) || 'Completado.';
+        } else if (datos.estado === 'fallido') {
+            mensaje.textContent = `Falló: ${datos.mensaje || 'error desconocido'}`;
+        } else if (datos.estado === 'pendiente') {
+            mensaje.textContent = datos.intentos ? datos.mensaje : 'En cola...';
+        } else {
+            mensaje.textContent = datos.mensaje || 'En curso...';
+        }
+    }
+
+    async function consultar(form, url, intervalo) {
+        try {
+            const respuesta = await fetch(url, { headers: CABECERAS, credentials: 'same-origin' });
+            if (!respuesta.ok) throw new Error(`HTTP ${respuesta.status}`);
+            const datos = await respuesta.json();
+            pintar(form, datos);
+            if (datos.terminado) {
+                form.querySelector('button[type="submit"]').disabled = false;
+                return;
+            }
+        } catch (error) {
+            form.querySelector('[data-trabajo-mensaje]').textContent = 'No se pudo consultar el estado. Reintentando...';
+        }
+        setTimeout(() => consultar(form, url, Math.min(intervalo * 1.5, INTERVALO_MAXIMO)), intervalo);
+    }
+
+    document.addEventListener('submit', async (evento) => {
+        const form = evento.target.closest('form[data-trabajo]');
+        if (!form) return;
+        evento.preventDefault();
+
+        const boton = form.querySelector('button[type="submit"]');
+        boton.disabled = true;
+        try {
+            const respuesta = await fetch(form.action, {
+                method: 'POST', body: new FormData(form), headers: CABECERAS, credentials: 'same-origin',
+            });
+            if (!respuesta.ok) throw new Error(`HTTP ${respuesta.status}`);
+            const datos = await respuesta.json();
+            pintar(form, { estado: 'pendiente', terminado: false, porcentaje: null });
+            consultar(form, datos.estado_url, INTERVALO_INICIAL);
+        } catch (error) {
+            boton.disabled = false;
+            form.querySelector('[data-trabajo-mensaje]').textContent = 'No se pudo iniciar el trabajo.';
+        }
+    });
+})();